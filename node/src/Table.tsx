@@ -5,12 +5,17 @@ import duckdb_wasm_eh from "@duckdb/duckdb-wasm/dist/duckdb-eh.wasm?url";
 import eh_worker from "@duckdb/duckdb-wasm/dist/duckdb-browser-eh.worker.js?url";
 
 import dbUrl from "./rfc.duckdb?url";
+import abstractsUrl from "./rfc_abstracts.parquet?url";
 
 import React, { useState, useEffect } from "react";
 
 import "./Table.css";
 
-function convertMonthExpression(month: string): string {
+function convertMonthExpression(month: string | number): string {
+  // 書き出したデータベース(--export-dbfile)では、月は1-12の数値になっている
+  if (typeof month === "number") {
+    return month.toString().padStart(2, "0");
+  }
   switch (month) {
     case "January":
     case "Jan":
@@ -53,18 +58,19 @@ function convertMonthExpression(month: string): string {
 
 interface RFCEntry {
   doc_id: string;
+  rfc_number: number;
   title: string;
   author: {
     name: string;
     title: string;
   }[];
   date: {
-    year: string;
-    month: string;
-    day: string;
+    year: string | number;
+    month: string | number;
+    day: string | number;
   };
   format: string[];
-  page_count: string;
+  page_count: string | number;
   keywords: string[];
   is_also: string[];
   obsoletes: string[];
@@ -85,6 +91,69 @@ interface RFCEntry {
   doi: string;
 }
 
+// abstractを書き出したParquetファイルのDuckDB上での名前
+const ABSTRACTS_FILE = "rfc_abstracts.parquet";
+
+// rfc_entriesがabstractを持たない(--export-abstractsで別のParquetファイルに分けている)かどうか
+async function hasSplitAbstracts(
+  conn: duckdb.AsyncDuckDBConnection,
+): Promise<boolean> {
+  const result = await conn.query(`
+            SELECT 
+                count(*) AS count
+            FROM duckdb_columns()
+            WHERE 
+                table_name = 'rfc_entries'
+                AND column_name = 'abstract'`);
+  return Number(result.get(0)?.toJSON().count ?? 0n) == 0;
+}
+
+// rfc_entriesがabstractを持たないかどうか. データベースを開いた時に1度だけ調べる
+let splitAbstracts = false;
+
+// ファイルはダウンロードせずにURLを登録し、表示するページの分のみHTTPのRange Requestで読み込む
+async function registerAbstractsURL(db: duckdb.AsyncDuckDB): Promise<void> {
+  await db.registerFileURL(
+    ABSTRACTS_FILE,
+    new URL(abstractsUrl, window.location.href).href,
+    duckdb.DuckDBDataProtocol.HTTP,
+    false,
+  );
+}
+
+// 検索はabstractの全件を対象にするため、初めて検索する時にParquetファイル全体をダウンロードして登録し直す
+// (HTTPのRange Requestのままでは、検索のたびに全ての行グループを読み込むことになる)
+// ダウンロードは待たずに、完了するまではsearch_blobのみを検索する. 完了後に検索し直し、abstractの一致を加える
+// 以降はページの表示もダウンロードしたファイルから読む
+// ダウンロードに失敗した場合は、次の検索で再試行する
+let abstractsDownload: Promise<void> | null = null;
+
+function downloadAbstracts(db: duckdb.AsyncDuckDB): Promise<void> {
+  if (!abstractsDownload) {
+    abstractsDownload = (async () => {
+      const response = await fetch(abstractsUrl);
+      if (!response.ok) {
+        throw new Error(
+          `failed to download ${abstractsUrl}: ${response.status} ${response.statusText}`,
+        );
+      }
+      const buffer = new Uint8Array(await response.arrayBuffer());
+      await db.dropFile(ABSTRACTS_FILE);
+      try {
+        await db.registerFileBuffer(ABSTRACTS_FILE, buffer);
+      } catch (error) {
+        // 表示するページの分は引き続きRange Requestで読み込めるよう、URLを登録し直す
+        await registerAbstractsURL(db);
+        throw error;
+      }
+    })().catch((error) => {
+      abstractsDownload = null;
+      throw error;
+    });
+  }
+  return abstractsDownload;
+}
+
 async function initDuckDB(
   updateProgress: ((loaded: number) => void) | null = null,
 ): Promise<duckdb.AsyncDuckDB | null> {
@@ -174,12 +243,23 @@ async function initDuckDB(
     path: "rfc_duckdb",
   });
 
+  // abstractを別のParquetファイル(--export-abstracts)に分けている場合、
+  // ファイルはダウンロードせずにURLを登録し、表示するページの分のみHTTPのRange Requestで読み込む
+  const conn = await db.connect();
+  splitAbstracts = await hasSplitAbstracts(conn);
+  await conn.close();
+  if (splitAbstracts) {
+    await registerAbstractsURL(db);
+  }
+
   return db;
 }
 
 type GetRFCEntriesResuest = {
   db: duckdb.AsyncDuckDB;
   searchText?: string;
+  // abstractを別のParquetファイルに分けている場合、ダウンロードが完了しているかどうか
+  abstractsDownloaded?: boolean;
   limit?: number;
   offset?: number;
 };
@@ -192,15 +272,43 @@ type GetRFCEntriesResult = {
 async function getRFCEntries({
   db,
   searchText = "",
+  abstractsDownloaded = false,
   limit = 100,
   offset = 0,
 }: GetRFCEntriesResuest): Promise<GetRFCEntriesResult> {
+  // 検索はsearch_blobカラム(検索対象のカラムを全て小文字にして連結したもの)とabstractのみを対象にする
+  // 書き出したデータベース(--export-dbfile)のsearch_blobには、サイズを減らすためabstractが含まれない
+  // abstractを別のParquetファイルに分けている場合、ダウンロードが完了するまではabstractを検索しない
+  // 大文字・小文字は区別しない
+  const searchAbstracts = !splitAbstracts || abstractsDownloaded;
+
   const conn = await db.connect();
   console.log("Database connected!");
 
   let queryString: string;
   let params: unknown[] = [];
 
+  const abstractCondition = splitAbstracts
+    ? `rfc_number IN (
+                    SELECT rfc_number
+                    FROM read_parquet('${ABSTRACTS_FILE}')
+                    WHERE lower(abstract) LIKE ?
+                )`
+    : "lower(abstract) LIKE ?";
+  const searchCondition = searchAbstracts
+    ? `search_blob LIKE ?
+                OR ${abstractCondition}`
+    : "search_blob LIKE ?";
+  const searchParams = searchAbstracts
+    ? [
+        `%${searchText.toLowerCase()}%`, // search_blob
+        `%${searchText.toLowerCase()}%`, // abstract
+      ]
+    : [
+        `%${searchText.toLowerCase()}%`, // search_blob
+      ];
+  const abstractColumn = splitAbstracts ? "NULL AS abstract" : "abstract";
+
   // get Total size
   queryString = `
             SELECT 
@@ -213,61 +321,8 @@ async function getRFCEntries({
                 count(*) as total
             FROM rfc_entries
             WHERE 
-                doc_id                              LIKE ? or
-                title                               LIKE ? or
-                len(list_filter(author, x -> x.name LIKE ? or x.title LIKE ? )) >= 1 or
-                date.year                           LIKE ? or
-                date.month                          LIKE ? or
-                date.day                            LIKE ? or
-                array_to_string(format, ' ')        LIKE ? or
-                page_count                          LIKE ? or
-                array_to_string(keywords, ' ')      LIKE ? or
-                array_to_string(is_also, ' ')       LIKE ? or
-                array_to_string(obsoletes, ' ')     LIKE ? or
-                array_to_string(obsoleted_by, ' ')  LIKE ? or
-                array_to_string(updates, ' ')       LIKE ? or
-                array_to_string(updated_by, ' ')    LIKE ? or
-                array_to_string(see_also, ' ')      LIKE ? or
-                array_to_string("references", ' ')  LIKE ? or
-                array_to_string(referenced_by, ' ') LIKE ? or
-                abstract                            LIKE ? or
-                draft                               LIKE ? or
-                current_status                      LIKE ? or
-                publication_status                  LIKE ? or
-                stream                              LIKE ? or
-                errata_url                          LIKE ? or
-                area                                LIKE ? or
-                wg_acronym                          LIKE ? or
-                doi                                 LIKE ?`;
-    params = [
-      `%${searchText}%`, // doc_id
-      `%${searchText}%`, // title
-      `%${searchText}%`, // author.name
-      `%${searchText}%`, // author.title
-      `%${searchText}%`, // date.year
-      `%${searchText}%`, // date.month
-      `%${searchText}%`, // date.day
-      `%${searchText}%`, // format
-      `%${searchText}%`, // page_count
-      `%${searchText}%`, // keywords
-      `%${searchText}%`, // is_also
-      `%${searchText}%`, // obsoletes
-      `%${searchText}%`, // obsoleted_by
-      `%${searchText}%`, // updates
-      `%${searchText}%`, // updated_by
-      `%${searchText}%`, // see_also
-      `%${searchText}%`, // references
-      `%${searchText}%`, // referenced_by
-      `%${searchText}%`, // abstract
-      `%${searchText}%`, // draft
-      `%${searchText}%`, // current_status
-      `%${searchText}%`, // publication_status
-      `%${searchText}%`, // stream
-      `%${searchText}%`, // errata_url
-      `%${searchText}%`, // area
-      `%${searchText}%`, // wg_acronym
-      `%${searchText}%`, // doi
-    ];
+                ${searchCondition}`;
+    params = searchParams;
   }
 
   const stmtTotal = await conn.prepare(queryString);
@@ -290,6 +345,7 @@ async function getRFCEntries({
   queryString = `
             SELECT 
                 doc_id, 
+                rfc_number, 
                 title, 
                 author, 
                 date, 
@@ -304,7 +360,7 @@ async function getRFCEntries({
                 see_also, 
                 "references",
                 referenced_by,
-                abstract, 
+                ${abstractColumn}, 
                 draft, 
                 current_status, 
                 publication_status, 
@@ -314,7 +370,7 @@ async function getRFCEntries({
                 wg_acronym, 
                 doi 
             FROM rfc_entries
-            ORDER BY CAST(regexp_replace(doc_id, '^(RFC|rfc)', '') AS numeric) DESC
+            ORDER BY rfc_number DESC
             LIMIT ?
             OFFSET ?;`;
   params = [limit, offset];
@@ -323,6 +379,7 @@ async function getRFCEntries({
     queryString = `
             SELECT 
                 doc_id, 
+                rfc_number, 
                 title, 
                 author, 
                 date, 
@@ -337,7 +394,7 @@ async function getRFCEntries({
                 see_also, 
                 "references",
                 referenced_by, 
-                abstract, 
+                ${abstractColumn}, 
                 draft, 
                 current_status, 
                 publication_status, 
@@ -348,75 +405,46 @@ async function getRFCEntries({
                 doi 
             FROM rfc_entries
             WHERE 
-                doc_id                              LIKE ? or
-                title                               LIKE ? or
-                len(list_filter(author, x -> x.name LIKE ? or x.title LIKE ? )) >= 1 or
-                date.year                           LIKE ? or
-                date.month                          LIKE ? or
-                date.day                            LIKE ? or
-                array_to_string(format, ' ')        LIKE ? or
-                page_count                          LIKE ? or
-                array_to_string(keywords, ' ')      LIKE ? or
-                array_to_string(is_also, ' ')       LIKE ? or
-                array_to_string(obsoletes, ' ')     LIKE ? or
-                array_to_string(obsoleted_by, ' ')  LIKE ? or
-                array_to_string(updates, ' ')       LIKE ? or
-                array_to_string(updated_by, ' ')    LIKE ? or
-                array_to_string(see_also, ' ')      LIKE ? or
-                array_to_string("references", ' ')  LIKE ? or
-                array_to_string(referenced_by, ' ') LIKE ? or
-                abstract                            LIKE ? or
-                draft                               LIKE ? or
-                current_status                      LIKE ? or
-                publication_status                  LIKE ? or
-                stream                              LIKE ? or
-                errata_url                          LIKE ? or
-                area                                LIKE ? or
-                wg_acronym                          LIKE ? or
-                doi                                 LIKE ?
+                ${searchCondition}
             ORDER BY doc_id DESC
             LIMIT ?
             OFFSET ?;`;
-    params = [
-      `%${searchText}%`, // doc_id
-      `%${searchText}%`, // title
-      `%${searchText}%`, // author.name
-      `%${searchText}%`, // author.title
-      `%${searchText}%`, // date.year
-      `%${searchText}%`, // date.month
-      `%${searchText}%`, // date.day
-      `%${searchText}%`, // format
-      `%${searchText}%`, // page_count
-      `%${searchText}%`, // keywords
-      `%${searchText}%`, // is_also
-      `%${searchText}%`, // obsoletes
-      `%${searchText}%`, // obsoleted_by
-      `%${searchText}%`, // updates
-      `%${searchText}%`, // updated_by
-      `%${searchText}%`, // see_also
-      `%${searchText}%`, // references
-      `%${searchText}%`, // referenced_by
-      `%${searchText}%`, // abstract
-      `%${searchText}%`, // draft
-      `%${searchText}%`, // current_status
-      `%${searchText}%`, // publication_status
-      `%${searchText}%`, // stream
-      `%${searchText}%`, // errata_url
-      `%${searchText}%`, // area
-      `%${searchText}%`, // wg_acronym
-      `%${searchText}%`, // doi
-      limit,
-      offset,
-    ];
+    params = [...searchParams, limit, offset];
   }
 
   const stmtEntries = await conn.prepare(queryString);
 
   const resultEntries = await stmtEntries.query(...params);
 
-  const entries: RFCEntry[] | null = resultEntries.toArray();
+  const rows = resultEntries.toArray();
+  let entries: RFCEntry[] = rows;
   //   console.log("entries: ", records);
 
+  // abstractを別のParquetファイルに分けている場合、表示するページの分のみを取得して結合する
+  // rfc_numberの範囲も条件に加え、Parquetの行グループの統計情報(最小値・最大値)で読み込む範囲を絞り込む
+  // rfc_numberがNULLの行は、abstractを持たないため除く
+  const rfcNumbers: number[] = rows
+    .map((row) => row.rfc_number)
+    .filter((rfcNumber) => rfcNumber != null);
+  if (splitAbstracts && rfcNumbers.length > 0) {
+    const resultAbstracts = await conn.query(`
+            SELECT 
+                rfc_number, 
+                abstract
+            FROM read_parquet('${ABSTRACTS_FILE}')
+            WHERE 
+                rfc_number BETWEEN ${Math.min(...rfcNumbers)} AND ${Math.max(...rfcNumbers)}
+                AND rfc_number IN (${rfcNumbers.join(", ")})`);
+    const abstracts = new Map<number, string>();
+    for (const row of resultAbstracts.toArray()) {
+      abstracts.set(row.rfc_number, row.abstract);
+    }
+    entries = rows.map((row) => ({
+      ...row.toJSON(),
+      abstract: abstracts.get(row.rfc_number) ?? "",
+    }));
+  }
+
   await conn.close();
 
   const ret = {
@@ -455,6 +483,10 @@ export default function Table() {
   // DuckDBから取得したデータ
   const [result, setResult] = useState<GetRFCEntriesResult | null>(null);
 
+  // abstractを別のParquetファイルに分けている場合、ダウンロードが完了したかどうか
+  const [abstractsDownloaded, setAbstractsDownloaded] =
+    useState<boolean>(false);
+
   // 第1引数: 副作用
   // 第2引数: 依存配列
   useEffect(() => {
@@ -466,20 +498,41 @@ export default function Table() {
     });
   }, []);
 
+  // 初めて検索した時に、abstractのParquetファイルのダウンロードを始める(完了は待たない)
+  useEffect(() => {
+    if (!db || !splitAbstracts || abstractsDownloaded) return;
+    if (!condition.SearchText) return;
+    downloadAbstracts(db)
+      .then(() => {
+        setAbstractsDownloaded(true);
+      })
+      .catch((error) => {
+        console.error(error);
+      });
+  }, [db, condition, abstractsDownloaded]);
+
   useEffect(() => {
+    // 後から始めた検索の結果を、先に始めた検索の結果で上書きしない
+    let ignore = false;
     (async () => {
       if (!db) return;
       const result = await getRFCEntries({
         db: db,
         searchText: condition.SearchText,
+        abstractsDownloaded: abstractsDownloaded,
         offset: (condition.CurrentPage - 1) * 100,
         limit: 100,
       });
-      setResult(result);
+      if (!ignore) {
+        setResult(result);
+      }
     })().catch((error) => {
       console.error(error);
     });
-  }, [db, condition]);
+    return () => {
+      ignore = true;
+    };
+  }, [db, condition, abstractsDownloaded]);
 
   // イベントハンドラ
   const onSearchTextValueChanged = (
@@ -12,4 +12,10 @@ export default defineConfig({
 
   // https://zenn.dev/kanakanho/articles/3a8b313e698b7f
   base: process.env.GITHUB_PAGES ? "rfc-search" : "./",
+
+  build: {
+    // abstractのParquetファイルはHTTPのRange Requestで読み込むため、小さくてもdata URLとして埋め込まない
+    assetsInlineLimit: (filePath) =>
+      filePath.endsWith(".parquet") ? false : undefined,
+  },
 });
@@ -0,0 +1,187 @@
+import sys
+import os
+import io
+import logging
+import re
+import time
+from zipfile import ZipFile
+
+import click
+
+from extract_rfc_referencing_urls_from_rfc_txts import (
+    extract_referencing_urls,
+    filename_matcher,
+    iter_lines,
+    iter_paragraphs,
+    url_pattern2,
+    url_pattern3,
+)
+
+
+# Making Python loggers output all messages to stdout in addition to log file
+# https://stackoverflow.com/questions/14058453/making-python-loggers-output-all-messages-to-stdout-in-addition-to-log-file
+formatter = logging.Formatter(
+    "%(asctime)s - %(pathname)s:%(lineno)d - %(levelname)s - %(message)s"
+)
+
+handler = logging.StreamHandler(sys.stdout)
+handler.setLevel(logging.DEBUG)
+handler.setFormatter(formatter)
+
+appLogger = logging.getLogger(__name__)
+appLogger.setLevel(logging.INFO)
+appLogger.addHandler(handler)
+
+
+# 比較対象: 以前の抽出方法
+# * 本文全体をデコードし、splitlines()した行を文字列の+=でパラグラフに連結する
+# * パラグラフごとに全URLを抽出し、URLごとにurl_pattern2, url_pattern3を順に適用する
+legacy_url_pattern1 = re.compile(r"(https?://[^ ]+)")
+
+
+def build_paragraphs_legacy(content: bytes) -> list[str]:
+    lines = content.decode("utf-8", errors="ignore").splitlines()
+    paragraphs = []
+    current_paragraph: str = ""
+    for line in lines:
+        if line == "":
+            if current_paragraph != "":
+                paragraphs.append(current_paragraph)
+                current_paragraph = ""
+        else:
+            if line.startswith("    ") and not line.startswith("     "):
+                line = line[4:]
+            if (
+                line.endswith("-")
+                or line.endswith("/")
+                or line.endswith("_")
+                or line.endswith("?")
+                or line.endswith("&")
+                or line.endswith("#")
+            ):
+                current_paragraph += line.lstrip()
+            else:
+                current_paragraph += " " + line
+
+    return paragraphs
+
+
+def extract_referencing_urls_legacy(content: bytes) -> list[str]:
+    result: set = set()
+    for paragraph in build_paragraphs_legacy(content):
+        extract_urls = [items for items in legacy_url_pattern1.findall(paragraph)]
+
+        for extract_url in extract_urls:
+            urls = url_pattern2.findall(extract_url)
+            if len(urls) > 0:
+                extract_url = urls[0][0]
+                result.add(extract_url)
+
+            urls = url_pattern3.findall(extract_url)
+            if len(urls) > 0:
+                extract_url = urls[0][0]
+                result.add(extract_url)
+
+    return sorted(result)
+
+
+# 現在の抽出方法
+# ZIPのメンバーを開いた場合と同じく、バイト列のストリームから逐次読み込む
+def build_paragraphs_current(content: bytes) -> list[str]:
+    return list(iter_paragraphs(iter_lines(io.BytesIO(content))))
+
+
+def extract_referencing_urls_current(content: bytes) -> list[str]:
+    return extract_referencing_urls(iter_paragraphs(iter_lines(io.BytesIO(content))))
+
+
+def measure(name: str, func, contents: list[bytes], repeat: int) -> tuple[float, list]:
+    best = None
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(content) for content in contents]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    appLogger.info(
+        f"{name}: best={best:.3f}s per_doc={best / max(len(contents), 1) * 1e6:.1f}us repeat={repeat}"
+    )
+    return best, results
+
+
+@click.command()
+@click.option(
+    "--zipfile",
+    type=str,
+    required=True,
+    help="RFC-all.zipなど、各RFC本文を含むZIPファイル",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help="計測の繰り返し回数. 最も速かった回の時間を採用する",
+)
+def main(zipfile: str, repeat: int):
+    appLogger.info(f"app start")
+    appLogger.info(f"command line argument: --zipfile = {zipfile}")
+    appLogger.info(f"command line argument: --repeat = {repeat}")
+
+    abspath = os.path.abspath(zipfile)
+    if not os.path.exists(abspath):
+        appLogger.error(f"file not found: {zipfile}")
+        sys.exit(-1)
+
+    # ZIPの展開は計測対象外とするため、先に済ませておく
+    appLogger.info(f"rfc texts loading: file={zipfile}")
+    with ZipFile(abspath) as input_zip:
+        contents = [
+            input_zip.read(name)
+            for name in input_zip.namelist()
+            if filename_matcher.fullmatch(name)
+        ]
+    appLogger.info(
+        f"rfc texts loaded: documents={len(contents)} bytes={sum(len(content) for content in contents)}"
+    )
+
+    # パラグラフの再構成
+    legacy_reflow, legacy_paragraphs = measure(
+        "reflow legacy", build_paragraphs_legacy, contents, repeat
+    )
+    current_reflow, current_paragraphs = measure(
+        "reflow current", build_paragraphs_current, contents, repeat
+    )
+
+    # パラグラフの再構成 + 参照URLの抽出
+    legacy, legacy_results = measure(
+        "extract legacy", extract_referencing_urls_legacy, contents, repeat
+    )
+    current, current_results = measure(
+        "extract current", extract_referencing_urls_current, contents, repeat
+    )
+
+    # 結果が一致することの確認
+    mismatches = sum(1 for a, b in zip(legacy_paragraphs, current_paragraphs) if a != b)
+    if mismatches > 0:
+        appLogger.error(f"paragraphs differ: documents={mismatches}")
+        sys.exit(-1)
+
+    mismatches = sum(1 for a, b in zip(legacy_results, current_results) if a != b)
+    if mismatches > 0:
+        appLogger.error(f"results differ: documents={mismatches}")
+        sys.exit(-1)
+
+    appLogger.info(f"results identical: documents={len(contents)}")
+    appLogger.info(
+        f"speedup: reflow={legacy_reflow / current_reflow:.2f}x"
+        f" matching={(legacy - legacy_reflow) / max(current - current_reflow, 1e-9):.2f}x"
+        f" total={legacy / current:.2f}x"
+    )
+
+    appLogger.info(f"app finished")
+
+
+if __name__ == "__main__":
+    main(max_content_width=400)
@@ -0,0 +1,312 @@
+import sys
+import os
+import logging
+import time
+import xml.etree.ElementTree as ET
+
+import click
+
+from trasform_rfc_index_to_json import NAMESPACES, RFC_ENTRY_TAG, parse_rfc_entry
+
+
+# Making Python loggers output all messages to stdout in addition to log file
+# https://stackoverflow.com/questions/14058453/making-python-loggers-output-all-messages-to-stdout-in-addition-to-log-file
+formatter = logging.Formatter(
+    "%(asctime)s - %(pathname)s:%(lineno)d - %(levelname)s - %(message)s"
+)
+
+handler = logging.StreamHandler(sys.stdout)
+handler.setLevel(logging.DEBUG)
+handler.setFormatter(formatter)
+
+appLogger = logging.getLogger(__name__)
+appLogger.setLevel(logging.INFO)
+appLogger.addHandler(handler)
+
+
+# 比較対象: 以前の解析方法
+# * フィールドごとに、名前空間のマップを指定してentry.find()/findall()を呼ぶ(子要素をフィールドの数だけ走査する)
+# * 結果を比較できるよう、obsoleted_by(rfc-entry直下のdoc-idを参照していた)と、
+#   see_also(findallではなくfindを使っていた)の誤りは修正してある
+# * Elementの真偽値による判定(非推奨)は、len()による子要素の有無の判定に置き換えてある
+def parse_rfc_entry_legacy(entry: ET.Element, namespaces: dict = NAMESPACES) -> dict:
+    # doc-id
+    doc_id_entry = entry.find("doc-id", namespaces)
+    doc_id = getattr(doc_id_entry, "text", None)
+
+    # title
+    title_entry = entry.find("title", namespaces)
+    title = getattr(title_entry, "text", None)
+
+    # author
+    author = []
+    for author_entry in entry.findall("author", namespaces):
+        item = {}
+
+        # author/name
+        author_name_entry = author_entry.find("name", namespaces)
+        author_name = getattr(author_name_entry, "text", None)
+        item["name"] = author_name
+
+        # author/title
+        author_title_entry = author_entry.find("title", namespaces)
+        author_title = getattr(author_title_entry, "text", None)
+        item["title"] = author_title
+
+        author.append(item)
+
+    # date
+    date_entry = entry.find("date", namespaces)
+    date = {}
+
+    # date/day
+    date_day_entry = date_entry.find("day", namespaces)
+    date_day = getattr(date_day_entry, "text", None)
+    date["day"] = date_day
+
+    # date/month
+    date_month_entry = date_entry.find("month", namespaces)
+    date_month = getattr(date_month_entry, "text", None)
+    date["month"] = date_month
+
+    # date/year
+    date_year_entry = date_entry.find("year", namespaces)
+    date_year = getattr(date_year_entry, "text", None)
+    date["year"] = date_year
+
+    # format
+    format_entry = entry.find("format", namespaces)
+    format = None
+
+    # format/file-format
+    if format_entry is not None and len(format_entry) > 0:
+        format = []
+        for file_format_entry in format_entry.findall("file-format", namespaces):
+            file_format = getattr(file_format_entry, "text", None)
+            format.append(file_format)
+
+    # page-count
+    page_count_entry = entry.find("page-count", namespaces)
+    page_count = getattr(page_count_entry, "text", None)
+
+    # keywords
+    keywords_entry = entry.find("keywords", namespaces)
+    keywords = None
+
+    # keywords/kw
+    if keywords_entry is not None and len(keywords_entry) > 0:
+        keywords = []
+        for keywords_kw_entry in keywords_entry.findall("kw", namespaces):
+            keywords_kw = getattr(keywords_kw_entry, "text", None)
+            keywords.append(keywords_kw)
+
+    # is-also
+    is_also_entry = entry.find("is-also", namespaces)
+    is_also = None
+
+    # is-also/doc-id
+    if is_also_entry is not None and len(is_also_entry) > 0:
+        is_also = []
+        for is_also_doc_id_entry in is_also_entry.findall("doc-id", namespaces):
+            is_also_doc_id = getattr(is_also_doc_id_entry, "text", None)
+            is_also.append(is_also_doc_id)
+
+    # obsoletes
+    obsoletes_entry = entry.find("obsoletes", namespaces)
+    obsoletes = None
+
+    # obsoletes/doc-id
+    if obsoletes_entry is not None and len(obsoletes_entry) > 0:
+        obsoletes = []
+        for obsoletes_doc_id_entry in obsoletes_entry.findall("doc-id", namespaces):
+            obsoletes_doc_id = getattr(obsoletes_doc_id_entry, "text", None)
+            obsoletes.append(obsoletes_doc_id)
+
+    # obsoleted-by
+    obsoleted_by_entry = entry.find("obsoleted-by", namespaces)
+    obsoleted_by = None
+
+    # obsoleted-by/doc-id
+    if obsoleted_by_entry is not None and len(obsoleted_by_entry) > 0:
+        obsoleted_by = []
+        for obsoleted_by_doc_id_entry in obsoleted_by_entry.findall(
+            "doc-id", namespaces
+        ):
+            obsoleted_by_doc_id = getattr(obsoleted_by_doc_id_entry, "text", None)
+            obsoleted_by.append(obsoleted_by_doc_id)
+
+    # updates
+    updates_entry = entry.find("updates", namespaces)
+    updates = None
+
+    # updates/doc-id
+    if updates_entry is not None and len(updates_entry) > 0:
+        updates = []
+        for updates_doc_id_entry in updates_entry.findall("doc-id", namespaces):
+            updates_doc_id = getattr(updates_doc_id_entry, "text", None)
+            updates.append(updates_doc_id)
+
+    # updated-by
+    updated_by_entry = entry.find("updated-by", namespaces)
+    updated_by = None
+
+    # updated-by/doc-id
+    if updated_by_entry is not None and len(updated_by_entry) > 0:
+        updated_by = []
+        for updated_by_doc_id_entry in updated_by_entry.findall("doc-id", namespaces):
+            updated_by_doc_id = getattr(updated_by_doc_id_entry, "text", None)
+            updated_by.append(updated_by_doc_id)
+
+    # abstract
+    abstract_entry = entry.find("abstract", namespaces)
+    abstract = getattr(abstract_entry, "text", None)
+    if abstract_entry is not None and len(abstract_entry) > 0 and not abstract:
+        abstract_p_entry = abstract_entry.find("p", namespaces)
+        abstract = getattr(abstract_p_entry, "text", None)
+
+    # see_also
+    see_also_entry = entry.find("see-also", namespaces)
+    see_also = None
+
+    # see_also_doc_id
+    if see_also_entry is not None and len(see_also_entry) > 0:
+        see_also = []
+        for see_also_doc_id_entry in see_also_entry.findall("doc-id", namespaces):
+            see_also_doc_id = getattr(see_also_doc_id_entry, "text", None)
+            see_also.append(see_also_doc_id)
+
+    # draft
+    draft_entry = entry.find("draft", namespaces)
+    draft = getattr(draft_entry, "text", None)
+
+    # current-status
+    current_status_entry = entry.find("current-status", namespaces)
+    current_status = getattr(current_status_entry, "text", None)
+
+    # publication-status
+    publication_status_entry = entry.find("publication-status", namespaces)
+    publication_status = getattr(publication_status_entry, "text", None)
+
+    # stream
+    stream_entry = entry.find("stream", namespaces)
+    stream = getattr(stream_entry, "text", None)
+
+    # errata_url
+    errata_url_entry = entry.find("errata-url", namespaces)
+    errata_url = getattr(errata_url_entry, "text", None)
+
+    # area
+    area_entry = entry.find("area", namespaces)
+    area = getattr(area_entry, "text", None)
+
+    # wg_acronym
+    wg_acronym_entry = entry.find("wg_acronym", namespaces)
+    wg_acronym = getattr(wg_acronym_entry, "text", None)
+
+    # doi
+    doi_entry = entry.find("doi", namespaces)
+    doi = getattr(doi_entry, "text", None)
+
+    return {
+        "doc_id": doc_id,
+        "title": title,
+        "author": author,
+        "date": date,
+        "format": format,
+        "page_count": page_count,
+        "keywords": keywords,
+        "is_also": is_also,
+        "obsoletes": obsoletes,
+        "obsoleted_by": obsoleted_by,
+        "updates": updates,
+        "updated_by": updated_by,
+        "see_also": see_also,
+        "abstract": abstract,
+        "draft": draft,
+        "current_status": current_status,
+        "publication_status": publication_status,
+        "stream": stream,
+        "errata_url": errata_url,
+        "area": area,
+        "wg_acronym": wg_acronym,
+        "doi": doi,
+    }
+
+
+def measure(
+    name: str, func, entries: list[ET.Element], repeat: int
+) -> tuple[float, list]:
+    best = None
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(entry) for entry in entries]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    appLogger.info(
+        f"{name}: best={best:.3f}s per_entry={best / max(len(entries), 1) * 1e6:.1f}us repeat={repeat}"
+    )
+    return best, results
+
+
+@click.command()
+@click.option(
+    "--xmlfile",
+    type=str,
+    required=True,
+    help="RFC IndexのXMLファイル(rfc-index.xml)",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=5,
+    show_default=True,
+    help="計測の繰り返し回数. 最も速かった回の時間を採用する",
+)
+def main(xmlfile: str, repeat: int):
+    appLogger.info(f"app start")
+    appLogger.info(f"command line argument: --xmlfile = {xmlfile}")
+    appLogger.info(f"command line argument: --repeat = {repeat}")
+
+    abspath = os.path.abspath(xmlfile)
+    if not os.path.exists(abspath):
+        appLogger.error(f"file not found: {xmlfile}")
+        sys.exit(-1)
+
+    # XMLの読み込みは計測対象外とするため、先に済ませておく
+    appLogger.info(f"rfc index loading: file={xmlfile}")
+    try:
+        root = ET.parse(abspath).getroot()
+    except ET.ParseError as e:
+        appLogger.error(e)
+        appLogger.error("rfc index is not properly formatted")
+        sys.exit(-1)
+    entries = [element for element in root if element.tag == RFC_ENTRY_TAG]
+    appLogger.info(f"rfc index loaded: entries={len(entries)}")
+
+    legacy, legacy_results = measure(
+        "parse legacy", parse_rfc_entry_legacy, entries, repeat
+    )
+    current, current_results = measure(
+        "parse current", parse_rfc_entry, entries, repeat
+    )
+
+    # 結果(キーの順序を含む)が一致することの確認
+    mismatches = sum(
+        1
+        for a, b in zip(legacy_results, current_results)
+        if a != b or list(a) != list(b)
+    )
+    if mismatches > 0:
+        appLogger.error(f"results differ: entries={mismatches}")
+        sys.exit(-1)
+
+    appLogger.info(f"results identical: entries={len(entries)}")
+    appLogger.info(f"speedup: {legacy / current:.2f}x")
+
+    appLogger.info(f"app finished")
+
+
+if __name__ == "__main__":
+    main(max_content_width=400)
@@ -0,0 +1,651 @@
+import sys
+import os
+import atexit
+import logging
+import json
+import hashlib
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Callable, Dict, Optional, TypedDict
+
+import click
+
+import http_fetch
+from run_metrics import RunMetrics, load_report
+
+
+# Making Python loggers output all messages to stdout in addition to log file
+# https://stackoverflow.com/questions/14058453/making-python-loggers-output-all-messages-to-stdout-in-addition-to-log-file
+formatter = logging.Formatter(
+    "%(asctime)s - %(pathname)s:%(lineno)d - %(levelname)s - %(message)s"
+)
+
+handler = logging.StreamHandler(sys.stdout)
+handler.setLevel(logging.DEBUG)
+handler.setFormatter(formatter)
+
+appLogger = logging.getLogger(__name__)
+appLogger.setLevel(logging.INFO)
+appLogger.addHandler(handler)
+
+
+# 各スクリプトを1つのビルドとして実行する
+#
+#   fetch-index -> transform --+
+#                              +--> load -> copy
+#   fetch-texts -> extract ----+
+#
+# * 各ステージは、処理内容(スクリプト)、入力のファイル、オプションの内容のハッシュ(フィンガープリント)を記録する
+#   フィンガープリントが前回と同じで、出力も前回から変わっていなければ、そのステージは省略する
+# * 依存関係のないステージ(transformとextractなど)は並行して実行する
+# * 上流からの取得(fetch-*)は条件付きGETのため毎回実行し、変更がなければ取得済みのファイルを使う
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RFC_INDEX_URL = "https://www.rfc-editor.org/rfc-index.xml"
+RFC_TEXTS_URL = "https://www.rfc-editor.org/in-notes/tar/RFC-all.zip"
+
+# ビルドの状態(各ステージのフィンガープリントと出力のハッシュ)を記録するファイル
+STATE_FILE = "build-state.json"
+
+# ファイルを読み込む単位
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class Stage(TypedDict):
+    name: str
+    deps: list[str]
+    sources: list[str]
+    inputs: list[str]
+    outputs: list[str]
+    options: list[str]
+    always: bool
+    run: Optional[Callable[[], None]]
+    # 処理内容(sources)が前回から変わった場合と--forceの場合に、runの代わりに実行する
+    # 前回の出力を前提にした差分の処理(--incremental)を、作り直しにするのに使う
+    rebuild: Optional[Callable[[], None]]
+    # スクリプトが書き出す計測結果(--metrics-file)のパス
+    metrics: Optional[str]
+
+
+# ファイルの内容のハッシュ
+# サイズと更新日時が前回と同じファイルは、前回のハッシュを使う
+# ステージを並行して実行するため、記録の読み書きはロックして行う
+class FileDigests:
+    def __init__(self, digests: Dict[str, dict]):
+        self.digests = digests
+        self.lock = threading.Lock()
+
+    def digest(self, path: str) -> str:
+        stat = os.stat(path)
+        with self.lock:
+            cached = self.digests.get(path)
+        if (
+            cached
+            and cached["size"] == stat.st_size
+            and cached["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return cached["sha256"]
+
+        sha256 = hashlib.sha256()
+        with open(path, mode="rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                sha256.update(chunk)
+
+        with self.lock:
+            self.digests[path] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": sha256.hexdigest(),
+            }
+        return sha256.hexdigest()
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self.lock:
+            return dict(self.digests)
+
+
+def load_state(path: str) -> dict:
+    if not os.path.exists(path):
+        return {"stages": {}, "digests": {}}
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        appLogger.warning(e)
+        appLogger.warning(f"build state can not be loaded, ignored: file={path}")
+        return {"stages": {}, "digests": {}}
+
+
+def save_state(path: str, stages: Dict[str, dict], digests: FileDigests):
+    tmppath = f"{path}.tmp"
+    with open(tmppath, mode="w") as f:
+        json.dump({"stages": stages, "digests": digests.snapshot()}, f, indent=4)
+    os.replace(tmppath, path)
+
+
+# ステージのフィンガープリント: 処理内容、入力、オプションの内容のハッシュ
+def fingerprint(stage: Stage, digests: FileDigests) -> str:
+    content = {
+        "sources": source_digests(stage, digests),
+        "inputs": {path: digests.digest(path) for path in stage["inputs"]},
+        "options": stage["options"],
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+# 処理内容(スクリプト)のハッシュ
+def source_digests(stage: Stage, digests: FileDigests) -> Dict[str, str]:
+    return {os.path.basename(path): digests.digest(path) for path in stage["sources"]}
+
+
+# 前回の実行から、出力が削除・変更されていないか
+def is_output_valid(stage: Stage, recorded: dict, digests: FileDigests) -> bool:
+    outputs = recorded.get("outputs", {})
+    return all(
+        os.path.exists(path) and outputs.get(path) == digests.digest(path)
+        for path in stage["outputs"]
+    )
+
+
+# スクリプトを別プロセスで実行する
+def run_script(script: str, args: list[str]):
+    command = [sys.executable, os.path.join(SRC_DIR, script), *args]
+    subprocess.run(command, check=True)
+
+
+def copy_files(pairs: list[tuple[str, str]]):
+    for src, dst in pairs:
+        appLogger.info(f"file copying: src={src} dst={dst}")
+        shutil.copyfile(src, dst)
+
+
+# 前回のデータベースを削除してから作り直す
+def rebuild_database(dbfile: str, run: Callable[[], None]):
+    for path in [dbfile, f"{dbfile}.wal"]:
+        if os.path.exists(path):
+            appLogger.info(f"file removing: file={path}")
+            os.remove(path)
+    run()
+
+
+def fetch(url: str, cache_dir: str):
+    path, modified = http_fetch.fetch(url, cache_dir)
+    appLogger.info(f"fetched: url={url} file={path} modified={modified}")
+
+
+# ビルドのステージを組み立てる
+def build_stages(
+    workdir: str,
+    cache_dir: str,
+    node_dir: str,
+    xmlfile: str,
+    zipfile: str,
+    workers: int,
+    load_options: list[str],
+    metrics_dir: Optional[str],
+) -> list[Stage]:
+    def artifact(name: str) -> str:
+        return os.path.join(workdir, name)
+
+    def source(name: str) -> str:
+        return os.path.join(SRC_DIR, name)
+
+    # 各スクリプトの計測結果の出力先. 結果に影響しないため、オプション(フィンガープリント)には含めない
+    def metrics_path(name: str) -> Optional[str]:
+        return os.path.join(metrics_dir, f"{name}.json") if metrics_dir else None
+
+    def script(name: str, path: str, args: list[str]) -> Callable[[], None]:
+        if metrics_dir:
+            args = [*args, "--metrics-file", metrics_path(name)]
+        return partial(run_script, path, args)
+
+    # 上流のファイル. ローカルのファイルが指定された場合は取得しない
+    if xmlfile:
+        xmlpath = os.path.abspath(xmlfile)
+        fetch_index = None
+    else:
+        xmlpath = http_fetch.cache_path(cache_dir, RFC_INDEX_URL)
+        fetch_index = partial(fetch, RFC_INDEX_URL, cache_dir)
+
+    if zipfile:
+        zippath = os.path.abspath(zipfile)
+        fetch_texts = None
+    else:
+        zippath = http_fetch.cache_path(cache_dir, RFC_TEXTS_URL)
+        fetch_texts = partial(fetch, RFC_TEXTS_URL, cache_dir)
+
+    rfc_index = artifact("rfc-index.parquet")
+    subseries = artifact("rfc-subseries.parquet")
+    rfc_referencing_urls = artifact("rfc-referencing-urls.parquet")
+    dbfile = artifact("rfc.duckdb")
+    export_dbfile = artifact("rfc-export.duckdb")
+    export_abstracts = artifact("rfc-abstracts.parquet")
+    copies = [
+        (export_dbfile, os.path.join(node_dir, "rfc.duckdb")),
+        (export_abstracts, os.path.join(node_dir, "rfc_abstracts.parquet")),
+    ]
+
+    transform_args = [
+        "--xmlfile",
+        xmlpath,
+        "--parquet-file",
+        rfc_index,
+        "--subseries-file",
+        subseries,
+    ]
+    extract_args = [
+        "--zipfile",
+        zippath,
+        "--parquet-file",
+        rfc_referencing_urls,
+        "--cache",
+        artifact("rfc-referencing-urls.cache.json"),
+        "--workers",
+        str(workers),
+    ]
+    # 既存のデータベースには、前回との差分のみを反映する(--incremental)
+    # ローダーやオプションが変わった場合と--forceの場合は、データベースを削除して作り直す
+    load_args = [
+        "--dbfile",
+        dbfile,
+        "--rfc-index",
+        rfc_index,
+        "--rfc-referencing-urls",
+        rfc_referencing_urls,
+        "--subseries",
+        subseries,
+        "--export-dbfile",
+        export_dbfile,
+        "--export-abstracts",
+        export_abstracts,
+        *load_options,
+    ]
+
+    return [
+        {
+            "name": "fetch-index",
+            "deps": [],
+            "sources": [],
+            "inputs": [],
+            "outputs": [xmlpath],
+            "options": [xmlfile or RFC_INDEX_URL],
+            "always": not xmlfile,
+            "run": fetch_index,
+            "rebuild": None,
+            "metrics": None,
+        },
+        {
+            "name": "fetch-texts",
+            "deps": [],
+            "sources": [],
+            "inputs": [],
+            "outputs": [zippath],
+            "options": [zipfile or RFC_TEXTS_URL],
+            "always": not zipfile,
+            "run": fetch_texts,
+            "rebuild": None,
+            "metrics": None,
+        },
+        {
+            "name": "transform",
+            "deps": ["fetch-index"],
+            "sources": [
+                source("trasform_rfc_index_to_json.py"),
+                source("parquet_export.py"),
+            ],
+            "inputs": [xmlpath],
+            "outputs": [rfc_index, subseries],
+            "options": transform_args,
+            "always": False,
+            "run": script("transform", "trasform_rfc_index_to_json.py", transform_args),
+            "rebuild": None,
+            "metrics": metrics_path("transform"),
+        },
+        {
+            "name": "extract",
+            "deps": ["fetch-texts"],
+            "sources": [
+                source("extract_rfc_referencing_urls_from_rfc_txts.py"),
+                source("parquet_export.py"),
+            ],
+            "inputs": [zippath],
+            "outputs": [rfc_referencing_urls],
+            # --workersは結果に影響しない
+            "options": extract_args[:-2],
+            "always": False,
+            "run": script(
+                "extract", "extract_rfc_referencing_urls_from_rfc_txts.py", extract_args
+            ),
+            "rebuild": None,
+            "metrics": metrics_path("extract"),
+        },
+        {
+            "name": "load",
+            "deps": ["transform", "extract"],
+            "sources": [
+                source("create_duckdb_persistent_db.py"),
+                source("parquet_export.py"),
+            ],
+            "inputs": [rfc_index, rfc_referencing_urls, subseries],
+            "outputs": [dbfile, export_dbfile, export_abstracts],
+            "options": [*load_args, "--incremental"],
+            "always": False,
+            "run": script(
+                "load", "create_duckdb_persistent_db.py", [*load_args, "--incremental"]
+            ),
+            "rebuild": partial(
+                rebuild_database,
+                dbfile,
+                script("load", "create_duckdb_persistent_db.py", load_args),
+            ),
+            "metrics": metrics_path("load"),
+        },
+        {
+            "name": "copy",
+            "deps": ["load"],
+            "sources": [],
+            "inputs": [export_dbfile, export_abstracts],
+            "outputs": [dst for _, dst in copies],
+            "options": [dst for _, dst in copies],
+            "always": False,
+            "run": partial(copy_files, copies),
+            "rebuild": None,
+            "metrics": None,
+        },
+    ]
+
+
+# ステージを1つ実行し、(実行したかどうか, フィンガープリント)を返す
+def run_stage(
+    stage: Stage, state: dict, digests: FileDigests, force: bool, metrics: RunMetrics
+) -> tuple[bool, str]:
+    name = stage["name"]
+    recorded = state["stages"].get(name, {})
+
+    if not stage["always"]:
+        stage_fingerprint = fingerprint(stage, digests)
+        if (
+            not force
+            and recorded.get("fingerprint") == stage_fingerprint
+            and is_output_valid(stage, recorded, digests)
+        ):
+            appLogger.info(
+                f"stage skipped, outputs are up to date: stage={name} fingerprint={stage_fingerprint[:16]}"
+            )
+            return False, stage_fingerprint
+
+    run = stage["run"]
+    if stage["rebuild"] and (
+        force
+        or recorded.get("sources") != source_digests(stage, digests)
+        or recorded.get("options") != stage["options"]
+    ):
+        appLogger.info(
+            f"stage rebuilding, sources or options changed or forced: stage={name}"
+        )
+        run = stage["rebuild"]
+
+    appLogger.info(f"stage running: stage={name}")
+    start = time.perf_counter()
+
+    # ステージは並行して実行されるため、ステージのchildren_cpu_secondsには同時に終了した他のステージの分が含まれうる
+    # スクリプトのステージは、スクリプト自身の計測結果をchildrenとして記録する
+    try:
+        with metrics.phase(name):
+            if run:
+                run()
+    finally:
+        report = load_report(stage["metrics"]) if stage["metrics"] else None
+        if report:
+            metrics.children[name] = report
+
+    # 実行後の入力でフィンガープリントを求める(上流からの取得の場合は、取得したファイルが出力になる)
+    stage_fingerprint = fingerprint(stage, digests)
+    appLogger.info(
+        f"stage finished: stage={name} elapsed={time.perf_counter() - start:.3f}s fingerprint={stage_fingerprint[:16]}"
+    )
+    return True, stage_fingerprint
+
+
+@click.command()
+@click.option(
+    "--workdir",
+    type=str,
+    default=".",
+    show_default=True,
+    help="中間ファイル(rfc-index.parquetなど)とデータベースの出力先のディレクトリ",
+)
+@click.option(
+    "--cache-dir",
+    type=str,
+    default=None,
+    required=False,
+    help="URLから取得したファイルのキャッシュディレクトリ. 指定しない場合は--workdirの.cache",
+)
+@click.option(
+    "--node-dir",
+    type=str,
+    default="../node/src",
+    show_default=True,
+    help="画面でダウンロードするデータベース(rfc.duckdb, rfc_abstracts.parquet)のコピー先のディレクトリ",
+)
+@click.option(
+    "--xmlfile",
+    type=str,
+    default=None,
+    required=False,
+    help="RFC IndexのXMLをURLから取得せずローカルのファイルを参照する場合に利用する",
+)
+@click.option(
+    "--zipfile",
+    type=str,
+    default=None,
+    required=False,
+    help="各RFC本文のZIPをURLから取得せずローカルのファイルを参照する場合に利用する",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="各RFC本文の解析を並列に実行するプロセス数",
+)
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=2,
+    show_default=True,
+    help="並行して実行するステージの数",
+)
+@click.option(
+    "--reference-closure",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="rfc.duckdbに、参照を推移的に辿ったRFCの一覧(rfc_reference_closure)を作成する. 画面のデータベースには含まれない",
+)
+@click.option(
+    "--reference-closure-max-depth",
+    type=click.IntRange(min=1),
+    required=False,
+    default=None,
+    help="rfc_reference_closureで辿る最大の深さ. 指定しない場合は全て辿る",
+)
+@click.option(
+    "--search-index",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="rfc.duckdbに、全文検索の転置インデックス(rfc_search_postings)を作成する. 画面のデータベースには含まれない",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="出力が最新でも、全てのステージを実行する",
+)
+@click.option(
+    "--metrics-file",
+    type=str,
+    default=None,
+    required=False,
+    help="ステージごとの処理時間・CPU時間・ピークメモリと、各スクリプトの計測結果を、終了時にJSONで出力するファイル",
+)
+@click.option(
+    "--prometheus-file",
+    type=str,
+    default=None,
+    required=False,
+    help="--metrics-fileと同じ内容を、Prometheus(node_exporterのtextfile collector)の形式で出力するファイル",
+)
+def main(
+    workdir: str,
+    cache_dir: str,
+    node_dir: str,
+    xmlfile: str,
+    zipfile: str,
+    workers: int,
+    jobs: int,
+    reference_closure: bool,
+    reference_closure_max_depth: int,
+    search_index: bool,
+    force: bool,
+    metrics_file: str,
+    prometheus_file: str,
+):
+    appLogger.info(f"app start")
+    appLogger.info(f"command line argument: --workdir = {workdir}")
+    appLogger.info(f"command line argument: --cache-dir = {cache_dir}")
+    appLogger.info(f"command line argument: --node-dir = {node_dir}")
+    appLogger.info(f"command line argument: --xmlfile = {xmlfile}")
+    appLogger.info(f"command line argument: --zipfile = {zipfile}")
+    appLogger.info(f"command line argument: --workers = {workers}")
+    appLogger.info(f"command line argument: --jobs = {jobs}")
+    appLogger.info(f"command line argument: --reference-closure = {reference_closure}")
+    appLogger.info(
+        f"command line argument: --reference-closure-max-depth = {reference_closure_max_depth}"
+    )
+    appLogger.info(f"command line argument: --search-index = {search_index}")
+    appLogger.info(f"command line argument: --force = {force}")
+    appLogger.info(f"command line argument: --metrics-file = {metrics_file}")
+    appLogger.info(f"command line argument: --prometheus-file = {prometheus_file}")
+
+    metrics = RunMetrics("build", appLogger)
+    metrics.write_at_exit(metrics_file, prometheus_file)
+
+    workdir = os.path.abspath(workdir)
+    cache_dir = os.path.abspath(cache_dir or os.path.join(workdir, ".cache"))
+    node_dir = os.path.abspath(node_dir)
+    for dirpath in [workdir, node_dir]:
+        if not os.path.isdir(dirpath):
+            appLogger.error(f"directory not found: directory={dirpath}")
+            sys.exit(-1)
+    for path in [xmlfile, zipfile]:
+        if path and not os.path.exists(path):
+            appLogger.error(f"file not found: {path}")
+            sys.exit(-1)
+
+    state_path = os.path.join(workdir, STATE_FILE)
+    state = load_state(state_path)
+    digests = FileDigests(dict(state.get("digests", {})))
+
+    # 各スクリプトの計測結果は一時ディレクトリに書き出し、このプロセスのレポートにまとめる
+    metrics_dir = None
+    if metrics_file or prometheus_file:
+        metrics_dir = tempfile.mkdtemp(prefix="build-metrics-")
+        atexit.register(shutil.rmtree, metrics_dir, True)
+
+    # create_duckdb_persistent_db.pyにそのまま渡すオプション
+    load_options: list[str] = []
+    if reference_closure:
+        load_options.append("--reference-closure")
+    if reference_closure_max_depth:
+        load_options.extend(
+            ["--reference-closure-max-depth", str(reference_closure_max_depth)]
+        )
+    if search_index:
+        load_options.append("--search-index")
+
+    stages = build_stages(
+        workdir,
+        cache_dir,
+        node_dir,
+        xmlfile,
+        zipfile,
+        workers,
+        load_options,
+        metrics_dir,
+    )
+    stage_map = {stage["name"]: stage for stage in stages}
+
+    # 依存するステージが全て終わったものから実行する
+    # 状態の更新はこのスレッドでのみ行う
+    start = time.perf_counter()
+    done: set[str] = set()
+    failed: list[str] = []
+    ran: list[str] = []
+    running: Dict[Future, str] = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while len(done) < len(stages) and not failed:
+            for stage in stages:
+                name = stage["name"]
+                if (
+                    name not in done
+                    and name not in running.values()
+                    and all(dep in done for dep in stage["deps"])
+                ):
+                    running[
+                        executor.submit(
+                            run_stage, stage, state, digests, force, metrics
+                        )
+                    ] = name
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    executed, stage_fingerprint = future.result()
+                except Exception as e:
+                    appLogger.error(e)
+                    appLogger.error(f"stage failed: stage={name}")
+                    failed.append(name)
+                    continue
+
+                done.add(name)
+                if executed:
+                    ran.append(name)
+                state["stages"][name] = {
+                    "fingerprint": stage_fingerprint,
+                    "sources": source_digests(stage_map[name], digests),
+                    "options": stage_map[name]["options"],
+                    "outputs": {
+                        path: digests.digest(path)
+                        for path in stage_map[name]["outputs"]
+                    },
+                }
+                save_state(state_path, state["stages"], digests)
+
+        # 失敗した場合は、実行中のステージの終了を待つ
+        wait(running)
+
+    if failed:
+        appLogger.error(f"build failed: stages={','.join(failed)}")
+        sys.exit(-1)
+
+    appLogger.info(
+        f"build finished: elapsed={time.perf_counter() - start:.3f}s ran={','.join(ran) or '-'} skipped={len(stages) - len(ran)}"
+    )
+    metrics.finish()
+    appLogger.info(f"app finished")
+
+
+if __name__ == "__main__":
+    main(max_content_width=400)
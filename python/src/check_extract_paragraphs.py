@@ -0,0 +1,185 @@
+import sys
+import os
+import io
+import json
+import logging
+from typing import Optional
+
+import click
+
+from extract_rfc_referencing_urls_from_rfc_txts import (
+    READ_CHUNK_SIZE,
+    extract_referencing_urls,
+    iter_lines,
+    iter_paragraphs,
+)
+
+
+# Making Python loggers output all messages to stdout in addition to log file
+# https://stackoverflow.com/questions/14058453/making-python-loggers-output-all-messages-to-stdout-in-addition-to-log-file
+formatter = logging.Formatter(
+    "%(asctime)s - %(pathname)s:%(lineno)d - %(levelname)s - %(message)s"
+)
+
+handler = logging.StreamHandler(sys.stdout)
+handler.setLevel(logging.DEBUG)
+handler.setFormatter(formatter)
+
+appLogger = logging.getLogger(__name__)
+appLogger.setLevel(logging.INFO)
+appLogger.addHandler(handler)
+
+
+# extract_rfc_referencing_urls_from_rfc_txts.pyのパラグラフの再構成の確認
+# RFC本文のフィクスチャ(fixtures/rfc-text.txt)を様々なチャンクの大きさで読み込み、期待するパラグラフ・参照URLと比較する
+# チャンクの境界で"\r\n"やUTF-8の複数バイトの文字が分かれる場合と、空行で終わらない最後のパラグラフを確認する
+
+FIXTURES_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixtures")
+)
+
+# 1バイトずつ読む場合は、全ての"\r\n"と複数バイトの文字がチャンクの境界で分かれる
+CHUNK_SIZES = [1, 2, 3, 4, 5, 7, 16, 4096, READ_CHUNK_SIZE]
+
+
+# readに指定した大きさによらず、chunk_sizeバイトずつ返すストリーム
+class ChunkedStream(io.BytesIO):
+    def __init__(self, data: bytes, chunk_size: int):
+        super().__init__(data)
+        self.chunk_size = chunk_size
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.chunk_size
+        return super().read(min(size, self.chunk_size))
+
+
+def expect(condition: bool, name: str, detail: str):
+    if not condition:
+        appLogger.error(f"check failed: {name}: {detail}")
+        sys.exit(-1)
+    appLogger.info(f"check passed: {name}")
+
+
+# 最初に一致しない位置
+def first_mismatch(actual: list[str], expected: list[str]) -> Optional[str]:
+    for index, (a, b) in enumerate(zip(actual, expected)):
+        if a != b:
+            return f"index={index} actual={a!r} expected={b!r}"
+    if len(actual) != len(expected):
+        return f"count={len(actual)} expected={len(expected)}"
+    return None
+
+
+# フィクスチャが確認したい場合を含んでいること
+def check_fixture(data: bytes):
+    text = data.decode("utf-8", errors="ignore")
+    expect(b"\r\n" in data, "fixture has CRLF line endings", "no CRLF found")
+    expect(
+        any(len(c.encode("utf-8")) > 1 for c in text),
+        "fixture has multibyte UTF-8 characters",
+        "no multibyte characters found",
+    )
+    expect(
+        len(text.encode("utf-8")) < len(data),
+        "fixture has bytes that are not valid UTF-8",
+        "every byte is valid UTF-8",
+    )
+    expect(
+        not data.endswith((b"\n", b"\r")),
+        "fixture does not end with a line break",
+        f"ends with {data[-2:]!r}",
+    )
+
+
+def check_lines(data: bytes):
+    # "\r\n"のほか、"\n"と"\r"のみの改行も同じ行になる
+    variants = {
+        "crlf": data,
+        "lf": data.replace(b"\r\n", b"\n"),
+        "cr": data.replace(b"\r\n", b"\r"),
+    }
+    for name, content in variants.items():
+        expected = content.decode("utf-8", errors="ignore").splitlines()
+        for chunk_size in CHUNK_SIZES:
+            lines = list(iter_lines(ChunkedStream(content, chunk_size)))
+            mismatch = first_mismatch(lines, expected)
+            expect(
+                mismatch is None,
+                f"lines are the same as splitlines: line_endings={name} chunk_size={chunk_size}",
+                f"{mismatch}",
+            )
+
+
+def check_paragraphs(data: bytes, expected: dict):
+    for chunk_size in CHUNK_SIZES:
+        paragraphs = list(iter_paragraphs(iter_lines(ChunkedStream(data, chunk_size))))
+        mismatch = first_mismatch(paragraphs, expected["paragraphs"])
+        expect(
+            mismatch is None,
+            f"paragraphs match the expected json: chunk_size={chunk_size}",
+            f"{mismatch}",
+        )
+
+    # 空行で終わらない最後のパラグラフは対象にしない. 空行を加えると対象になる
+    last_line = data.decode("utf-8", errors="ignore").splitlines()[-1]
+    paragraphs = list(iter_paragraphs(iter_lines(io.BytesIO(data))))
+    expect(
+        all(last_line.strip() not in paragraph for paragraph in paragraphs),
+        "final paragraph without a trailing blank line is left out",
+        f"last_line={last_line!r}",
+    )
+    paragraphs = list(iter_paragraphs(iter_lines(io.BytesIO(data + b"\r\n\r\n"))))
+    expect(
+        len(paragraphs) == len(expected["paragraphs"]) + 1
+        and last_line.strip() in paragraphs[-1],
+        "final paragraph with a trailing blank line is included",
+        f"paragraphs={len(paragraphs)} last={paragraphs[-1]!r}",
+    )
+
+    urls = extract_referencing_urls(iter_paragraphs(iter_lines(io.BytesIO(data))))
+    mismatch = first_mismatch(urls, expected["referencing_urls"])
+    expect(mismatch is None, "referencing urls match the expected json", f"{mismatch}")
+
+
+@click.command()
+@click.option(
+    "--textfile",
+    type=str,
+    default=None,
+    help="RFC本文のファイル. 指定しない場合はfixtures/rfc-text.txt",
+)
+@click.option(
+    "--expected",
+    type=str,
+    default=None,
+    help="--textfileの期待するパラグラフと参照URL(JSON). 指定しない場合はfixtures/rfc-text.json",
+)
+def main(textfile: Optional[str], expected: Optional[str]):
+    appLogger.info(f"app start")
+    appLogger.info(f"command line argument: --textfile = {textfile}")
+    appLogger.info(f"command line argument: --expected = {expected}")
+
+    textfile = textfile or os.path.join(FIXTURES_DIR, "rfc-text.txt")
+    expected = expected or os.path.join(FIXTURES_DIR, "rfc-text.json")
+
+    for path in [textfile, expected]:
+        if not os.path.exists(path):
+            appLogger.error(f"file not found: {path}")
+            sys.exit(-1)
+
+    with open(textfile, mode="rb") as f:
+        data = f.read()
+    with open(expected, mode="r") as f:
+        expected_result = json.load(f)
+
+    check_fixture(data)
+    check_lines(data)
+    check_paragraphs(data, expected_result)
+
+    appLogger.info(f"all checks passed")
+    appLogger.info(f"app finished")
+
+
+if __name__ == "__main__":
+    main(max_content_width=400)
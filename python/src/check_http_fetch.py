@@ -0,0 +1,297 @@
+import sys
+import os
+import logging
+import random
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+
+import http_fetch
+
+
+# Making Python loggers output all messages to stdout in addition to log file
+# https://stackoverflow.com/questions/14058453/making-python-loggers-output-all-messages-to-stdout-in-addition-to-log-file
+formatter = logging.Formatter(
+    "%(asctime)s - %(pathname)s:%(lineno)d - %(levelname)s - %(message)s"
+)
+
+handler = logging.StreamHandler(sys.stdout)
+handler.setLevel(logging.DEBUG)
+handler.setFormatter(formatter)
+
+appLogger = logging.getLogger(__name__)
+appLogger.setLevel(logging.INFO)
+appLogger.addHandler(handler)
+
+
+# http_fetch.pyのダウンロード(200/304/206/416)と、出力のスタンプによる最新判定の確認
+# ローカルにETag・Range・If-Rangeに対応したスタブのHTTPサーバーを立て、実際にダウンロードして確認する
+
+
+# スタブのHTTPサーバー
+# 受け取ったリクエストのヘッダーと返したステータスを、requestsに記録する
+class StubServer(ThreadingHTTPServer):
+    def __init__(self, data: bytes):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.requests: list[tuple[dict, int]] = []
+        # Trueの場合、ボディを半分だけ送って接続を閉じる(ダウンロードの中断)
+        self.interrupt = False
+        self.update(data)
+
+    def update(self, data: bytes):
+        self.data = data
+        self.etag = f'"{len(data)}-{hash(data) & 0xFFFFFFFF:08x}"'
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/rfc-index.xml"
+
+    def statuses(self) -> list[int]:
+        return [status for _, status in self.requests]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status: int):
+        self.server.requests.append((dict(self.headers), status))
+        self.send_response(status)
+
+    def do_GET(self):
+        data, etag = self.server.data, self.server.etag
+
+        if self.headers.get("If-None-Match") == etag:
+            self.respond(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        # If-Rangeが一致しなければ、Rangeを無視して全体を返す
+        start = 0
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range", etag) == etag:
+            start = int(range_header.removeprefix("bytes=").split("-")[0])
+            if start >= len(data):
+                self.respond(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+
+        body = data[start:]
+        self.respond(status)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}"
+            )
+        self.end_headers()
+
+        if self.server.interrupt:
+            body = body[: len(body) // 2]
+            self.close_connection = True
+        self.wfile.write(body)
+
+
+def expect(condition: bool, name: str, detail: str):
+    if not condition:
+        appLogger.error(f"check failed: {name}: {detail}")
+        sys.exit(-1)
+    appLogger.info(f"check passed: {name}")
+
+
+def read_file(path: str) -> bytes:
+    with open(path, mode="rb") as f:
+        return f.read()
+
+
+# 完了していない(中断した)ダウンロードとして記録し直す
+def mark_incomplete(path: str, keep_total: bool = True):
+    meta = http_fetch.load_download_meta(path)
+    meta["complete"] = False
+    if not keep_total:
+        meta.pop("total", None)
+    http_fetch.save_download_meta(path, meta)
+
+
+def check_download(server: StubServer, path: str):
+    url = server.url
+
+    # 200: 初回は全体をダウンロードする
+    server.requests.clear()
+    modified = http_fetch.download(url, path)
+    headers, status = server.requests[-1]
+    expect(
+        modified and status == 200 and read_file(path) == server.data,
+        "200 full download",
+        f"modified={modified} statuses={server.statuses()}",
+    )
+    expect(
+        headers.get("Accept-Encoding") == "identity",
+        "Accept-Encoding: identity",
+        f"headers={headers}",
+    )
+
+    # 304: 上流に変更がなければダウンロードしない
+    server.requests.clear()
+    modified = http_fetch.download(url, path)
+    expect(
+        not modified and server.statuses() == [304],
+        "304 not modified",
+        f"modified={modified} statuses={server.statuses()}",
+    )
+
+    # 206: 中断したダウンロードを続きから再開する
+    mark_incomplete(path)
+    server.interrupt = True
+    try:
+        http_fetch.download(url, path)
+    except Exception as e:
+        appLogger.info(f"download interrupted as expected: {e}")
+    server.interrupt = False
+    partial = os.path.getsize(path)
+    expect(
+        0 < partial < len(server.data)
+        and not http_fetch.load_download_meta(path)["complete"],
+        "interrupted download is left incomplete",
+        f"size={partial} meta={http_fetch.load_download_meta(path)}",
+    )
+
+    server.requests.clear()
+    modified = http_fetch.download(url, path)
+    headers, status = server.requests[-1]
+    expect(
+        modified
+        and status == 206
+        and headers.get("Range") == f"bytes={partial}-"
+        and read_file(path) == server.data,
+        "206 resumed download",
+        f"modified={modified} statuses={server.statuses()} range={headers.get('Range')}",
+    )
+
+    # 416: 最後まで書き込んだが完了を記録する前に中断した場合(全体のサイズの記録がない以前の形式)は、最初から取得し直す
+    mark_incomplete(path, keep_total=False)
+    server.requests.clear()
+    modified = http_fetch.download(url, path)
+    expect(
+        modified
+        and server.statuses() == [416, 200]
+        and read_file(path) == server.data
+        and http_fetch.load_download_meta(path)["complete"],
+        "416 restarts from 0",
+        f"modified={modified} statuses={server.statuses()}",
+    )
+
+    # 全体のサイズの記録があれば、Rangeを送らずに最初から取得し直す
+    mark_incomplete(path)
+    server.requests.clear()
+    modified = http_fetch.download(url, path)
+    headers, status = server.requests[-1]
+    expect(
+        modified
+        and server.statuses() == [200]
+        and "Range" not in headers
+        and read_file(path) == server.data,
+        "complete size without the complete flag restarts from 0",
+        f"modified={modified} statuses={server.statuses()} headers={headers}",
+    )
+
+    # 中断後に上流が変わった場合は、If-Rangeが一致しないため全体を取得し直す
+    mark_incomplete(path)
+    with open(path, mode="r+b") as f:
+        f.truncate(len(server.data) // 2)
+    server.update(server.data[::-1])
+    server.requests.clear()
+    modified = http_fetch.download(url, path)
+    expect(
+        modified and server.statuses() == [200] and read_file(path) == server.data,
+        "changed upstream restarts from 0",
+        f"modified={modified} statuses={server.statuses()}",
+    )
+
+
+def check_output_stamp(artifact: str, output: str):
+    with open(output, mode="w") as f:
+        f.write("[]")
+    stamp = http_fetch.output_stamp({"format": "json"}, [__file__])
+    http_fetch.save_output_stamp(output, stamp)
+
+    expect(
+        http_fetch.is_up_to_date(output, artifact, False, stamp),
+        "same options and sources are up to date",
+        f"stamp={http_fetch.load_output_stamp(output)}",
+    )
+    expect(
+        not http_fetch.is_up_to_date(output, artifact, True, stamp),
+        "modified upstream is not up to date",
+        "is_up_to_date returned True",
+    )
+    expect(
+        not http_fetch.is_up_to_date(
+            output,
+            artifact,
+            False,
+            http_fetch.output_stamp({"format": "ndjson"}, [__file__]),
+        ),
+        "changed options are not up to date",
+        "is_up_to_date returned True",
+    )
+    expect(
+        not http_fetch.is_up_to_date(
+            output,
+            artifact,
+            False,
+            http_fetch.output_stamp({"format": "json"}, [http_fetch.__file__]),
+        ),
+        "changed sources are not up to date",
+        "is_up_to_date returned True",
+    )
+
+    http_fetch.discard_output_stamp(output)
+    expect(
+        not http_fetch.is_up_to_date(output, artifact, False, stamp),
+        "output without a stamp is not up to date",
+        "is_up_to_date returned True",
+    )
+
+
+@click.command()
+@click.option(
+    "--size",
+    type=click.IntRange(min=1024),
+    default=1024 * 1024,
+    show_default=True,
+    help="スタブのHTTPサーバーが返すファイルのサイズ(バイト)",
+)
+def main(size: int):
+    appLogger.info(f"app start")
+    appLogger.info(f"command line argument: --size = {size}")
+
+    server = StubServer(random.Random(0).randbytes(size))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    appLogger.info(f"stub server started: url={server.url}")
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "rfc-index.xml")
+            check_download(server, path)
+            check_output_stamp(path, os.path.join(workdir, "rfc-index.json"))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    appLogger.info(f"all checks passed")
+    appLogger.info(f"app finished")
+
+
+if __name__ == "__main__":
+    main(max_content_width=400)
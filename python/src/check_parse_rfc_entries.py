@@ -0,0 +1,165 @@
+import sys
+import os
+import io
+import json
+import logging
+from typing import Optional
+
+import click
+
+from trasform_rfc_index_to_json import iter_rfc_entries, write_json_array
+
+
+# Making Python loggers output all messages to stdout in addition to log file
+# https://stackoverflow.com/questions/14058453/making-python-loggers-output-all-messages-to-stdout-in-addition-to-log-file
+formatter = logging.Formatter(
+    "%(asctime)s - %(pathname)s:%(lineno)d - %(levelname)s - %(message)s"
+)
+
+handler = logging.StreamHandler(sys.stdout)
+handler.setLevel(logging.DEBUG)
+handler.setFormatter(formatter)
+
+appLogger = logging.getLogger(__name__)
+appLogger.setLevel(logging.INFO)
+appLogger.addHandler(handler)
+
+
+# trasform_rfc_index_to_json.pyのRFC Indexの解析の確認
+# 切り詰めたRFC IndexのXML(fixtures/rfc-index.xml)を解析し、期待する結果のJSONと比較する
+# 以前の解析方法の誤り(obsoleted_byがrfc-entry直下のdoc-idを参照していた、see_alsoが1件目のみだった)も確認する
+
+FIXTURES_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixtures")
+)
+
+
+def expect(condition: bool, name: str, detail: str):
+    if not condition:
+        appLogger.error(f"check failed: {name}: {detail}")
+        sys.exit(-1)
+    appLogger.info(f"check passed: {name}")
+
+
+def load_json(path: str):
+    with open(path, mode="r") as f:
+        return json.load(f)
+
+
+# 値とキーの順序(出力するJSONのキーの順序になる)が一致しない最初のエントリ
+def first_mismatch(actual: list[dict], expected: list[dict]) -> Optional[str]:
+    for a, b in zip(actual, expected):
+        if a != b or list(a) != list(b):
+            return f"doc_id={b.get('doc_id')} actual={a} expected={b}"
+    if len(actual) != len(expected):
+        return f"entries={len(actual)} expected={len(expected)}"
+    return None
+
+
+def find_entry(entries: list[dict], doc_id: str) -> dict:
+    return next((entry for entry in entries if entry["doc_id"] == doc_id), {})
+
+
+def check_entries(xmlfile: str, expected_file: str, expected_subseries_file: str):
+    subseries_entries = []
+    with open(xmlfile, mode="rb") as f:
+        entries = list(iter_rfc_entries(f, subseries_entries))
+
+    mismatch = first_mismatch(entries, load_json(expected_file))
+    expect(mismatch is None, "rfc entries match the expected json", f"{mismatch}")
+
+    mismatch = first_mismatch(subseries_entries, load_json(expected_subseries_file))
+    expect(mismatch is None, "subseries entries match the expected json", f"{mismatch}")
+
+    # --subseries-fileを指定しない場合も、rfc-entryの結果は変わらない
+    with open(xmlfile, mode="rb") as f:
+        without_subseries = list(iter_rfc_entries(f))
+    expect(
+        without_subseries == entries,
+        "rfc entries do not depend on the subseries entries",
+        f"entries={len(without_subseries)} expected={len(entries)}",
+    )
+
+    # obsoleted_byは、rfc-entry直下のdoc-idではなくobsoleted-by/doc-idの全て
+    obsoleted_by = find_entry(entries, "RFC2616").get("obsoleted_by")
+    expect(
+        obsoleted_by
+        == ["RFC7230", "RFC7231", "RFC7232", "RFC7233", "RFC7234", "RFC7235"],
+        "obsoleted_by lists every obsoleted-by/doc-id",
+        f"obsoleted_by={obsoleted_by}",
+    )
+
+    # see_alsoは、1件目だけでなくsee-also/doc-idの全て
+    see_also = find_entry(entries, "RFC8174").get("see_also")
+    expect(
+        see_also == ["RFC2119", "BCP0014"],
+        "see_also lists every see-also/doc-id",
+        f"see_also={see_also}",
+    )
+
+    return entries
+
+
+# write_json_arrayの出力は、json.dumps(list)と同一になる
+def check_json_array(entries: list[dict]):
+    for target in [entries, []]:
+        for pretty_print in [False, True]:
+            expected = json.dumps(target, indent=4 if pretty_print else None)
+            f = io.StringIO()
+            write_json_array(target, f, pretty_print)
+            expect(
+                f.getvalue() == expected,
+                f"json array is the same as json.dumps: entries={len(target)} pretty_print={pretty_print}",
+                f"output={f.getvalue()[:200]}",
+            )
+
+
+@click.command()
+@click.option(
+    "--xmlfile",
+    type=str,
+    default=None,
+    help="RFC IndexのXMLファイル. 指定しない場合はfixtures/rfc-index.xml",
+)
+@click.option(
+    "--expected",
+    type=str,
+    default=None,
+    help="--xmlfileのrfc-entryの期待する解析結果(JSON). 指定しない場合はfixtures/rfc-index.json",
+)
+@click.option(
+    "--expected-subseries",
+    type=str,
+    default=None,
+    help="--xmlfileのbcp-entryなどの期待する解析結果(JSON). 指定しない場合はfixtures/rfc-subseries.json",
+)
+def main(
+    xmlfile: Optional[str], expected: Optional[str], expected_subseries: Optional[str]
+):
+    appLogger.info(f"app start")
+    appLogger.info(f"command line argument: --xmlfile = {xmlfile}")
+    appLogger.info(f"command line argument: --expected = {expected}")
+    appLogger.info(
+        f"command line argument: --expected-subseries = {expected_subseries}"
+    )
+
+    xmlfile = xmlfile or os.path.join(FIXTURES_DIR, "rfc-index.xml")
+    expected = expected or os.path.join(FIXTURES_DIR, "rfc-index.json")
+    expected_subseries = expected_subseries or os.path.join(
+        FIXTURES_DIR, "rfc-subseries.json"
+    )
+
+    for path in [xmlfile, expected, expected_subseries]:
+        if not os.path.exists(path):
+            appLogger.error(f"file not found: {path}")
+            sys.exit(-1)
+
+    entries = check_entries(xmlfile, expected, expected_subseries)
+    check_json_array(entries)
+
+    appLogger.info(f"all checks passed")
+    appLogger.info(f"app finished")
+
+
+if __name__ == "__main__":
+    main(max_content_width=400)
@@ -1,14 +1,14 @@
 import sys
 import os
 import logging
-import json
-import re
-from typing import TypedDict, Dict, List, Optional
+from typing import Callable, TypedDict, Dict, Optional
 
 
 import click
 import duckdb
-import pandas as pd
+
+from parquet_export import RFC_INDEX_COLUMNS, SUBSERIES_COLUMNS, is_parquet_file
+from run_metrics import RunMetrics
 
 
 # Making Python loggers output all messages to stdout in addition to log file
@@ -30,6 +30,7 @@ appLogger.addHandler(handler)
 # https://qiita.com/simonritchie/items/63218b0a5c4a3d3632a1
 class RFCEntry(TypedDict):
     doc_id: str
+    rfc_number: int
     title: str
     author: list[dict]
     date: dict
@@ -56,52 +57,1207 @@ class RFCEntry(TypedDict):
     doi: str
 
 
-# https://qiita.com/papi_tokei/items/2a309d313bc6fc5661c3
-RFCReferenceMap = Dict[str, Optional[List[str]]]
+# 正規化に使うSQLマクロ
+# Pythonで要素ごとに正規表現を適用する代わりに、DuckDB上で全行をまとめて処理する
+#
+# * remove_zerofill: "RFC0001" -> "RFC1"
+# * rfc_number: "RFC0001" -> 1 (RFC以外のdoc_id("BCP0014"など)はNULL)
+# * normalize_doc_ids: 配列の各要素にremove_zerofillを適用する. 空の配列はNULLとして扱う
+NORMALIZE_MACROS = """
+    CREATE OR REPLACE TEMP MACRO remove_zerofill(doc_id) AS
+        regexp_replace(doc_id, '^RFC0+', 'RFC');
+    CREATE OR REPLACE TEMP MACRO rfc_number(doc_id) AS
+        TRY_CAST(regexp_replace(doc_id, '^RFC0*', '') AS INTEGER);
+    CREATE OR REPLACE TEMP MACRO normalize_doc_ids(doc_ids) AS
+        CASE WHEN len(doc_ids) > 0
+            THEN list_transform(doc_ids, x -> remove_zerofill(x))
+        END;
+"""
 
-RFCReferences = Dict[str, List[str]]
+# 参照URLからRFC番号を取り出すパターン
+RFC_PATTERN = r"((rfc|RFC)[0-9]+)"
 
-RFCReferencedBy = Dict[str, List[str]]
+# 参照URL(小文字にしたもの)からサブシリーズと番号を取り出すパターン
+# Example: https://www.rfc-editor.org/info/bcp90 -> ("bcp", "90")
+SUBSERIES_PATTERN = r"/(bcp|std|fyi)([0-9]+)"
 
+# 参照URLのJSONはファイル全体が1つのオブジェクトなので、DuckDBの既定の上限(16MB)を超えうる
+MAXIMUM_OBJECT_SIZE = 1024 * 1024 * 1024
 
-def remove_zerofill(doc_id: str):
-    return re.sub(r"^RFC0+", "RFC", doc_id)
 
+# RFC Index(JSON配列、NDJSONまたはParquet)をDuckDBに直接読み込み、一時テーブルrfc_indexに格納する
+# JSON配列かNDJSONかはDuckDBが判定する. NDJSONの場合はFIFOなどを使って前段の書き込み中から読み込みを開始できる
+# Parquet(拡張子が.parquet)の場合は、JSONと同じカラム名と型で読み込む
+def stage_rfc_index(conn: duckdb.DuckDBPyConnection, path: str) -> int:
+    if is_parquet_file(path):
+        columns = ", ".join(
+            f"CAST({name} AS {column_type}) AS {name}"
+            for name, column_type in RFC_INDEX_COLUMNS.items()
+        )
+        source = f"SELECT {columns} FROM read_parquet(?)"
+    else:
+        columns = ", ".join(
+            f"{name}: '{column_type}'"
+            for name, column_type in RFC_INDEX_COLUMNS.items()
+        )
+        source = f"SELECT * FROM read_json(?, format = 'auto', columns = {{{columns}}})"
 
-def mappingReferences(
-    referenceMap: RFCReferenceMap, verbose: bool = False
-) -> tuple[RFCReferences, RFCReferencedBy]:
-    # Mapping
-    rfc_pattern = re.compile(r"((rfc|RFC)[0-9]+)")
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE rfc_index AS
+        {source};
+        """,
+        [path],
+    )
+    return conn.execute("SELECT count(*) FROM rfc_index;").fetchone()[0]
 
-    references: RFCReferences = {}
-    referenced_by: RFCReferencedBy = {}
 
-    for doc_id, urls in referenceMap.items():
-        for url in urls:
-            matched = rfc_pattern.findall(url)
-            if len(matched) > 0:
-                refer = matched[0][0].upper()
-                if verbose:
-                    appLogger.info(f"{doc_id} -> {refer}")
+# extract_rfc_referencing_urls_from_rfc_txts.pyの結果をDuckDBに直接読み込み、
+# 参照元と参照先のRFCの組を一時テーブルrfc_referencing_edgesに格納する
+# 同じ読み込みで、サブシリーズ(BCP, STD, FYI)への参照を一時テーブルrfc_subseries_referencing_edgesに格納する
+#
+# Format(JSON):     { "<doc_id>": [ "<url>", ... ], ... }
+# Format(Parquet):  1行1RFCで(rfc_number, doc_id, urls)
+#
+# 元の出現順(doc_pos, url_pos)も保持し、同じRFC番号どうしの並び順を安定させる
+def stage_rfc_referencing_edges(conn: duckdb.DuckDBPyConnection, path: str) -> int:
+    if is_parquet_file(path):
+        # Parquetの行の順序を出現順とする
+        referencing_urls = """
+            SELECT
+                doc_id,
+                urls,
+                file_row_number + 1 AS doc_pos
+            FROM read_parquet(?, file_row_number = true)
+        """
+    else:
+        referencing_urls = f"""
+            SELECT
+                unnest(map_keys(json)) AS doc_id,
+                unnest(map_values(json)) AS urls,
+                generate_subscripts(map_keys(json), 1) AS doc_pos
+            FROM read_json(
+                ?,
+                format = 'unstructured',
+                records = false,
+                maximum_object_size = {MAXIMUM_OBJECT_SIZE},
+                columns = {{json: 'MAP(TEXT, TEXT[])'}}
+            )
+        """
+
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE rfc_referencing_url_rows AS
+        WITH referencing_urls AS (
+            {referencing_urls}
+        )
+        SELECT
+            doc_id,
+            doc_pos,
+            unnest(urls) AS url,
+            generate_subscripts(urls, 1) AS url_pos
+        FROM referencing_urls;
+        """,
+        [path],
+    )
+
+    # RFCへの参照とサブシリーズへの参照を、展開したURLからそれぞれ取り出す
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE rfc_referencing_edges AS
+        SELECT
+            doc_id,
+            upper(regexp_extract(url, '{RFC_PATTERN}', 1)) AS refer,
+            doc_pos,
+            url_pos
+        FROM rfc_referencing_url_rows
+        WHERE regexp_matches(url, '{RFC_PATTERN}')
+        ORDER BY doc_pos, url_pos;
+
+        CREATE OR REPLACE TEMP TABLE rfc_subseries_referencing_edges AS
+        SELECT
+            doc_id,
+            regexp_extract(lower(url), '{SUBSERIES_PATTERN}', 1) AS series,
+            CAST(regexp_extract(lower(url), '{SUBSERIES_PATTERN}', 2) AS INTEGER) AS number
+        FROM rfc_referencing_url_rows
+        WHERE regexp_matches(lower(url), '{SUBSERIES_PATTERN}');
+
+        DROP TABLE rfc_referencing_url_rows;
+        """
+    )
+    return conn.execute("SELECT count(*) FROM rfc_referencing_edges;").fetchone()[0]
+
+
+# rfc_referencing_edgesから、RFCごとの参照先(references)、被参照元(referenced_by)を集計し、
+# 一時テーブルrfc_referencesに格納する
+# 自分自身への参照は除き、RFC番号順に並べる
+def prepare_rfc_references(conn: duckdb.DuckDBPyConnection):
+    conn.execute(
+        """
+        CREATE OR REPLACE TEMP TABLE rfc_references AS
+        WITH edges AS (
+            SELECT * FROM rfc_referencing_edges WHERE doc_id <> refer
+        ),
+        refs AS (
+            SELECT
+                doc_id,
+                list(refer ORDER BY rfc_number(refer), doc_pos, url_pos) AS refs
+            FROM edges
+            GROUP BY doc_id
+        ),
+        referenced_by AS (
+            SELECT
+                refer AS doc_id,
+                list(doc_id ORDER BY rfc_number(doc_id), doc_pos, url_pos) AS referenced_by
+            FROM edges
+            GROUP BY refer
+        )
+        SELECT doc_id, refs AS "references", referenced_by
+        FROM refs
+        FULL OUTER JOIN referenced_by USING (doc_id);
+        """
+    )
+
+
+# 検索用のカラム(search_blob)の値
+# 画面の検索対象のカラムを全て小文字にして連結し、検索時はこのカラムのみを対象にする
+#
+# カラムの区切りには検索語に含まれることのない改行(chr(10))を使い、カラムをまたいで一致しないようにする
+# 配列の要素は、従来の検索(array_to_string(..., ' '))と同じく空白で区切る
+# 著者は1人ずつ名前と肩書きをそれぞれ区切る
+SEARCH_BLOB_COLUMNS = [
+    "doc_id",
+    "title",
+    "array_to_string(list_transform(author, x -> concat_ws(chr(10), x.name, x.title)), chr(10))",
+    "date.year",
+    "date.month",
+    "date.day",
+    "array_to_string(format, ' ')",
+    "page_count",
+    "array_to_string(keywords, ' ')",
+    "array_to_string(is_also, ' ')",
+    "array_to_string(obsoletes, ' ')",
+    "array_to_string(obsoleted_by, ' ')",
+    "array_to_string(updates, ' ')",
+    "array_to_string(updated_by, ' ')",
+    "array_to_string(see_also, ' ')",
+    "array_to_string(\"references\", ' ')",
+    "array_to_string(referenced_by, ' ')",
+    "abstract",
+    "draft",
+    "current_status",
+    "publication_status",
+    "stream",
+    "errata_url",
+    "area",
+    "wg_acronym",
+    "doi",
+]
+
+
+def search_blob_expression(columns: list[str]) -> str:
+    return f"lower(concat_ws(chr(10), {', '.join(columns)}))"
+
+
+SEARCH_BLOB = search_blob_expression(SEARCH_BLOB_COLUMNS)
+
+
+# rfc_entriesのカラム(定義順)
+RFC_ENTRIES_COLUMNS = """
+    doc_id, rfc_number, title, author, date, format, page_count, keywords,
+    is_also, obsoletes, obsoleted_by, updates, updated_by, see_also,
+    "references", referenced_by,
+    abstract, draft, current_status, publication_status, stream,
+    errata_url, area, wg_acronym, doi,
+    search_blob
+"""
+
+
+# 一時テーブルrfc_indexを正規化し、rfc_entriesと同じカラムを持つ一時テーブルrfc_entries_stagingに格納する
+#
+# references, referenced_byは実際のデータには含まれないカラムなので、rfc_referencesから結合する
+# RFC Indexの順番(pos)を保持する
+def stage_rfc_entries(conn: duckdb.DuckDBPyConnection):
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE rfc_entries_staging AS
+        WITH entries AS (
+            SELECT
+                entries.pos,
+                entries.doc_id, rfc_number(entries.doc_id) AS rfc_number, title, author, date, format, page_count, keywords,
+                is_also, obsoletes, obsoleted_by, updates, updated_by, see_also,
+                rfc_references."references", rfc_references.referenced_by,
+                abstract, draft, current_status, publication_status, stream,
+                errata_url, area, wg_acronym, doi
+            FROM (
+                SELECT
+                    rowid AS pos,
+                    * REPLACE (
+                        remove_zerofill(doc_id) AS doc_id,
+                        normalize_doc_ids(is_also) AS is_also,
+                        normalize_doc_ids(obsoletes) AS obsoletes,
+                        normalize_doc_ids(obsoleted_by) AS obsoleted_by,
+                        normalize_doc_ids(updates) AS updates,
+                        normalize_doc_ids(updated_by) AS updated_by,
+                        normalize_doc_ids(see_also) AS see_also
+                    )
+                FROM rfc_index
+            ) AS entries
+            LEFT JOIN rfc_references ON entries.doc_id = rfc_references.doc_id
+        )
+        SELECT
+            pos,
+            doc_id, rfc_number, title, author, date, format, page_count, keywords,
+            is_also, obsoletes, obsoleted_by, updates, updated_by, see_also,
+            "references", referenced_by,
+            abstract, draft, current_status, publication_status, stream,
+            errata_url, area, wg_acronym, doi,
+            {SEARCH_BLOB} AS search_blob
+        FROM entries
+        ORDER BY pos;
+        """
+    )
+
+
+# rfc_entries_stagingを全てrfc_entriesに投入する
+# カラム名を明示してINSERTするため、カラムの定義順とSELECTの順番に依存しない
+def insert_rfc_entries(conn: duckdb.DuckDBPyConnection):
+    conn.execute(
+        f"""
+        INSERT INTO rfc_entries ({RFC_ENTRIES_COLUMNS})
+        SELECT {RFC_ENTRIES_COLUMNS} FROM rfc_entries_staging ORDER BY pos;
+        """
+    )
+
+
+# rfc_entries_stagingと既存のrfc_entriesをdoc_idごとに比較し、差分のみを反映する
+# 行の内容はカラムの値をJSONにしたもののハッシュで比較する(NULLと空の配列も区別される)
+#
+# * insert: rfc_entries_stagingにのみ存在する
+# * update: 両方に存在し、内容が異なる(または既存の行が重複している)
+# * delete: rfc_entriesにのみ存在する
+#
+# 変更のあった行は一時テーブルrfc_entries_changes(doc_id, rfc_number, change)に残し、
+# 派生テーブルの更新対象を絞り込むのに使う
+def upsert_rfc_entries(conn: duckdb.DuckDBPyConnection) -> Dict[str, int]:
+    content_hash = f"md5(CAST(to_json(struct_pack({RFC_ENTRIES_COLUMNS})) AS TEXT))"
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE rfc_entries_changes AS
+        WITH current AS (
+            SELECT doc_id, any_value(rfc_number) AS rfc_number, min({content_hash}) AS content_hash, count(*) AS copies
+            FROM rfc_entries
+            GROUP BY doc_id
+        ),
+        incoming AS (
+            SELECT doc_id, rfc_number, {content_hash} AS content_hash
+            FROM rfc_entries_staging
+        ),
+        changes AS (
+            SELECT
+                doc_id,
+                coalesce(incoming.rfc_number, current.rfc_number) AS rfc_number,
+                CASE
+                    WHEN current.doc_id IS NULL THEN 'insert'
+                    WHEN incoming.doc_id IS NULL THEN 'delete'
+                    WHEN current.content_hash <> incoming.content_hash OR current.copies > 1 THEN 'update'
+                END AS change
+            FROM current
+            FULL OUTER JOIN incoming USING (doc_id)
+        )
+        SELECT * FROM changes WHERE change IS NOT NULL;
+        """
+    )
+    conn.execute(
+        f"""
+        DELETE FROM rfc_entries
+        WHERE doc_id IN (SELECT doc_id FROM rfc_entries_changes WHERE change IN ('update', 'delete'));
+
+        INSERT INTO rfc_entries ({RFC_ENTRIES_COLUMNS})
+        SELECT {RFC_ENTRIES_COLUMNS}
+        FROM rfc_entries_staging
+        WHERE doc_id IN (SELECT doc_id FROM rfc_entries_changes WHERE change IN ('insert', 'update'))
+        ORDER BY pos;
+        """
+    )
+    counts = {"insert": 0, "update": 0, "delete": 0}
+    for change, count in conn.execute(
+        "SELECT change, count(*) FROM rfc_entries_changes GROUP BY change;"
+    ).fetchall():
+        counts[change] = count
+    return counts
+
+
+# 派生テーブルを、変更のあった行(rfc_entries_changes)の分だけ更新できるか
+# テーブルが空の場合(初回や、オプションを初めて指定した場合など)は全て作り直す
+def can_update_incrementally(conn: duckdb.DuckDBPyConnection, table: str) -> bool:
+    return conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table});").fetchone()[0]
+
+
+# rfc_entriesの配列カラム(references, obsoletes, updates, is_also, see_also)から、
+# RFC番号どうしの関係をrfc_edgesに展開する
+# 逆向きの関係(referenced_by, obsoleted_by, updated_by)はdstで引けばよいので展開しない
+#
+# RFC以外への関係(BCP, STD, FYIなど)は整数のキーで表せないため含めない(サブシリーズはrfc_subseries_membersで扱う)
+# (src, kind, dst)の順に並べて投入し、srcでの検索が連続した範囲の読み込みで済むようにする
+#
+# incrementalの場合、変更のあったRFC(rfc_entries_changes)をsrcとする関係のみを入れ替える
+# (入れ替えた分は末尾に追加されるため、全て作り直すまでは並び順が崩れる)
+def insert_rfc_edges(conn: duckdb.DuckDBPyConnection, incremental: bool = False) -> int:
+    condition = (
+        "src IN (SELECT rfc_number FROM rfc_entries_changes)" if incremental else "true"
+    )
+    conn.execute(f"DELETE FROM rfc_edges WHERE {condition};")
+    conn.execute(
+        f"""
+        INSERT INTO rfc_edges (src, dst, kind)
+        WITH edges AS (
+            SELECT rfc_number AS src, unnest("references") AS dst, 'references' AS kind FROM rfc_entries
+            UNION ALL
+            SELECT rfc_number AS src, unnest(obsoletes) AS dst, 'obsoletes' AS kind FROM rfc_entries
+            UNION ALL
+            SELECT rfc_number AS src, unnest(updates) AS dst, 'updates' AS kind FROM rfc_entries
+            UNION ALL
+            SELECT rfc_number AS src, unnest(is_also) AS dst, 'is_also' AS kind FROM rfc_entries
+            UNION ALL
+            SELECT rfc_number AS src, unnest(see_also) AS dst, 'see_also' AS kind FROM rfc_entries
+        )
+        SELECT DISTINCT src, rfc_number(dst) AS dst, CAST(kind AS rfc_edge_kind) AS kind
+        FROM edges
+        WHERE src IS NOT NULL AND rfc_number(dst) IS NOT NULL
+            AND {condition}
+        ORDER BY src, kind, dst;
+        """
+    )
+    return conn.execute("SELECT count(*) FROM rfc_edges;").fetchone()[0]
+
+
+# trasform_rfc_index_to_json.pyの--subseries-fileの結果(JSON配列、NDJSONまたはParquet)をDuckDBに直接読み込み、
+# 一時テーブルrfc_subseries_indexに格納する
+def stage_rfc_subseries(conn: duckdb.DuckDBPyConnection, path: str) -> int:
+    if is_parquet_file(path):
+        columns = ", ".join(
+            f"CAST({name} AS {column_type}) AS {name}"
+            for name, column_type in SUBSERIES_COLUMNS.items()
+        )
+        source = f"SELECT {columns} FROM read_parquet(?)"
+    else:
+        columns = ", ".join(
+            f"{name}: '{column_type}'"
+            for name, column_type in SUBSERIES_COLUMNS.items()
+        )
+        source = f"SELECT * FROM read_json(?, format = 'auto', columns = {{{columns}}})"
+
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE rfc_subseries_index AS
+        {source};
+        """,
+        [path],
+    )
+    return conn.execute("SELECT count(*) FROM rfc_subseries_index;").fetchone()[0]
+
+
+# rfc_subseries_indexから、サブシリーズ(rfc_subseries)、サブシリーズを構成するRFC(rfc_subseries_members)、
+# 欠番のRFC(rfc_not_issued)を全て作り直す
+# 件数が少ないため、incrementalの場合も差分は取らない
+#
+# (series, number, rfc_number)の順に並べて投入し、サブシリーズでの検索が連続した範囲の読み込みで済むようにする
+def insert_rfc_subseries(conn: duckdb.DuckDBPyConnection) -> Dict[str, int]:
+    conn.execute(
+        """
+        DELETE FROM rfc_subseries;
+        DELETE FROM rfc_subseries_members;
+        DELETE FROM rfc_not_issued;
+
+        CREATE OR REPLACE TEMP TABLE rfc_subseries_staging AS
+        SELECT
+            CAST(kind AS rfc_subseries_kind) AS series,
+            TRY_CAST(regexp_extract(doc_id, '[0-9]+$') AS INTEGER) AS number,
+            title,
+            is_also
+        FROM rfc_subseries_index
+        WHERE kind IN ('bcp', 'std', 'fyi');
+
+        INSERT INTO rfc_subseries (series, number, title)
+        SELECT series, number, title
+        FROM rfc_subseries_staging
+        WHERE number IS NOT NULL
+        ORDER BY series, number;
+
+        INSERT INTO rfc_subseries_members (series, number, rfc_number)
+        WITH members AS (
+            SELECT series, number, rfc_number(unnest(is_also)) AS rfc_number
+            FROM rfc_subseries_staging
+        )
+        SELECT DISTINCT series, number, rfc_number
+        FROM members
+        WHERE number IS NOT NULL AND rfc_number IS NOT NULL
+        ORDER BY series, number, rfc_number;
+
+        INSERT INTO rfc_not_issued (rfc_number)
+        SELECT DISTINCT rfc_number(doc_id) AS rfc_number
+        FROM rfc_subseries_index
+        WHERE kind = 'rfc-not-issued' AND rfc_number(doc_id) IS NOT NULL
+        ORDER BY rfc_number;
+        """
+    )
+    counts = {}
+    for table in ["rfc_subseries", "rfc_subseries_members", "rfc_not_issued"]:
+        counts[table] = conn.execute(f"SELECT count(*) FROM {table};").fetchone()[0]
+    return counts
+
+
+# rfc_subseries_referencing_edgesから、RFCからサブシリーズへの参照をrfc_subseries_referencesに全て作り直す
+# 参照先のRFCへの解決は、rfc_subseries_membersとの結合で検索時に行う(rfc_subseries_reference_edges)
+# サブシリーズの構成が変わっても、参照URLを読み込み直す必要はない
+def insert_rfc_subseries_references(conn: duckdb.DuckDBPyConnection) -> int:
+    conn.execute(
+        """
+        DELETE FROM rfc_subseries_references;
+
+        INSERT INTO rfc_subseries_references (src, series, number)
+        SELECT DISTINCT
+            rfc_number(doc_id) AS src,
+            CAST(series AS rfc_subseries_kind) AS series,
+            number
+        FROM rfc_subseries_referencing_edges
+        WHERE rfc_number(doc_id) IS NOT NULL
+        ORDER BY src, series, number;
+        """
+    )
+    return conn.execute("SELECT count(*) FROM rfc_subseries_references;").fetchone()[0]
+
+
+# (src, dst)の辺を持つテーブルedgesから推移閉包を求め、一時テーブルclosure(src, dst, depth)に格納する
+# 深さごとに1回ずつ、前回新たに到達した組(frontier)から1辺だけ辿る(幅優先探索をSQLで全行まとめて行う)
+# 既に到達済みの組は除くため、depthは最短の深さになり、循環があっても終了する
+#
+# max_depthを指定した場合、その深さまでで打ち切る
+def build_transitive_closure(
+    conn: duckdb.DuckDBPyConnection, edges: str, max_depth: Optional[int] = None
+) -> int:
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE closure AS
+        SELECT DISTINCT src, dst, 1 AS depth FROM {edges} WHERE src <> dst;
+        CREATE OR REPLACE TEMP TABLE frontier AS
+        SELECT src, dst FROM closure;
+        """
+    )
+
+    depth = 1
+    while max_depth is None or depth < max_depth:
+        depth += 1
+        conn.execute(
+            f"""
+            CREATE OR REPLACE TEMP TABLE frontier AS
+            SELECT DISTINCT frontier.src, {edges}.dst
+            FROM frontier
+            JOIN {edges} ON frontier.dst = {edges}.src
+            WHERE frontier.src <> {edges}.dst
+                AND NOT EXISTS (
+                    SELECT 1 FROM closure
+                    WHERE closure.src = frontier.src AND closure.dst = {edges}.dst
+                );
+            """
+        )
+        if conn.execute("SELECT count(*) FROM frontier;").fetchone()[0] == 0:
+            break
+
+        conn.execute(f"INSERT INTO closure SELECT src, dst, {depth} FROM frontier;")
+
+    return conn.execute("SELECT count(*) FROM closure;").fetchone()[0]
+
+
+# 廃止(obsoleted_by)、更新(updated_by)を辿った後継のRFCをrfc_successorsに格納する
+# rfc_edgesのobsoletes, updatesを逆向きに辿る
+# is_currentは、その後継がさらに廃止(または更新)されていない、最新のRFCであることを示す
+def insert_rfc_successors(conn: duckdb.DuckDBPyConnection) -> int:
+    conn.execute("DELETE FROM rfc_successors;")
+    for edge_kind, kind in [("obsoletes", "obsoleted_by"), ("updates", "updated_by")]:
+        conn.execute(
+            f"""
+            CREATE OR REPLACE TEMP TABLE successor_edges AS
+            SELECT dst AS src, src AS dst FROM rfc_edges WHERE kind = '{edge_kind}';
+            """
+        )
+        build_transitive_closure(conn, "successor_edges")
+        conn.execute(
+            f"""
+            INSERT INTO rfc_successors (src, dst, kind, depth, is_current)
+            SELECT
+                src,
+                dst,
+                '{kind}',
+                depth,
+                NOT EXISTS (
+                    SELECT 1 FROM successor_edges WHERE successor_edges.src = closure.dst
+                )
+            FROM closure
+            ORDER BY src, depth, dst;
+            """
+        )
+    return conn.execute("SELECT count(*) FROM rfc_successors;").fetchone()[0]
+
+
+# 参照(references)を推移的に辿ったRFCをrfc_reference_closureに格納する
+def insert_rfc_reference_closure(
+    conn: duckdb.DuckDBPyConnection, max_depth: Optional[int] = None
+) -> int:
+    conn.execute("DELETE FROM rfc_reference_closure;")
+    conn.execute(
+        """
+        CREATE OR REPLACE TEMP TABLE reference_edges AS
+        SELECT src, dst FROM rfc_edges WHERE kind = 'references';
+        """
+    )
+    build_transitive_closure(conn, "reference_edges", max_depth)
+    conn.execute(
+        """
+        INSERT INTO rfc_reference_closure (src, dst, depth)
+        SELECT src, dst, depth FROM closure ORDER BY src, depth, dst;
+        """
+    )
+    return conn.execute("SELECT count(*) FROM rfc_reference_closure;").fetchone()[0]
+
+
+# 全文検索のBM25のパラメータ
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+# 全文検索の転置インデックス(term -> rfc_number)をrfc_search_postingsに格納する
+#
+# 検索対象: タイトル、概要、キーワード、著者名、識別子(doc_id, RFC番号, is_also, draft, doi)
+# 分かち書きはrfc_search_tokensマクロ(文字・数字の連続を1語とし、アクセント記号を除いて小文字に揃える)で行い、検索時も同じマクロを使う
+# rfc.duckdbのみに作成し、書き出したデータベース(--export-dbfile)には含めない(画面の検索はsearch_blobを使う)
+#
+# BM25のスコアのうち、検索語に依存しない部分(idf, 文書長による正規化)はすべて作成時に決まるため、
+# 語と文書の組ごとのスコア(weight)として保存しておく. 検索時はweightを合計するだけでよい
+def insert_rfc_search_postings(conn: duckdb.DuckDBPyConnection) -> int:
+    conn.execute("DELETE FROM rfc_search_postings;")
+    conn.execute(
+        """
+        CREATE OR REPLACE TEMP TABLE search_tokens AS
+        SELECT
+            rfc_number,
+            unnest(
+                rfc_search_tokens(
+                    concat_ws(
+                        ' ',
+                        doc_id,
+                        CAST(rfc_number AS TEXT),
+                        title,
+                        abstract,
+                        array_to_string(keywords, ' '),
+                        array_to_string(list_transform(author, x -> x.name), ' '),
+                        array_to_string(is_also, ' '),
+                        draft,
+                        doi
+                    )
+                )
+            ) AS term
+        FROM rfc_entries
+        WHERE rfc_number IS NOT NULL;
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO rfc_search_postings (term, rfc_number, weight)
+        WITH doc_lengths AS (
+            SELECT rfc_number, count(*) AS length
+            FROM search_tokens
+            GROUP BY rfc_number
+        ),
+        stats AS (
+            SELECT count(*) AS docs, avg(length) AS avg_length FROM doc_lengths
+        ),
+        term_freqs AS (
+            SELECT term, rfc_number, count(*) AS tf
+            FROM search_tokens
+            GROUP BY term, rfc_number
+        ),
+        doc_freqs AS (
+            SELECT term, count(*) AS df
+            FROM term_freqs
+            GROUP BY term
+        )
+        SELECT
+            term_freqs.term,
+            term_freqs.rfc_number,
+            ln((stats.docs - doc_freqs.df + 0.5) / (doc_freqs.df + 0.5) + 1)
+                * term_freqs.tf * ({BM25_K1} + 1)
+                / (
+                    term_freqs.tf
+                    + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * doc_lengths.length / stats.avg_length)
+                )
+        FROM term_freqs
+        JOIN doc_freqs USING (term)
+        JOIN doc_lengths USING (rfc_number)
+        CROSS JOIN stats
+        ORDER BY term_freqs.term, term_freqs.rfc_number;
+        """
+    )
+    return conn.execute("SELECT count(*) FROM rfc_search_postings;").fetchone()[0]
+
+
+# 部分一致検索の候補を絞り込むためのトライグラム(search_blobの連続する3文字)をrfc_search_trigramsに格納する
+# 改行(カラムの区切り)を含むトライグラムは検索語に含まれないため除く
+#
+# incrementalの場合、変更のあったRFC(rfc_entries_changes)の分のみを入れ替える
+def insert_rfc_search_trigrams(
+    conn: duckdb.DuckDBPyConnection, incremental: bool = False
+) -> int:
+    condition = (
+        "rfc_number IN (SELECT rfc_number FROM rfc_entries_changes)"
+        if incremental
+        else "true"
+    )
+    conn.execute(f"DELETE FROM rfc_search_trigrams WHERE {condition};")
+    conn.execute(
+        f"""
+        INSERT INTO rfc_search_trigrams (trigram, rfc_number)
+        SELECT DISTINCT unnest(rfc_trigrams(search_blob)) AS trigram, rfc_number
+        FROM rfc_entries
+        WHERE rfc_number IS NOT NULL
+            AND {condition}
+        ORDER BY trigram, rfc_number;
+        """
+    )
+    return conn.execute("SELECT count(*) FROM rfc_search_trigrams;").fetchone()[0]
+
+
+# ダウンロード用のデータベース(--export-dbfile)のrfc_entries
+# 画面はファイル全体をダウンロードしてから検索を始めるため、画面が使うカラムのみを小さい型で持つ
+#
+# * current_status, publication_status, stream, area: 値の種類が少ないため、ENUMにする(値の一覧は出力時のデータから作る)
+#   全ての行でNULLの場合は、空のENUMは作らずTEXTのままにする
+# * date, page_count: 整数にする. 月は月名("January", "Jan"など)から1-12にする
+# * search_blob: abstractを除く. abstractはsearch_blobの約半分を占め、そのまま持つと同じ文章を2回ダウンロードすることになる.
+#   画面ではabstractを別に検索する(search_blob LIKE ? OR lower(abstract) LIKE ?).
+#   search_blobそのものを持たずに検索のたびに計算すると数倍遅くなるため、abstract以外は計算済みのものを持つ
+EXPORT_ENUM_COLUMNS = ["current_status", "publication_status", "stream", "area"]
+
+EXPORT_RFC_ENTRIES_COLUMNS: Dict[str, str] = {
+    "doc_id": "TEXT",
+    "rfc_number": "INTEGER",
+    "title": "TEXT",
+    "author": "STRUCT(name TEXT, title TEXT)[]",
+    "date": "STRUCT(day TINYINT, month TINYINT, year SMALLINT)",
+    "format": "TEXT[]",
+    "page_count": "SMALLINT",
+    "keywords": "TEXT[]",
+    "is_also": "TEXT[]",
+    "obsoletes": "TEXT[]",
+    "obsoleted_by": "TEXT[]",
+    "updates": "TEXT[]",
+    "updated_by": "TEXT[]",
+    "see_also": "TEXT[]",
+    "references": "TEXT[]",
+    "referenced_by": "TEXT[]",
+    "abstract": "TEXT",
+    "draft": "TEXT",
+    "current_status": "rfc_current_status",
+    "publication_status": "rfc_publication_status",
+    "stream": "rfc_stream",
+    "errata_url": "TEXT",
+    "area": "rfc_area",
+    "wg_acronym": "TEXT",
+    "doi": "TEXT",
+    "search_blob": "TEXT",
+}
+
+# 元のrfc_entriesから値を変えるカラムの変換
+# TRY_CASTではなくCASTを使い、変換できない値があれば(データが失われるため)エラーにする
+EXPORT_RFC_ENTRIES_CONVERSIONS: Dict[str, str] = {
+    "date": """
+        CASE WHEN date IS NOT NULL THEN struct_pack(
+            day := CAST(date.day AS TINYINT),
+            month := CAST(month(strptime(date.month, ['%B', '%b'])) AS TINYINT),
+            year := CAST(date.year AS SMALLINT)
+        ) END
+    """,
+    "page_count": "CAST(page_count AS SMALLINT)",
+    "search_blob": search_blob_expression(
+        [column for column in SEARCH_BLOB_COLUMNS if column != "abstract"]
+    ),
+}
+
+
+# rfc_entriesを、ダウンロード用の新しいデータベースファイルに書き出す
+#
+# * 毎回新しいファイルに書き出すため、削除や更新で空いたブロックは含まれない
+# * rfc_number順に並べる. doc_id, doi, errata_url, dateがほぼ単調に増え、
+#   status類もRFCの時期ごとに同じ値が続くため、ENUMを先頭にした並べ替えより全体が小さくなる
+# * with_abstract=Falseの場合、abstractを持たない(export_rfc_abstractsで別のファイルに書き出す)
+# * column_bytes=Trueの場合、カラムごとのサイズ(バイト数)の見積もりも返す(診断用)
+def export_rfc_entries(
+    conn: duckdb.DuckDBPyConnection,
+    path: str,
+    with_abstract: bool = True,
+    column_bytes: bool = False,
+) -> tuple[int, Optional[Dict[str, int]]]:
+    source = conn.execute("SELECT current_database();").fetchone()[0]
+    if os.path.exists(path):
+        os.remove(path)
+
+    quoted_path = path.replace("'", "''")
+    conn.execute(f"ATTACH '{quoted_path}' AS export;")
+    conn.execute("USE export;")
+    try:
+        column_types = dict(EXPORT_RFC_ENTRIES_COLUMNS)
+        for column in EXPORT_ENUM_COLUMNS:
+            values = conn.execute(
+                f'SELECT count(DISTINCT {column}) FROM "{source}".rfc_entries;'
+            ).fetchone()[0]
+            if values == 0:
+                column_types[column] = "TEXT"
+                continue
+            conn.execute(
+                f"""
+                CREATE TYPE rfc_{column} AS ENUM (
+                    SELECT DISTINCT {column}
+                    FROM "{source}".rfc_entries
+                    WHERE {column} IS NOT NULL
+                    ORDER BY {column}
+                );
+                """
+            )
+
+        export_columns = {
+            name: column_type
+            for name, column_type in column_types.items()
+            if with_abstract or name != "abstract"
+        }
+        definitions = ",\n".join(
+            f'"{name}" {column_type}' for name, column_type in export_columns.items()
+        )
+        conn.execute(f"CREATE TABLE rfc_entries ({definitions});")
+
+        columns = ", ".join(f'"{name}"' for name in export_columns)
+        values = ", ".join(
+            EXPORT_RFC_ENTRIES_CONVERSIONS.get(name, f'"{name}"')
+            for name in export_columns
+        )
+        conn.execute(
+            f"""
+            INSERT INTO rfc_entries ({columns})
+            SELECT {values}
+            FROM "{source}".rfc_entries
+            ORDER BY rfc_number, doc_id;
+            """
+        )
+
+        conn.execute("CHECKPOINT;")
+        count = conn.execute("SELECT count(*) FROM rfc_entries;").fetchone()[0]
+        if not column_bytes:
+            return count, None
+        return count, estimate_column_bytes(conn, "rfc_entries")
+    finally:
+        conn.execute(f'USE "{source}";')
+        conn.execute("DETACH export;")
+
+
+# abstractを書き出すParquetファイルの行グループの行数
+# 画面の1ページ(100件)の概要が1, 2個の行グループのHTTPのRange Requestで取得できる大きさにする
+EXPORT_ABSTRACTS_ROW_GROUP_SIZE = 256
+
+
+# rfc_entriesのabstractを、rfc_numberをキーとしてParquetファイルに書き出す
+# 画面はrfc_entriesを先にダウンロードし、abstractは表示するページの分のみを後から取得する
+#
+# * rfc_number順に並べ、行グループごとのrfc_numberの最小値・最大値(統計情報)で読み込む行グループを絞り込めるようにする
+# * DuckDBは1回の書き込みの単位(2048行)より小さい行グループを作らないため、
+#   EXPORT_ABSTRACTS_ROW_GROUP_SIZEごとに分けたSELECTをUNION ALLでつないで書き出す
+def export_rfc_abstracts(conn: duckdb.DuckDBPyConnection, path: str) -> tuple[int, int]:
+    max_rfc_number = conn.execute(
+        "SELECT coalesce(max(rfc_number), 0) FROM rfc_entries;"
+    ).fetchone()[0]
+    parts = [
+        f"""
+        (
+            SELECT rfc_number, abstract
+            FROM rfc_entries
+            WHERE abstract IS NOT NULL
+                AND rfc_number > {start}
+                AND rfc_number <= {start + EXPORT_ABSTRACTS_ROW_GROUP_SIZE}
+            ORDER BY rfc_number
+        )
+        """
+        for start in range(0, max_rfc_number + 1, EXPORT_ABSTRACTS_ROW_GROUP_SIZE)
+    ]
+    quoted_path = path.replace("'", "''")
+    conn.execute(
+        f"""
+        COPY ({" UNION ALL ".join(parts)}) TO '{quoted_path}' (
+            FORMAT parquet,
+            COMPRESSION zstd,
+            ROW_GROUP_SIZE {EXPORT_ABSTRACTS_ROW_GROUP_SIZE}
+        );
+        """
+    )
+    count = conn.execute("SELECT count(*) FROM read_parquet(?);", [path]).fetchone()[0]
+    row_groups = conn.execute(
+        "SELECT count(DISTINCT row_group_id) FROM parquet_metadata(?);", [path]
+    ).fetchone()[0]
+    return count, row_groups
+
+
+# テーブルのカラムごとの格納サイズ(バイト数)の見積もり
+# pragma_storage_infoのセグメントの位置(ブロック内のオフセット)の差から求める
+# ブロック末尾の空きは、そのブロックの最後のセグメントのサイズに含まれる
+def estimate_column_bytes(
+    conn: duckdb.DuckDBPyConnection, table: str
+) -> Dict[str, int]:
+    block_size = conn.execute(
+        """
+        SELECT block_size FROM pragma_database_size()
+        WHERE database_name = current_database();
+        """
+    ).fetchone()[0]
+    rows = conn.execute(
+        f"""
+        WITH segments AS (
+            SELECT
+                column_id,
+                column_name,
+                block_offset,
+                len(additional_block_ids) AS additional_blocks,
+                lead(block_offset) OVER (
+                    PARTITION BY block_id ORDER BY block_offset
+                ) AS next_offset
+            FROM pragma_storage_info(?)
+            WHERE persistent AND block_id >= 0
+        )
+        SELECT
+            column_name,
+            sum(
+                coalesce(next_offset, {block_size}) - block_offset
+                + additional_blocks * {block_size}
+            ) AS size
+        FROM segments
+        GROUP BY column_id, column_name
+        ORDER BY column_id;
+        """,
+        [table],
+    ).fetchall()
+    return {column: int(size) for column, size in rows}
+
+
+# テーブル、型、マクロを作成する(既に存在する場合はそのまま)
+# logには進捗を出力する関数を指定する
+def create_tables(
+    conn: duckdb.DuckDBPyConnection, log: Callable[[str], None] = appLogger.info
+):
+    log(f"creating table: table=rfc_entries")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rfc_entries (
+            doc_id              TEXT,
+            rfc_number          INTEGER,
+            title               TEXT,
+            author              STRUCT(
+                                    name TEXT,
+                                    title TEXT
+                                )[],
+            date                STRUCT(
+                                    day   TEXT,
+                                    month TEXT,
+                                    year  TEXT
+                                ),
+            format              TEXT[],
+            page_count          TEXT,
+            keywords            TEXT[],
+            is_also             TEXT[],
+            obsoletes           TEXT[],
+            obsoleted_by        TEXT[],
+            updates             TEXT[],
+            updated_by          TEXT[],
+            see_also            TEXT[],
+            "references"        TEXT[],
+            referenced_by       TEXT[],
+            abstract            TEXT,
+            draft               TEXT,
+            current_status      TEXT,
+            publication_status  TEXT,    
+            stream              TEXT,
+            errata_url          TEXT,
+            area                TEXT,
+            wg_acronym          TEXT,
+            doi                 TEXT,
+            search_blob         TEXT
+        );
+        """
+    )
 
-                # 自分自身を削除
-                if doc_id == refer:
-                    continue
+    log(f"created table: table=rfc_entries")
 
-                # Referencesに追加
-                if isinstance(references.get(doc_id), list):
-                    references[doc_id].append(refer)
-                else:
-                    references[doc_id] = [refer]
+    # rfc_edges
+    # RFC番号どうしの関係(参照、廃止、更新など)を1行1関係で持つ
+    log(f"creating table: table=rfc_edges")
+    conn.execute(
+        """
+        CREATE TYPE IF NOT EXISTS rfc_edge_kind AS ENUM (
+            'references',
+            'obsoletes',
+            'updates',
+            'is_also',
+            'see_also'
+        );
+        CREATE TABLE IF NOT EXISTS rfc_edges (
+            src     INTEGER,
+            dst     INTEGER,
+            kind    rfc_edge_kind
+        );
+        """
+    )
 
-                # Referenced Byに追加
-                if isinstance(referenced_by.get(refer), list):
-                    referenced_by[refer].append(doc_id)
-                else:
-                    referenced_by[refer] = [doc_id]
+    log(f"created table: table=rfc_edges")
 
-    return references, referenced_by
+    # rfc_successors, rfc_reference_closure
+    # rfc_edgesを推移的に辿った結果を、深さとともに持つ
+    log(f"creating table: table=rfc_successors")
+    conn.execute(
+        """
+        CREATE TYPE IF NOT EXISTS rfc_successor_kind AS ENUM (
+            'obsoleted_by',
+            'updated_by'
+        );
+        CREATE TABLE IF NOT EXISTS rfc_successors (
+            src         INTEGER,
+            dst         INTEGER,
+            kind        rfc_successor_kind,
+            depth       INTEGER,
+            is_current  BOOLEAN
+        );
+        """
+    )
+
+    log(f"created table: table=rfc_successors")
+
+    log(f"creating table: table=rfc_reference_closure")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rfc_reference_closure (
+            src     INTEGER,
+            dst     INTEGER,
+            depth   INTEGER
+        );
+        """
+    )
+
+    log(f"created table: table=rfc_reference_closure")
+
+    # rfc_subseries, rfc_subseries_members, rfc_subseries_references, rfc_not_issued
+    # サブシリーズ(BCP, STD, FYI)と、それを構成するRFC、RFCからサブシリーズへの参照、欠番のRFC
+    # サブシリーズへの参照が指すRFCは、rfc_subseries_reference_edgesで検索時に結合して求める
+    #
+    # Example:
+    #   SELECT rfc_number FROM rfc_subseries_rfcs('BCP14');
+    #   SELECT series, number, dst FROM rfc_subseries_reference_edges WHERE src = 9110;
+    log(f"creating table: table=rfc_subseries")
+    conn.execute(
+        """
+        CREATE TYPE IF NOT EXISTS rfc_subseries_kind AS ENUM (
+            'bcp',
+            'std',
+            'fyi'
+        );
+        CREATE TABLE IF NOT EXISTS rfc_subseries (
+            series      rfc_subseries_kind,
+            number      INTEGER,
+            title       TEXT
+        );
+        CREATE TABLE IF NOT EXISTS rfc_subseries_members (
+            series      rfc_subseries_kind,
+            number      INTEGER,
+            rfc_number  INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS rfc_subseries_references (
+            src         INTEGER,
+            series      rfc_subseries_kind,
+            number      INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS rfc_not_issued (
+            rfc_number  INTEGER
+        );
+        CREATE OR REPLACE MACRO rfc_subseries_rfcs(doc_id) AS TABLE
+            SELECT rfc_number
+            FROM rfc_subseries_members
+            WHERE series = TRY_CAST(lower(regexp_extract(doc_id, '^[A-Za-z]+')) AS rfc_subseries_kind)
+                AND number = TRY_CAST(regexp_extract(doc_id, '[0-9]+$') AS INTEGER)
+            ORDER BY rfc_number;
+        CREATE OR REPLACE VIEW rfc_subseries_reference_edges AS
+            SELECT
+                rfc_subseries_references.src,
+                rfc_subseries_references.series,
+                rfc_subseries_references.number,
+                rfc_subseries_members.rfc_number AS dst
+            FROM rfc_subseries_references
+            JOIN rfc_subseries_members USING (series, number);
+        """
+    )
+
+    log(f"created table: table=rfc_subseries")
+
+    # rfc_search_postings
+    # 全文検索の転置インデックス. 検索はrfc_searchマクロで行う
+    #
+    # Example:
+    #   SELECT doc_id, title, score
+    #   FROM rfc_search('http semantics') JOIN rfc_entries USING (rfc_number)
+    #   ORDER BY score DESC
+    #   LIMIT 20;
+    log(f"creating table: table=rfc_search_postings")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rfc_search_postings (
+            term        TEXT,
+            rfc_number  INTEGER,
+            weight      FLOAT
+        );
+        CREATE OR REPLACE MACRO rfc_search_tokens(text) AS
+            list_filter(
+                regexp_split_to_array(lower(strip_accents(text)), '[^\\p{L}\\p{N}]+'),
+                x -> x <> ''
+            );
+        CREATE OR REPLACE MACRO rfc_search(query) AS TABLE
+            SELECT
+                rfc_number,
+                sum(weight) AS score,
+                count(*) AS matched_terms
+            FROM rfc_search_postings
+            WHERE term IN (SELECT unnest(rfc_search_tokens(query)))
+            GROUP BY rfc_number;
+        """
+    )
+
+    log(f"created table: table=rfc_search_postings")
+
+    # rfc_search_trigrams
+    # search_blobの部分一致検索の候補を絞り込むための転置インデックス. 検索はrfc_substring_searchマクロで行う
+    # 3文字未満の検索語や、rfc_search_trigramsが空の場合は、search_blobを全件検索する
+    #
+    # Example:
+    #   SELECT doc_id, title
+    #   FROM rfc_substring_search('semantics') JOIN rfc_entries USING (rfc_number)
+    #   ORDER BY rfc_number DESC;
+    log(f"creating table: table=rfc_search_trigrams")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rfc_search_trigrams (
+            trigram     TEXT,
+            rfc_number  INTEGER
+        );
+        CREATE OR REPLACE MACRO rfc_trigrams(text) AS
+            list_filter(
+                list_transform(range(1, length(text) - 1), i -> substr(text, i, 3)),
+                x -> NOT contains(x, chr(10))
+            );
+        CREATE OR REPLACE MACRO rfc_substring_search(text) AS TABLE
+            WITH query AS (
+                SELECT list_distinct(rfc_trigrams(lower(text))) AS trigrams
+            ),
+            candidates AS (
+                SELECT rfc_number
+                FROM rfc_search_trigrams
+                WHERE trigram IN (SELECT unnest(trigrams) FROM query)
+                GROUP BY rfc_number
+                HAVING count(*) = (SELECT len(trigrams) FROM query)
+            )
+            SELECT rfc_number
+            FROM rfc_entries
+            WHERE contains(search_blob, lower(text))
+                AND (
+                    (SELECT len(trigrams) FROM query) = 0
+                    OR NOT EXISTS (SELECT 1 FROM rfc_search_trigrams)
+                    OR rfc_number IN (SELECT rfc_number FROM candidates)
+                );
+        """
+    )
+
+    log(f"created table: table=rfc_search_trigrams")
+
+
+# 現在の定義のスキーマ(テーブルごとの"カラム名 型"の一覧)
+# メモリ上のデータベースにテーブルを作成して求める
+def expected_schema() -> Dict[str, list[str]]:
+    with duckdb.connect() as conn:
+        create_tables(conn, log=lambda message: None)
+        return table_columns(conn)
+
+
+def table_columns(conn: duckdb.DuckDBPyConnection) -> Dict[str, list[str]]:
+    rows = conn.execute(
+        """
+        SELECT table_name, list(column_name || ' ' || data_type ORDER BY column_index)
+        FROM duckdb_columns()
+        WHERE database_name = current_database() AND schema_name = 'main' AND NOT internal
+        GROUP BY table_name;
+        """
+    ).fetchall()
+    return dict(rows)
+
+
+# 既存のデータベースのテーブルのうち、カラム(名前、型、順序)が現在の定義と異なるもの
+# 戻り値は(テーブル名, 足りないカラム, 余分なカラム)の一覧. まだ存在しないテーブルは対象外
+def find_schema_mismatches(
+    conn: duckdb.DuckDBPyConnection,
+) -> list[tuple[str, list[str], list[str]]]:
+    existing = table_columns(conn)
+    mismatches = []
+    for table, columns in expected_schema().items():
+        if table in existing and existing[table] != columns:
+            mismatches.append(
+                (
+                    table,
+                    [column for column in columns if column not in existing[table]],
+                    [column for column in existing[table] if column not in columns],
+                )
+            )
+    return mismatches
+
+
+# 既存のデータベースにrfc_entriesの行があるかどうか
+def has_entries(conn: duckdb.DuckDBPyConnection) -> bool:
+    exists = conn.execute(
+        "SELECT count(*) FROM duckdb_tables() WHERE table_name = 'rfc_entries';"
+    ).fetchone()[0]
+    if not exists:
+        return False
+    return conn.execute("SELECT count(*) FROM rfc_entries;").fetchone()[0] > 0
+
+
+# create_tablesで作成するビュー、テーブル、型を全て削除する
+def drop_tables(conn: duckdb.DuckDBPyConnection):
+    with duckdb.connect() as expected:
+        create_tables(expected, log=lambda message: None)
+        views = [
+            row[0]
+            for row in expected.execute(
+                "SELECT view_name FROM duckdb_views() WHERE NOT internal;"
+            ).fetchall()
+        ]
+        tables = [
+            row[0]
+            for row in expected.execute(
+                "SELECT table_name FROM duckdb_tables();"
+            ).fetchall()
+        ]
+        types = [
+            row[0]
+            for row in expected.execute(
+                "SELECT type_name FROM duckdb_types() WHERE schema_name = 'main' AND NOT internal;"
+            ).fetchall()
+        ]
+
+    for view in views:
+        conn.execute(f"DROP VIEW IF EXISTS {view};")
+    for table in tables:
+        conn.execute(f"DROP TABLE IF EXISTS {table};")
+    for type_name in types:
+        conn.execute(f"DROP TYPE IF EXISTS {type_name};")
 
 
 @click.command()
@@ -118,29 +1274,154 @@ def mappingReferences(
     type=str,
     required=False,
     default=None,
-    help="trasform_rfc_index_to_json.pyの結果を指定する(JSONファイル)",
+    help="trasform_rfc_index_to_json.pyの結果を指定する(JSONファイル、NDJSONファイルまたはParquetファイル)",
 )
 @click.option(
     "--rfc-referencing-urls",
     type=str,
     required=False,
     default=None,
-    help="extract_rfc_referencing_urls_from_rfc_txts.pyの結果を指定する(JSONファイル)",
+    help="extract_rfc_referencing_urls_from_rfc_txts.pyの結果を指定する(JSONファイルまたはParquetファイル)",
+)
+@click.option(
+    "--subseries",
+    type=str,
+    required=False,
+    default=None,
+    help="trasform_rfc_index_to_json.pyの--subseries-fileの結果を指定する(JSONファイル、NDJSONファイルまたはParquetファイル). BCP/STD/FYIを構成するRFCの一覧(rfc_subseries_members)を作成する",
+)
+@click.option(
+    "--reference-closure",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="参照を推移的に辿ったRFCの一覧(rfc_reference_closure)を作成する. 行数が非常に多くなるため、指定した場合のみ作成する",
+)
+@click.option(
+    "--reference-closure-max-depth",
+    type=click.IntRange(min=1),
+    required=False,
+    default=None,
+    help="rfc_reference_closureで辿る最大の深さ. 指定しない場合は全て辿る",
+)
+@click.option(
+    "--search-index",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="全文検索の転置インデックス(rfc_search_postings)を作成する",
+)
+@click.option(
+    "--trigram-index",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="部分一致検索の候補を絞り込むためのトライグラムの転置インデックス(rfc_search_trigrams)を作成する",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="既存のデータベースとdoc_idごとに比較し、追加・更新・削除のあった行のみを1つのトランザクションで反映する",
+)
+@click.option(
+    "--export-dbfile",
+    type=str,
+    required=False,
+    default=None,
+    help="画面でダウンロードするためのサイズを小さくしたDuckDB Persistent Databaseの出力先のファイルパス. rfc_entriesのみを持つ. 既に存在する場合は作り直す",
+)
+@click.option(
+    "--export-abstracts",
+    type=str,
+    required=False,
+    default=None,
+    help="abstractを別に書き出すParquetファイルの出力先のファイルパス. 指定した場合、--export-dbfileのrfc_entriesはabstractを持たない",
+)
+@click.option(
+    "--column-bytes",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="--export-dbfileのrfc_entriesのカラムごとのサイズ(バイト数)の見積もりを、元のrfc_entriesと比較してログに出す(診断用)",
+)
+@click.option(
+    "--metrics-file",
+    type=str,
+    default=None,
+    required=False,
+    help="フェーズごとの処理時間・CPU時間・ピークメモリ・件数を、終了時にJSONで出力するファイル",
+)
+@click.option(
+    "--prometheus-file",
+    type=str,
+    default=None,
+    required=False,
+    help="--metrics-fileと同じ内容を、Prometheus(node_exporterのtextfile collector)の形式で出力するファイル",
 )
 @click.option("--verbose", is_flag=True, show_default=True, default=False, help="")
-def main(dbfile: str, rfc_index: str, rfc_referencing_urls: str, verbose: bool):
+def main(
+    dbfile: str,
+    rfc_index: str,
+    rfc_referencing_urls: str,
+    subseries: Optional[str],
+    reference_closure: bool,
+    reference_closure_max_depth: Optional[int],
+    search_index: bool,
+    trigram_index: bool,
+    incremental: bool,
+    export_dbfile: Optional[str],
+    export_abstracts: Optional[str],
+    column_bytes: bool,
+    metrics_file: Optional[str],
+    prometheus_file: Optional[str],
+    verbose: bool,
+):
     appLogger.info(f"app start")
     appLogger.info(f"command line argument: --dbfile = {dbfile}")
     appLogger.info(f"command line argument: --rfc_index = {rfc_index}")
     appLogger.info(
         f"command line argument: --rfc-referencing-urls = {rfc_referencing_urls}"
     )
+    appLogger.info(f"command line argument: --subseries = {subseries}")
+    appLogger.info(f"command line argument: --reference-closure = {reference_closure}")
+    appLogger.info(
+        f"command line argument: --reference-closure-max-depth = {reference_closure_max_depth}"
+    )
+    appLogger.info(f"command line argument: --search-index = {search_index}")
+    appLogger.info(f"command line argument: --trigram-index = {trigram_index}")
+    appLogger.info(f"command line argument: --incremental = {incremental}")
+    appLogger.info(f"command line argument: --export-dbfile = {export_dbfile}")
+    appLogger.info(f"command line argument: --export-abstracts = {export_abstracts}")
+    appLogger.info(f"command line argument: --column-bytes = {column_bytes}")
+    appLogger.info(f"command line argument: --metrics-file = {metrics_file}")
+    appLogger.info(f"command line argument: --prometheus-file = {prometheus_file}")
     appLogger.info(f"command line argument: --verbose = {verbose}")
 
+    metrics = RunMetrics("create_duckdb_persistent_db", appLogger)
+    metrics.write_at_exit(metrics_file, prometheus_file)
+
     if not rfc_index and rfc_referencing_urls:
         appLogger.error(f"--rfc_index is required if --rfc-referencing-urls exists.")
         sys.exit(-1)
 
+    if not rfc_index and subseries:
+        appLogger.error(f"--rfc_index is required if --subseries exists.")
+        sys.exit(-1)
+
+    if not rfc_index and incremental:
+        appLogger.error(f"--rfc_index is required if --incremental exists.")
+        sys.exit(-1)
+
+    if export_dbfile and os.path.abspath(export_dbfile) == os.path.abspath(dbfile):
+        appLogger.error(f"--export-dbfile must be different from --dbfile.")
+        sys.exit(-1)
+
+    if not export_dbfile and export_abstracts:
+        appLogger.error(f"--export-dbfile is required if --export-abstracts exists.")
+        sys.exit(-1)
+
     # Open DuckDB Database
     appLogger.info(f"duckdb database connecting: dbfile={dbfile}")
 
@@ -167,75 +1448,60 @@ def main(dbfile: str, rfc_index: str, rfc_referencing_urls: str, verbose: bool):
     # Create Persistent Database
     appLogger.info(f"duckdb persistent database creating")
 
-    # Creat table
-    appLogger.info(f"creating table: table=rfc_entries")
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS rfc_entries (
-            doc_id              TEXT,
-            title               TEXT,
-            author              STRUCT(
-                                    name TEXT,
-                                    title TEXT
-                                )[],
-            date                STRUCT(
-                                    day   TEXT,
-                                    month TEXT,
-                                    year  TEXT
-                                ),
-            format              TEXT[],
-            page_count          TEXT,
-            keywords            TEXT[],
-            is_also             TEXT[],
-            obsoletes           TEXT[],
-            obsoleted_by        TEXT[],
-            updates             TEXT[],
-            updated_by          TEXT[],
-            see_also            TEXT[],
-            "references"        TEXT[],
-            referenced_by       TEXT[],
-            abstract            TEXT,
-            draft               TEXT,
-            current_status      TEXT,
-            publication_status  TEXT,    
-            stream              TEXT,
-            errata_url          TEXT,
-            area                TEXT,
-            wg_acronym          TEXT,
-            doi                 TEXT
-        );
-        """
-    )
+    # 以降の変更は1つのトランザクションで行う
+    # 途中で失敗した場合(作り直しのためにテーブルを削除した後を含む)は、既存のデータベースは実行前の状態のまま残る
+    conn.begin()
+
+    # 既存のデータベースのスキーマの確認
+    # 以前のバージョンで作成したデータベースは、カラムが足りないなどで差分の反映ができないため、全て作り直す
+    # --incrementalを指定しない場合は、既存のデータベースに行があれば全て作り直す(行を重複して追加しない)
+    mismatches = find_schema_mismatches(conn)
+    for table, missing, unexpected in mismatches:
+        appLogger.warning(
+            f"schema mismatch: table={table} missing={missing} unexpected={unexpected}"
+        )
+    if mismatches or (rfc_index and not incremental and has_entries(conn)):
+        if not rfc_index:
+            appLogger.error(
+                f"existing database has a different schema, specify --rfc-index to rebuild it: dbfile={dbfile}"
+            )
+            sys.exit(-1)
+
+        if mismatches:
+            appLogger.warning(
+                f"existing database has a different schema, rebuilt from scratch: dbfile={dbfile}"
+            )
+        else:
+            appLogger.info(
+                f"existing database is rebuilt from scratch, specify --incremental to apply only the differences: dbfile={dbfile}"
+            )
+        drop_tables(conn)
+        incremental = False
 
-    appLogger.info(f"created table: table=rfc_entries")
+    create_tables(conn)
 
     # Insert RFC entries from index data
     # rfc_index
-    if rfc_index:
-        appLogger.info(f"rfc index data importing: file={rfc_index}")
+    if not rfc_index:
+        conn.commit()
+    else:
         if not os.path.exists(rfc_index):
             appLogger.error(f"file not found: {rfc_index}")
             sys.exit(-1)
 
-        rfc_entries: list[RFCEntry] = []
-        try:
-            abspath = os.path.abspath(rfc_index)
-            with open(abspath) as f:
-                # Format:  [ { ... }, { ... }, ... ]
-                rfc_entries = json.load(f)
-                appLogger.info(f"rfc index data imported: file={rfc_index}")
-        except json.JSONDecodeError as e:
-            appLogger.error(e)
-            appLogger.error(f"file is not properly formatted: {rfc_index}")
-            sys.exit(-1)
-        except Exception as e:
-            appLogger.error(e)
-            appLogger.error(f"unknown error: {rfc_index}")
-            sys.exit(-1)
+        # 正規化に使うSQLマクロの定義
+        conn.execute(NORMALIZE_MACROS)
 
         # rfc_referencing_urls
-        rfcReferences: RFCReferences = {}
-        rfcRerencedBy: RFCReferencedBy = {}
+        conn.execute(
+            """
+            CREATE OR REPLACE TEMP TABLE rfc_references (
+                doc_id          TEXT,
+                "references"    TEXT[],
+                referenced_by   TEXT[]
+            );
+            """
+        )
         if rfc_referencing_urls:
             appLogger.info(
                 f"rfc referencing urls importing: file={rfc_referencing_urls}"
@@ -245,16 +1511,15 @@ def main(dbfile: str, rfc_index: str, rfc_referencing_urls: str, verbose: bool):
                 appLogger.error(f"file not found: {rfc_referencing_urls}")
                 sys.exit(-1)
 
-            referencesMap: RFCReferenceMap = None
             try:
                 abspath = os.path.abspath(rfc_referencing_urls)
-                with open(abspath) as f:
-                    # Format:  { "<doc_id>": [ "<other_doc_id>", ... ], ... }
-                    referencesMap = json.load(f)
-                    appLogger.info(
-                        f"rfc referencing urls imported: file={rfc_referencing_urls}"
-                    )
-            except json.JSONDecodeError as e:
+                with metrics.phase("stage-referencing-urls") as phase:
+                    count = stage_rfc_referencing_edges(conn, abspath)
+                    phase.count("edges", count)
+                appLogger.info(
+                    f"rfc referencing urls imported: file={rfc_referencing_urls} edges={count}"
+                )
+            except duckdb.InvalidInputException as e:
                 appLogger.error(e)
                 appLogger.error(
                     f"file is not properly formatted: {rfc_referencing_urls}"
@@ -265,116 +1530,282 @@ def main(dbfile: str, rfc_index: str, rfc_referencing_urls: str, verbose: bool):
                 appLogger.error(f"unknown error: {rfc_referencing_urls}")
                 sys.exit(-1)
 
+            if verbose:
+                for doc_id, refer in conn.execute(
+                    "SELECT doc_id, refer FROM rfc_referencing_edges;"
+                ).fetchall():
+                    appLogger.info(f"{doc_id} -> {refer}")
+
             # 解析
             appLogger.info(f"rfc referencing urls preparing")
 
-            rfcReferences, rfcRerencedBy = mappingReferences(
-                referencesMap, verbose=verbose
-            )
+            with metrics.phase("prepare-references"):
+                prepare_rfc_references(conn)
 
             appLogger.info(f"rfc referencing urls prepared")
 
-        # データの正規化
-        appLogger.info(f"rfc entries normalizing")
-
-        # 実際のデータには含まれないカラムなので、そのままDuckDBに投入するとエラーが起こる
-        # 例: duckdb.duckdb.BinderException: Binder Error: table rfc_entries has 24 columns but 22 values were supplie
-        #
-        # references, referenced_byを追加する
-        #
-        # Python3.7以降、dictの順序は保証され、DuckDBにpd.DataFrameで投入する際はこの順序を利用しているため、
-        # カラムの定義順とdictのキー・値の順番を一致させる必要がある.
-        # つまり、dictもreferences, referenced_byを最後尾ではなく、カラムの定義位置(see_alsoの後)で定義する必要がある
-        rfc_entries_nomalized: list[RFCEntry] = []
-        for entry in rfc_entries:
-            doc_id = remove_zerofill(entry["doc_id"])
-            is_also = (
-                [remove_zerofill(item) for item in entry["is_also"]]
-                if entry["is_also"]
-                else None
+        elif incremental:
+            # 参照情報が指定されない場合、既存の参照情報をそのまま引き継ぐ
+            conn.execute(
+                """
+                INSERT INTO rfc_references
+                SELECT DISTINCT ON (doc_id) doc_id, "references", referenced_by
+                FROM rfc_entries;
+                """
             )
-            obsoletes = (
-                [remove_zerofill(item) for item in entry["obsoletes"]]
-                if entry["obsoletes"]
-                else None
+
+        # データの読み込み
+        # RFC IndexはPythonのオブジェクトを経由せず、DuckDBで直接読み込む
+        appLogger.info(f"rfc index data importing: file={rfc_index}")
+
+        try:
+            abspath = os.path.abspath(rfc_index)
+            with metrics.phase("stage-index") as phase:
+                count = stage_rfc_index(conn, abspath)
+                phase.count("entries", count)
+        except duckdb.InvalidInputException as e:
+            appLogger.error(e)
+            appLogger.error(f"file is not properly formatted: {rfc_index}")
+            sys.exit(-1)
+        except Exception as e:
+            appLogger.error(e)
+            appLogger.error(f"unknown error: {rfc_index}")
+            sys.exit(-1)
+
+        appLogger.info(f"rfc index data imported: file={rfc_index} entries={count}")
+
+        # 正規化
+        appLogger.info(f"rfc entries preparing")
+
+        with metrics.phase("normalize") as phase:
+            stage_rfc_entries(conn)
+            phase.count("entries", count)
+
+        appLogger.info(f"rfc entries prepared")
+
+        if incremental:
+            # Upsert rfc entries
+            appLogger.info(f"rfc entries upserting: table=rfc_entries")
+
+            with metrics.phase("upsert-entries") as phase:
+                counts = upsert_rfc_entries(conn)
+                for key, value in counts.items():
+                    phase.count(key, value)
+            changed = sum(counts.values()) > 0
+
+            appLogger.info(
+                f"rfc entries upserted: table=rfc_entries inserted={counts['insert']} updated={counts['update']} deleted={counts['delete']}"
             )
-            obsoleted_by = (
-                [remove_zerofill(item) for item in entry["obsoleted_by"]]
-                if entry["obsoleted_by"]
-                else None
+        else:
+            # Insert rfc entries
+            appLogger.info(f"rfc entries inserting: table=rfc_entries")
+
+            with metrics.phase("insert-entries") as phase:
+                insert_rfc_entries(conn)
+                phase.count("entries", count)
+            changed = True
+
+            appLogger.info(f"rfc entries inserted: table=rfc_entries")
+
+        # 派生テーブル
+        # incrementalの場合、変更がなければ何もしない. 変更のあった行の分だけ更新できるものはそうする
+        if changed:
+            # Insert rfc edges
+            appLogger.info(f"rfc edges inserting: table=rfc_edges")
+
+            with metrics.phase("insert-edges") as phase:
+                count = insert_rfc_edges(
+                    conn, incremental and can_update_incrementally(conn, "rfc_edges")
+                )
+                phase.count("edges", count)
+
+            appLogger.info(f"rfc edges inserted: table=rfc_edges edges={count}")
+
+            # Insert rfc successors
+            appLogger.info(f"rfc successors inserting: table=rfc_successors")
+
+            with metrics.phase("insert-successors") as phase:
+                count = insert_rfc_successors(conn)
+                phase.count("rows", count)
+
+            appLogger.info(
+                f"rfc successors inserted: table=rfc_successors rows={count}"
             )
-            updates = (
-                [remove_zerofill(item) for item in entry["updates"]]
-                if entry["updates"]
-                else None
+
+            # Insert rfc reference closure
+            if reference_closure:
+                appLogger.info(
+                    f"rfc reference closure inserting: table=rfc_reference_closure"
+                )
+
+                with metrics.phase("insert-reference-closure") as phase:
+                    count = insert_rfc_reference_closure(
+                        conn, reference_closure_max_depth
+                    )
+                    phase.count("rows", count)
+
+                appLogger.info(
+                    f"rfc reference closure inserted: table=rfc_reference_closure rows={count}"
+                )
+
+            # Insert rfc search postings
+            # BM25のスコアは全文書の統計(文書数、平均の長さ)に依存するため、常に全て作り直す
+            if search_index:
+                appLogger.info(
+                    f"rfc search postings inserting: table=rfc_search_postings"
+                )
+
+                with metrics.phase("insert-search-postings") as phase:
+                    count = insert_rfc_search_postings(conn)
+                    phase.count("rows", count)
+
+                appLogger.info(
+                    f"rfc search postings inserted: table=rfc_search_postings rows={count}"
+                )
+
+            # Insert rfc search trigrams
+            if trigram_index:
+                appLogger.info(
+                    f"rfc search trigrams inserting: table=rfc_search_trigrams"
+                )
+
+                with metrics.phase("insert-search-trigrams") as phase:
+                    count = insert_rfc_search_trigrams(
+                        conn,
+                        incremental
+                        and can_update_incrementally(conn, "rfc_search_trigrams"),
+                    )
+                    phase.count("rows", count)
+
+                appLogger.info(
+                    f"rfc search trigrams inserted: table=rfc_search_trigrams rows={count}"
+                )
+
+        # サブシリーズ
+        # rfc_entriesから派生するものではないため、変更の有無によらず指定があれば作り直す
+        if subseries:
+            appLogger.info(f"rfc subseries importing: file={subseries}")
+
+            if not os.path.exists(subseries):
+                appLogger.error(f"file not found: {subseries}")
+                sys.exit(-1)
+
+            try:
+                abspath = os.path.abspath(subseries)
+                with metrics.phase("stage-subseries") as phase:
+                    count = stage_rfc_subseries(conn, abspath)
+                    phase.count("entries", count)
+            except duckdb.InvalidInputException as e:
+                appLogger.error(e)
+                appLogger.error(f"file is not properly formatted: {subseries}")
+                sys.exit(-1)
+            except Exception as e:
+                appLogger.error(e)
+                appLogger.error(f"unknown error: {subseries}")
+                sys.exit(-1)
+
+            appLogger.info(f"rfc subseries imported: file={subseries} entries={count}")
+
+            appLogger.info(f"rfc subseries inserting: table=rfc_subseries")
+
+            with metrics.phase("insert-subseries") as phase:
+                counts = insert_rfc_subseries(conn)
+                for key, value in counts.items():
+                    phase.count(key, value)
+
+            appLogger.info(
+                f"rfc subseries inserted: table=rfc_subseries subseries={counts['rfc_subseries']} members={counts['rfc_subseries_members']} not_issued={counts['rfc_not_issued']}"
             )
-            updated_by = (
-                [remove_zerofill(item) for item in entry["updated_by"]]
-                if entry["updated_by"]
-                else None
+
+        if rfc_referencing_urls:
+            appLogger.info(
+                f"rfc subseries references inserting: table=rfc_subseries_references"
             )
-            see_also = (
-                [remove_zerofill(item) for item in entry["see_also"]]
-                if entry["see_also"]
-                else None
+
+            with metrics.phase("insert-subseries-references") as phase:
+                count = insert_rfc_subseries_references(conn)
+                phase.count("rows", count)
+
+            appLogger.info(
+                f"rfc subseries references inserted: table=rfc_subseries_references rows={count}"
             )
-            references = rfcReferences.get(doc_id, None)
-            referenced_by = rfcRerencedBy.get(doc_id, None)
 
-            if references:
-                references = sorted(
-                    references, key=lambda x: int(re.sub(r"^RFC0*", "", x))
-                )
+        with metrics.phase("commit"):
+            conn.commit()
+
+    # Export rfc entries
+    # ダウンロード用のデータベースを別のファイルに書き出す
+    if export_dbfile:
+        appLogger.info(f"rfc entries exporting: file={export_dbfile}")
 
-            if referenced_by:
-                referenced_by = sorted(
-                    referenced_by, key=lambda x: int(re.sub(r"^RFC0*", "", x))
+        abspath = os.path.abspath(export_dbfile)
+        dirpath = os.path.dirname(abspath)
+        if not os.path.exists(dirpath):
+            appLogger.error(
+                f"directory not found: path={export_dbfile} directory={dirpath}"
+            )
+            sys.exit(-1)
+
+        # 比較のため、元のrfc_entriesもディスクに書き出してからサイズを見積もる
+        source_bytes = None
+        if column_bytes:
+            conn.execute("CHECKPOINT;")
+            source_bytes = estimate_column_bytes(conn, "rfc_entries")
+
+        try:
+            with metrics.phase("export-dbfile") as phase:
+                count, export_bytes = export_rfc_entries(
+                    conn,
+                    abspath,
+                    with_abstract=not export_abstracts,
+                    column_bytes=column_bytes,
                 )
+                phase.count("entries", count)
+        except (duckdb.ConversionException, duckdb.InvalidInputException) as e:
+            appLogger.error(e)
+            appLogger.error(f"rfc entries cannot be converted without loss")
+            # 途中まで書き出したファイルは残さない
+            os.remove(abspath)
+            sys.exit(-1)
 
-            rfc_entries_nomalized.append(
-                {
-                    "doc_id": doc_id,
-                    "title": entry["title"],
-                    "author": entry["author"],
-                    "date": entry["date"],
-                    "format": entry["format"],
-                    "page_count": entry["page_count"],
-                    "keywords": entry["keywords"],
-                    "is_also": is_also,
-                    "obsoletes": obsoletes,
-                    "obsoleted_by": obsoleted_by,
-                    "updates": updates,
-                    "updated_by": updated_by,
-                    "see_also": see_also,
-                    "references": references,  # Here
-                    "referenced_by": referenced_by,  # Here
-                    "abstract": entry["abstract"],
-                    "draft": entry["draft"],
-                    "current_status": entry["current_status"],
-                    "publication_status": entry["publication_status"],
-                    "stream": entry["stream"],
-                    "errata_url": entry["errata_url"],
-                    "area": entry["area"],
-                    "wg_acronym": entry["wg_acronym"],
-                    "doi": entry["doi"],
-                }
+        if column_bytes:
+            for column, size in export_bytes.items():
+                appLogger.info(
+                    f"exported column bytes: column={column} bytes={size} source_bytes={source_bytes.get(column, 0)}"
+                )
+            appLogger.info(
+                f"exported column bytes: column_bytes={sum(export_bytes.values())} source_column_bytes={sum(source_bytes.values())}"
             )
 
-        appLogger.info(f"rfc entries normalized")
+        appLogger.info(
+            f"rfc entries exported: file={export_dbfile} entries={count} bytes={os.path.getsize(abspath)}"
+        )
+
+    # Export rfc abstracts
+    # abstractを別のParquetファイルに書き出す
+    if export_abstracts:
+        appLogger.info(f"rfc abstracts exporting: file={export_abstracts}")
 
-        # Insert rfc entries
-        appLogger.info(f"rfc entries inserting: table=rfc_entries")
-        df = pd.DataFrame(rfc_entries_nomalized)
+        abspath = os.path.abspath(export_abstracts)
+        dirpath = os.path.dirname(abspath)
+        if not os.path.exists(dirpath):
+            appLogger.error(
+                f"directory not found: path={export_abstracts} directory={dirpath}"
+            )
+            sys.exit(-1)
 
-        # DataFrameを使ってテーブルにINSERT
-        conn.register("temp_table", df)
-        conn.execute("INSERT INTO rfc_entries SELECT * FROM temp_table;")
+        with metrics.phase("export-abstracts") as phase:
+            count, row_groups = export_rfc_abstracts(conn, abspath)
+            phase.count("entries", count)
 
-        appLogger.info(f"rfc entries inserted: table=rfc_entries")
+        appLogger.info(
+            f"rfc abstracts exported: file={export_abstracts} entries={count} row_groups={row_groups} bytes={os.path.getsize(abspath)}"
+        )
 
     # Finalize
     conn.close()
 
+    metrics.finish()
     appLogger.info(f"app finished")
 
 
@@ -1,15 +1,24 @@
 import sys
 import os
-import io
+import atexit
+import codecs
+import tempfile
 import logging
 import json
 import xml.etree.ElementTree as ET
-from zipfile import ZipFile
+from zipfile import ZipFile, ZipInfo
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from urllib.parse import urlparse, ParseResult
+from typing import BinaryIO, Iterable, Iterator, Optional
 
 import click
-import requests
+
+import http_fetch
+import parquet_export
+from parquet_export import RFC_REFERENCING_URLS_COLUMNS, write_parquet
+from run_metrics import RunMetrics
 
 
 # Making Python loggers output all messages to stdout in addition to log file
@@ -27,6 +36,240 @@ appLogger.setLevel(logging.INFO)
 appLogger.addHandler(handler)
 
 
+# ファイル名がrfcXXX.txtなもののみ
+# .txtで終わる、という判定だけだと、一部RFCドキュメントではないものも混じるため
+filename_matcher = re.compile(r"^(rfc|RFC)[0-9]+\.(txt|TXT)$")
+
+# URL抽出
+# https://stackoverflow.com/questions/720113/find-hyperlinks-in-text-using-python-twitter-related
+# https://stackoverflow.com/questions/839994/extracting-a-url-in-python
+#
+# 空白までをURLとみなし、そのうちrfc-editor.orgかietf.orgを含むものだけを候補として抽出する
+# "https?://[^ ]+"で全URLを抽出してから絞り込むのと同じ結果になるが、無関係なURLはここで読み飛ばされる
+url_candidate_pattern = re.compile(r"https?://[^ ]*?(?:rfc-editor|ietf)\.org[^ ]*")
+
+# RFC参照URLパターン1
+# Examples:
+# * http://rfc-editor.org/info/rfc6514
+# * http://www.rfc-editor.org/ien/ien23.txt
+# * http://www.rfc-editor.org/info/6325
+# * http://www.rfc-editor.org/info/bcp90
+# * http://www.rfc-editor.org/info/rfc5968
+# * http://www.rfc-editor.org/info/sstd63
+# * http://www.rfc-editor.org/info/std13
+# * http://www.rfc-editor.org/rfc/rfc7463.txt
+# * https://rfc-editor.org/info/bcp38
+# * https://www.rfc-editor.org/errata/eid7960
+# * https://www.rfc-editor.org/ien/ien119.txt
+# * https://www.rfc-editor.org/info/bcp97
+# * https://www.rfc-editor.org/info/fyi36
+# * https://www.rfc-editor.org/info/rfc2338
+# * https://www.rfc-editor.org/info/std53
+# * https://www.rfc-editor.org/info/std80
+# * https://www.rfc-editor.org/rfc/rfc5234
+url_pattern2 = re.compile(
+    r"(https?://(www\.)?rfc-editor\.org/(rfc|info|errata|ien|)/(rfc|bcp|std|sstd|fyi|eid|ien|)?[0-9]+(\.txt)?)"
+)
+
+# RFC参照URLパターン2
+# Examples:
+# * http://ietf.org/rfc/rfc7035.txt
+# * http://tools.ietf.org/html/rfc5965
+# * http://www.ietf.org/rfc/ien/ien116.txt
+# * http://www.ietf.org/rfc/rfc2780.txt
+url_pattern3 = re.compile(
+    r"(https?://((www|tools)\.)?ietf\.org/(rfc|html)/(rfc|ien/ien)[0-9]+(\.txt)?)"
+)
+
+
+# RFC本文の読み込み
+# ZIPのメンバー全体を読み込まず、チャンク単位でデコードしながら1行ずつ返す
+READ_CHUNK_SIZE = 64 * 1024
+
+
+# str.splitlines()が行の区切りとして扱う文字
+LINE_BREAKS = frozenset("\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029")
+
+
+# str.splitlines()と同じ区切り(\n, \r\n, \r, \f など)で、1行ずつ返す
+def iter_lines(stream: BinaryIO) -> Iterator[str]:
+    # https://qiita.com/kojix2/items/e038de99d8a1aa3c4ba4
+    # https://docs.python.org/ja/3/library/stdtypes.html#bytes.decode
+    # Form Feedの制御文字？か何かでエラーが出るRFCがあるので、エラーを無視する
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+    pending = ""
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        text = pending + decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            yield from text.splitlines()
+            return
+        if not text:
+            continue
+
+        # チャンクの末尾の行は、続きが次のチャンクにある可能性があるため持ち越す
+        # 末尾が"\r"の場合も、次のチャンクが"\n"から始まれば"\r\n"で1つの改行になるため持ち越す
+        lines = text.splitlines()
+        last = text[-1]
+        if last in LINE_BREAKS and last != "\r":
+            pending = ""
+        else:
+            pending = lines.pop() + ("\r" if last == "\r" else "")
+
+        yield from lines
+
+
+# RFC本文をパラグラフ単位に再構成し、1パラグラフずつ返す
+# パラグラフの間に空業(blank line)が入る(RFC2223で規定)
+def iter_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    # 行ごとに文字列を連結せず、断片をリストに溜めてパラグラフごとに1回だけ連結する
+    fragments: list[str] = []
+    append = fragments.append
+    for line in lines:
+        if not line:
+            if fragments:
+                yield "".join(fragments)
+                fragments.clear()
+        else:
+            if line.startswith("    ") and not line.startswith("     "):
+                line = line[4:]
+            if line.endswith(("-", "/", "_", "?", "&", "#")):
+                append(line.lstrip())
+            else:
+                append(" " + line)
+
+    # 空行で終わらない最後のパラグラフは、従来どおり対象にしない
+
+
+# RFC本文から他RFCへの参照URLを、見つかった順に返す
+def iter_referencing_urls(paragraphs: Iterable[str]) -> Iterator[str]:
+    for paragraph in paragraphs:
+        # 対象のドメインを含まないパラグラフは、正規表現を使うまでもなく参照URLはない
+        if "rfc-editor.org" not in paragraph and "ietf.org" not in paragraph:
+            continue
+
+        for candidate in url_candidate_pattern.finditer(paragraph):
+            extract_url = candidate.group()
+
+            # RFC参照URLパターン1
+            if "rfc-editor.org" in extract_url:
+                matched = url_pattern2.search(extract_url)
+                if matched:
+                    yield matched.group()
+                    continue
+
+            # RFC参照URLパターン2
+            if "ietf.org" in extract_url:
+                matched = url_pattern3.search(extract_url)
+                if matched:
+                    yield matched.group()
+
+
+# RFC本文から他RFCへの参照URLを抽出する
+def extract_referencing_urls(
+    paragraphs: Iterable[str], verbose: bool = False
+) -> list[str]:
+    result: set = set()
+    for extract_url in iter_referencing_urls(paragraphs):
+        if verbose:
+            appLogger.info(f"* {extract_url}")
+        result.add(extract_url)
+
+    # 実行ごと・プロセスごとに順序が変わらないようにソートする
+    return sorted(result)
+
+
+# ZIP内のRFC本文1件を解析し、(doc_id, 参照URL)を返す
+# metricsを指定した場合は、パラグラフの再構成(読み込み・デコードを含む)をreflowとして計測する
+# パラグラフはリストにせず逐次URLを抽出するため、matchの時間にはreflowの時間も含まれる
+def extract_zip_member(
+    input_zip: ZipFile,
+    name: str,
+    verbose: bool = False,
+    metrics: Optional[RunMetrics] = None,
+) -> tuple[str, list[str]]:
+    doc_id = name[:-4].upper()
+    if verbose:
+        appLogger.info(f"doc_id: {doc_id}")
+
+    with input_zip.open(name) as f:
+        paragraphs = iter_paragraphs(iter_lines(f))
+        if metrics:
+            paragraphs = metrics.timed("reflow", paragraphs, "paragraphs")
+            with metrics.phase("match") as phase:
+                urls = extract_referencing_urls(paragraphs, verbose=verbose)
+                phase.count("urls", len(urls))
+        else:
+            urls = extract_referencing_urls(paragraphs, verbose=verbose)
+
+    return doc_id, urls
+
+
+# 抽出結果のキャッシュ
+# 抽出ロジック(パラグラフの再構成やURLパターン)を変更した場合は、この値を更新してキャッシュを無効にすること
+EXTRACTOR_VERSION = 2
+
+# Format: { "version": 1, "entries": { "<member name>": { "crc": ..., "size": ..., "doc_id": "...", "urls": [ ... ] }, ... } }
+ExtractCache = dict[str, dict]
+
+
+def load_cache(path: str) -> ExtractCache:
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        appLogger.warning(e)
+        appLogger.warning(f"cache can not be loaded, ignored: file={path}")
+        return {}
+
+    if data.get("version") != EXTRACTOR_VERSION:
+        appLogger.info(
+            f"cache version mismatch, ignored: file={path} version={data.get('version')}"
+        )
+        return {}
+
+    return data.get("entries", {})
+
+
+def save_cache(path: str, entries: ExtractCache):
+    # 書き込み途中で中断されても壊れたキャッシュが残らないよう、一時ファイルから置き換える
+    tmppath = f"{path}.tmp"
+    with open(tmppath, mode="w") as f:
+        json.dump({"version": EXTRACTOR_VERSION, "entries": entries}, f)
+    os.replace(tmppath, path)
+
+
+# ZIPのメンバーが前回の実行から変更されていなければ、キャッシュの抽出結果を返す
+def lookup_cache(cache: ExtractCache, info: ZipInfo) -> tuple[str, list[str]] | None:
+    cached = cache.get(info.filename)
+    if cached and cached["crc"] == info.CRC and cached["size"] == info.file_size:
+        return cached["doc_id"], cached["urls"]
+    return None
+
+
+# プロセスプール用
+# 各ワーカープロセスは、ZIPファイルをパスから自分で開き、解析結果のみを返す
+worker_zip: ZipFile = None
+
+
+def init_worker(zippath: str):
+    global worker_zip
+    worker_zip = ZipFile(zippath)
+
+
+def extract_zip_member_in_worker(
+    name: str, verbose: bool = False
+) -> tuple[str, list[str]]:
+    try:
+        return extract_zip_member(worker_zip, name, verbose=verbose)
+    except Exception as e:
+        raise RuntimeError(f"rfc extract error: file={name}: {e}") from None
+
+
 @click.command()
 @click.option(
     "--url",
@@ -43,6 +286,20 @@ appLogger.addHandler(handler)
     required=False,
     help="各RFC本文をURLから取得せずローカルのファイルを参照する場合に利用する",
 )
+@click.option(
+    "--download-file",
+    type=str,
+    default=None,
+    required=False,
+    help="URLから取得したZIPの保存先. 指定した場合、次回以降は変更がなければ再利用し、中断したダウンロードは再開する",
+)
+@click.option(
+    "--cache-dir",
+    type=str,
+    default=None,
+    required=False,
+    help="URLから取得したファイルのキャッシュディレクトリ. 上流に変更がなく出力が最新の場合は処理を省略する",
+)
 @click.option(
     "--file",
     type=str,
@@ -50,15 +307,80 @@ appLogger.addHandler(handler)
     required=False,
     help="各RFCから他RFCへの参照URLの抽出結果を出力するファイル",
 )
+@click.option(
+    "--parquet-file",
+    type=str,
+    default=None,
+    required=False,
+    help="抽出結果をParquet(zstd圧縮、rfc_number順、1行1RFC)で出力するファイル. --fileと同時に指定した場合は両方に出力する",
+)
+@click.option(
+    "--cache",
+    type=str,
+    default=None,
+    required=False,
+    help="抽出結果のキャッシュファイル(JSON). 前回から変更のないRFC本文は解析をスキップする",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="各RFC本文の解析を並列に実行するプロセス数",
+)
+@click.option(
+    "--metrics-file",
+    type=str,
+    default=None,
+    required=False,
+    help="フェーズごとの処理時間・CPU時間・ピークメモリ・件数を、終了時にJSONで出力するファイル",
+)
+@click.option(
+    "--prometheus-file",
+    type=str,
+    default=None,
+    required=False,
+    help="--metrics-fileと同じ内容を、Prometheus(node_exporterのtextfile collector)の形式で出力するファイル",
+)
 @click.option("--verbose", is_flag=True, show_default=True, default=False, help="")
-def main(url: str, zipfile: str, file: str, verbose: bool):
+def main(
+    url: str,
+    zipfile: str,
+    download_file: str,
+    cache_dir: str,
+    file: str,
+    parquet_file: str,
+    cache: str,
+    workers: int,
+    metrics_file: str,
+    prometheus_file: str,
+    verbose: bool,
+):
     appLogger.info(f"app start")
     appLogger.info(f"command line argument: --url = {url}")
     appLogger.info(f"command line argument: --zipfile = {zipfile}")
+    appLogger.info(f"command line argument: --download-file = {download_file}")
+    appLogger.info(f"command line argument: --cache-dir = {cache_dir}")
     appLogger.info(f"command line argument: --file = {file}")
+    appLogger.info(f"command line argument: --parquet-file = {parquet_file}")
+    appLogger.info(f"command line argument: --cache = {cache}")
+    appLogger.info(f"command line argument: --workers = {workers}")
+    appLogger.info(f"command line argument: --metrics-file = {metrics_file}")
+    appLogger.info(f"command line argument: --prometheus-file = {prometheus_file}")
     appLogger.info(f"command line argument: --verbose = {verbose}")
 
+    metrics = RunMetrics("extract_rfc_referencing_urls_from_rfc_txts", appLogger)
+    metrics.write_at_exit(metrics_file, prometheus_file)
+
+    # 出力の内容に影響する入力とスクリプト(抽出処理の変更はソースのハッシュに反映される)
+    outputs = [output for output in [file, parquet_file] if output]
+    stamp = http_fetch.output_stamp(
+        {"url": url, "zipfile": os.path.abspath(zipfile) if zipfile else None},
+        [__file__, parquet_export.__file__],
+    )
+
     input_zip: ZipFile = None
+    zippath: str = None
     try:
         if zipfile:
             abspath = os.path.abspath(zipfile)
@@ -67,19 +389,46 @@ def main(url: str, zipfile: str, file: str, verbose: bool):
             )
 
             input_zip = ZipFile(abspath)
+            zippath = abspath
             appLogger.info(
                 f"zipfile imported from the zip file: file={zipfile} filepath={abspath}"
             )
         else:
             appLogger.info(f"zipfile importing from internet: url={url}")
 
-            resp: requests.Response = requests.get(url)
-            resp.raise_for_status()
-
-            # https://stackoverflow.com/questions/10908877/extracting-a-zipfile-to-memory
-            # https://qiita.com/nujust/items/9cb4564e712720549bc1
-            input_zip = ZipFile(io.BytesIO(resp.content))
-            appLogger.info(f"zipfile imported from internet: url={url}")
+            # ZIPはメモリ上ではなくディスクに保存してから開く
+            # 保存先の指定がなければ一時ファイルに保存し、終了時に削除する
+            with metrics.phase("download") as phase:
+                if download_file:
+                    zippath = os.path.abspath(download_file)
+                    modified = http_fetch.download(url, zippath)
+                elif cache_dir:
+                    zippath, modified = http_fetch.fetch(
+                        url, os.path.abspath(cache_dir)
+                    )
+                else:
+                    fd, zippath = tempfile.mkstemp(suffix=".zip")
+                    os.close(fd)
+                    atexit.register(os.remove, zippath)
+                    modified = http_fetch.download(url, zippath)
+                phase.count("modified", int(modified))
+
+            # 上流のZIPに変更がなく、出力がすべて最新であれば、以降の処理は不要
+            if outputs and all(
+                http_fetch.is_up_to_date(
+                    os.path.abspath(output), zippath, modified, stamp
+                )
+                for output in outputs
+            ):
+                appLogger.info(
+                    f"zipfile not modified and output is up to date, skipped: url={url} file={file} parquet_file={parquet_file}"
+                )
+                metrics.finish("skipped")
+                appLogger.info("app finished")
+                return
+
+            input_zip = ZipFile(zippath)
+            appLogger.info(f"zipfile imported from internet: url={url} file={zippath}")
 
     except Exception as e:
         appLogger.error(e)
@@ -88,120 +437,103 @@ def main(url: str, zipfile: str, file: str, verbose: bool):
 
     appLogger.info(f"rfc referencing urls extracting")
 
-    # ファイル名がrfcXXX.txtなもののみ
-    # .txtで終わる、という判定だけだと、一部RFCドキュメントではないものも混じるため
-    filename_matcher = re.compile(r"^(rfc|RFC)[0-9]+\.(txt|TXT)$")
-
-    # URL抽出
-    # https://stackoverflow.com/questions/720113/find-hyperlinks-in-text-using-python-twitter-related
-    # https://stackoverflow.com/questions/839994/extracting-a-url-in-python
-    url_pattern1 = re.compile(r"(https?://[^ ]+)")
-
-    # RFC参照URLパターン1
-    # Examples:
-    # * http://rfc-editor.org/info/rfc6514
-    # * http://www.rfc-editor.org/ien/ien23.txt
-    # * http://www.rfc-editor.org/info/6325
-    # * http://www.rfc-editor.org/info/bcp90
-    # * http://www.rfc-editor.org/info/rfc5968
-    # * http://www.rfc-editor.org/info/sstd63
-    # * http://www.rfc-editor.org/info/std13
-    # * http://www.rfc-editor.org/rfc/rfc7463.txt
-    # * https://rfc-editor.org/info/bcp38
-    # * https://www.rfc-editor.org/errata/eid7960
-    # * https://www.rfc-editor.org/ien/ien119.txt
-    # * https://www.rfc-editor.org/info/bcp97
-    # * https://www.rfc-editor.org/info/rfc2338
-    # * https://www.rfc-editor.org/info/std53
-    # * https://www.rfc-editor.org/info/std80
-    # * https://www.rfc-editor.org/rfc/rfc5234
-    url_pattern2 = re.compile(
-        r"(https?://(www\.)?rfc-editor\.org/(rfc|info|errata|ien|)/(rfc|bcp|std|sstd|eid|ien|)?[0-9]+(\.txt)?)"
+    infos = [
+        info
+        for info in input_zip.infolist()
+        if filename_matcher.fullmatch(info.filename)
+    ]
+
+    # 前回から変更のないRFC本文(ファイル名・CRC・サイズが一致するもの)は、キャッシュの抽出結果を使う
+    extract_cache: ExtractCache = {}
+    results: dict[str, tuple[str, list[str]]] = {}
+    if cache:
+        with metrics.phase("load-cache") as phase:
+            extract_cache = load_cache(os.path.abspath(cache))
+            for info in infos:
+                cached = lookup_cache(extract_cache, info)
+                if cached:
+                    results[info.filename] = cached
+            phase.count("documents", len(results))
+
+    names = [info.filename for info in infos if info.filename not in results]
+    appLogger.info(
+        f"rfc referencing urls extracting: targets={len(names)} cached={len(results)}"
     )
 
-    # RFC参照URLパターン2
-    # Examples:
-    # * http://ietf.org/rfc/rfc7035.txt
-    # * http://tools.ietf.org/html/rfc5965
-    # * http://www.ietf.org/rfc/ien/ien116.txt
-    # * http://www.ietf.org/rfc/rfc2780.txt
-    url_pattern3 = re.compile(
-        r"(https?://((www|tools)\.)?ietf\.org/(rfc|html)/(rfc|ien/ien)[0-9]+(\.txt)?)"
-    )
-
-    referencingURLsMap: dict = {}
-
-    for name in input_zip.namelist():
-        if filename_matcher.fullmatch(name):
-            # print("name: ", name)
-            zip_content: bytes = input_zip.read(name)
+    # --workersが2以上の場合、パラグラフの再構成とURLの抽出はワーカープロセスで行うため、reflow, matchは記録されない
+    # ワーカープロセスのCPU時間は、extractのchildren_cpu_secondsに含まれる
+    with metrics.phase("extract") as phase:
+        if workers > 1 and len(names) > 1:
+            # ZIPのメンバーごとの解析をプロセスプールで並列に実行する
+            # 結果はnamelist()の順で受け取るため、出力は逐次実行の場合と同じになる
+            chunksize = max(1, len(names) // (workers * 8))
             try:
-                doc_id = name[:-4].upper()
-                if verbose:
-                    appLogger.info(f"doc_id: {doc_id}")
-
-                # https://qiita.com/kojix2/items/e038de99d8a1aa3c4ba4
-                # https://docs.python.org/ja/3/library/stdtypes.html#bytes.decode
-                zip_content_str: str = zip_content.decode(
-                    "utf-8", errors="ignore"
-                )  # Form Feedの制御文字？か何かでエラーが出るRFCがあるので、エラーを無視する
-                # print(zip_content_str)
-
-                lines = zip_content_str.splitlines()
-                paragraphs = []  # パラグラフの間に空業(blank line)が入る(RFC2223で規定)
-                current_paragraph: str = ""
-                for line in lines:
-                    if line == "":
-                        if current_paragraph != "":
-                            paragraphs.append(current_paragraph)
-                            current_paragraph = ""
-                    else:
-                        if line.startswith("    ") and not line.startswith("     "):
-                            line = line[4:]
-                        if (
-                            line.endswith("-")
-                            or line.endswith("/")
-                            or line.endswith("_")
-                            or line.endswith("?")
-                            or line.endswith("&")
-                            or line.endswith("#")
-                        ):
-                            current_paragraph += line.lstrip()
-                        else:
-                            current_paragraph += " " + line
-
-                result: set = set()
-                for paragraph in paragraphs:
-                    # 簡易抽出
-                    extract_urls = [items for items in url_pattern1.findall(paragraph)]
-
-                    # 簡易抽出したものから、WebのURLをフィルタ
-                    for extract_url in extract_urls:
-                        # RFC参照URLパターン1
-                        urls = url_pattern2.findall(extract_url)
-                        if len(urls) > 0:
-                            extract_url = urls[0][0]
-                            if verbose:
-                                appLogger.info(f"* {extract_url}")
-                            result.add(extract_url)
-
-                        # RFC参照URLパターン2
-                        urls = url_pattern3.findall(extract_url)
-                        if len(urls) > 0:
-                            extract_url = urls[0][0]
-                            if verbose:
-                                appLogger.info(f"* {extract_url}")
-                            result.add(extract_url)
-
-                referencingURLsMap[doc_id] = list(result)
-
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=init_worker,
+                    initargs=(zippath,),
+                ) as executor:
+                    for name, result in zip(
+                        names,
+                        executor.map(
+                            partial(extract_zip_member_in_worker, verbose=verbose),
+                            names,
+                            chunksize=chunksize,
+                        ),
+                    ):
+                        results[name] = result
             except Exception as e:
                 appLogger.error(e)
-                appLogger.error(f"rfc extract error: file={name}")
+                appLogger.error("rfc extract error")
                 sys.exit(-1)
+        else:
+            for name in names:
+                # print("name: ", name)
+                try:
+                    results[name] = extract_zip_member(
+                        input_zip, name, verbose=verbose, metrics=metrics
+                    )
+
+                except Exception as e:
+                    appLogger.error(e)
+                    appLogger.error(f"rfc extract error: file={name}")
+                    sys.exit(-1)
+        phase.count("documents", len(names))
+        phase.count("urls", sum(len(results[name][1]) for name in names))
+
+    referencingURLsMap: dict = {}
+    for info in infos:
+        doc_id, urls = results[info.filename]
+        referencingURLsMap[doc_id] = urls
 
     appLogger.info(f"rfc referencing urls extracted")
 
+    if cache:
+        abspath = os.path.abspath(cache)
+        appLogger.info(f"cache saving: file={cache} filepath={abspath}")
+
+        # ZIPに存在しなくなったメンバーはキャッシュから削除される
+        with metrics.phase("save-cache") as phase:
+            save_cache(
+                abspath,
+                {
+                    info.filename: {
+                        "crc": info.CRC,
+                        "size": info.file_size,
+                        "doc_id": results[info.filename][0],
+                        "urls": results[info.filename][1],
+                    }
+                    for info in infos
+                },
+            )
+            phase.count("documents", len(infos))
+
+        appLogger.info(f"cache saved: file={cache} filepath={abspath}")
+
+    # 出力を書き出し終えるまでは、前回のスタンプを残さない
+    for output in outputs:
+        http_fetch.discard_output_stamp(os.path.abspath(output))
+
     if file:
         abspath = os.path.abspath(file)
         with open(abspath, mode="w") as f:
@@ -209,10 +541,39 @@ def main(url: str, zipfile: str, file: str, verbose: bool):
                 f"data exporting to the file: file={file} filepath={abspath}"
             )
 
-            f.write(json.dumps(referencingURLsMap, indent=4))
+            with metrics.phase("write-json") as phase:
+                f.write(json.dumps(referencingURLsMap, indent=4))
+                phase.count("entries", len(referencingURLsMap))
 
             appLogger.info(f"data exported to the file: file={file} filepath={abspath}")
 
+    if parquet_file:
+        abspath = os.path.abspath(parquet_file)
+        appLogger.info(
+            f"data exporting to the parquet file: file={parquet_file} filepath={abspath}"
+        )
+
+        with metrics.phase("write-parquet") as phase:
+            count, row_groups = write_parquet(
+                (
+                    {"doc_id": doc_id, "urls": urls}
+                    for doc_id, urls in referencingURLsMap.items()
+                ),
+                abspath,
+                RFC_REFERENCING_URLS_COLUMNS,
+            )
+            phase.count("entries", count)
+
+        appLogger.info(
+            f"data exported to the parquet file: file={parquet_file} filepath={abspath} entries={count} row_groups={row_groups} bytes={os.path.getsize(abspath)}"
+        )
+
+    for output in outputs:
+        http_fetch.save_output_stamp(os.path.abspath(output), stamp)
+
+    input_zip.close()
+
+    metrics.finish()
     appLogger.info("app finished")
 
 
@@ -1,9 +1,14 @@
 import sys
+import os
+import json
 import logging
+from typing import Dict, Optional
 import xml.etree.ElementTree as ET
 
 import click
-import requests
+
+import http_fetch
+from run_metrics import RunMetrics
 
 
 # Making Python loggers output all messages to stdout in addition to log file
@@ -23,74 +28,148 @@ appLogger.addHandler(handler)
 
 # 実行例
 """
-$ python get_rfc_all_xmlpath.py 
-command line argument: url = https://www.rfc-editor.org/rfc-index.xml
-/{https://www.rfc-editor.org/rfc-index}rfc-index
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}bcp-entry
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}bcp-entry/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}bcp-entry/{https://www.rfc-editor.org/rfc-index}is-also
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}bcp-entry/{https://www.rfc-editor.org/rfc-index}is-also/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}fyi-entry
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}fyi-entry/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}fyi-entry/{https://www.rfc-editor.org/rfc-index}is-also
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}fyi-entry/{https://www.rfc-editor.org/rfc-index}is-also/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}abstract
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}abstract/{https://www.rfc-editor.org/rfc-index}p
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}area
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}author
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}author/{https://www.rfc-editor.org/rfc-index}name
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}author/{https://www.rfc-editor.org/rfc-index}title
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}current-status
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}date
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}date/{https://www.rfc-editor.org/rfc-index}day
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}date/{https://www.rfc-editor.org/rfc-index}month
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}date/{https://www.rfc-editor.org/rfc-index}year
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}doi
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}draft
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}errata-url
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}format
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}format/{https://www.rfc-editor.org/rfc-index}file-format
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}is-also
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}is-also/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}keywords
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}keywords/{https://www.rfc-editor.org/rfc-index}kw
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}obsoleted-by
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}obsoleted-by/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}obsoletes
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}obsoletes/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}page-count
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}publication-status
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}see-also
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}see-also/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}stream
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}title
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}updated-by
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}updated-by/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}updates
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}updates/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}wg_acronym
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-not-issued-entry
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-not-issued-entry/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}std-entry
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}std-entry/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}std-entry/{https://www.rfc-editor.org/rfc-index}is-also
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}std-entry/{https://www.rfc-editor.org/rfc-index}is-also/{https://www.rfc-editor.org/rfc-index}doc-id
-/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}std-entry/{https://www.rfc-editor.org/rfc-index}title
+$ python get_all_xmlpaths_from_rfc_index.py --xmlfile ./rfc-index.xml
+/{https://www.rfc-editor.org/rfc-index}rfc-index count=1 min=1 max=1
+/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}bcp-entry count=6 min=6 max=6
+/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}bcp-entry/{https://www.rfc-editor.org/rfc-index}doc-id count=6 min=1 max=1 samples=["BCP0001", "BCP0002", "BCP0003"]
+/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}bcp-entry/{https://www.rfc-editor.org/rfc-index}is-also count=5 min=0 max=1
+/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}bcp-entry/{https://www.rfc-editor.org/rfc-index}is-also/{https://www.rfc-editor.org/rfc-index}doc-id count=10 min=2 max=2 samples=["RFC0003", "RFC0004", "RFC0006"]
+...
+/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}author count=787 min=1 max=3
+/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}author/{https://www.rfc-editor.org/rfc-index}name count=787 min=1 max=1 samples=["A. Author0", "A. Author1", "A. Author2"]
+/{https://www.rfc-editor.org/rfc-index}rfc-index/{https://www.rfc-editor.org/rfc-index}rfc-entry/{https://www.rfc-editor.org/rfc-index}author/{https://www.rfc-editor.org/rfc-index}title count=164 min=0 max=1 samples=["Editor"]
+...
+
+* count: 要素の出現数
+* min, max: 親要素1つあたりの出現数の最小・最大. minが0なら省略可能、maxが2以上なら繰り返しのある要素
+* samples: 値(テキスト)のサンプル. --samplesで数を指定する
 """
 
+# プロファイルのJSONの形式を変更した場合は、この値を更新すること
+PROFILE_VERSION = 1
+
+# サンプルとして保持する値の最大の長さ
+SAMPLE_MAX_LENGTH = 80
+
+
+# XMLのパスごとの統計
+class PathStats:
+    def __init__(self, parent: Optional[str]):
+        self.parent = parent
+        self.count = 0
+        # 1つ以上出現した親要素での、親要素1つあたりの出現数の最小・最大と、そのような親要素の数
+        # 出現しなかった親要素は数えないため、最小が0かどうかは親要素の数と比べて求める
+        self.min_per_parent: Optional[int] = None
+        self.max_per_parent = 0
+        self.parents = 0
+        self.samples: list[str] = []
+
+
+# XMLを逐次解析し、パスごとの出現数、親要素1つあたりの出現数の最小・最大、値のサンプルを1回の走査で集計する
+#
+# * 開いている要素のパスをスタックで持ち、パスの文字列は(親のパス, タグ)ごとに1回だけ作る
+# * 要素ごとに持つのは子要素のパスごとの出現数のみで、要素の終了時に統計に反映する
+# * ルート直下の要素は処理後にclearするので、保持するのは常にエントリ1つ分のみ
+#
+# 戻り値は(パスごとの統計, 要素数)
+def profile_xml(source, max_samples: int) -> tuple[Dict[str, PathStats], int]:
+    stats: Dict[str, PathStats] = {}
+    paths: Dict[tuple[str, str], str] = {}
+    # 開いている要素ごとの(パス, 子要素のパスごとの出現数)
+    stack: list[tuple[str, Dict[str, int]]] = []
+    root: ET.Element = None
+    elements = 0
+
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parent = stack[-1][0] if stack else ""
+            path = paths.get((parent, element.tag))
+            if path is None:
+                path = f"{parent}/{element.tag}"
+                paths[(parent, element.tag)] = path
+                stats[path] = PathStats(parent if stack else None)
+
+            if stack:
+                child_counts = stack[-1][1]
+                child_counts[path] = child_counts.get(path, 0) + 1
+            else:
+                root = element
+            stack.append((path, {}))
+            continue
+
+        path, child_counts = stack.pop()
+        elements += 1
+
+        path_stats = stats[path]
+        path_stats.count += 1
+
+        for child_path, count in child_counts.items():
+            child_stats = stats[child_path]
+            child_stats.parents += 1
+            if child_stats.min_per_parent is None or count < child_stats.min_per_parent:
+                child_stats.min_per_parent = count
+            if count > child_stats.max_per_parent:
+                child_stats.max_per_parent = count
+
+        if len(path_stats.samples) < max_samples and element.text:
+            text = element.text.strip()[:SAMPLE_MAX_LENGTH]
+            if text and text not in path_stats.samples:
+                path_stats.samples.append(text)
 
-# 再帰的にXMLの全パスを出力する
-def get_xml_paths(element, path="") -> set:
-    current_path = f"{path}/{element.tag}"
-    s = set([current_path])
+        # 処理済みのエントリを破棄する
+        if len(stack) == 1:
+            root.clear()
 
-    for child in element:
-        child_set = get_xml_paths(child, current_path)
-        s = s | child_set
+    return stats, elements
 
-    return s
+
+# 統計をJSONに出力する形式(パス順)に変換する
+# 親要素1つあたりの出現数の最小は、出現しなかった親要素があれば0とする
+def build_profile(stats: Dict[str, PathStats]) -> Dict[str, dict]:
+    profile = {}
+    for path in sorted(stats):
+        path_stats = stats[path]
+        if path_stats.parent is None:
+            # ルート
+            minimum, maximum = 1, 1
+        elif path_stats.parents < stats[path_stats.parent].count:
+            minimum, maximum = 0, path_stats.max_per_parent
+        else:
+            minimum, maximum = path_stats.min_per_parent, path_stats.max_per_parent
+        profile[path] = {
+            "count": path_stats.count,
+            "min": minimum,
+            "max": maximum,
+            "samples": path_stats.samples,
+        }
+    return profile
+
+
+# 基準のプロファイルと比べ、スキーマの変化を返す
+# 件数や最大数は上流の更新で常に変わるため、パスの追加・削除と、
+# 必須(min > 0)か省略可能か、繰り返し(max > 1)があるかどうかの変化のみを対象にする
+def compare_profiles(baseline: Dict[str, dict], profile: Dict[str, dict]) -> list[str]:
+    differences = []
+    for path in sorted(profile.keys() - baseline.keys()):
+        differences.append(f"path added: path={path}")
+    for path in sorted(baseline.keys() - profile.keys()):
+        differences.append(f"path removed: path={path}")
+    for path in sorted(profile.keys() & baseline.keys()):
+        before, after = baseline[path], profile[path]
+        if (before["min"] > 0) != (after["min"] > 0):
+            differences.append(
+                f"optionality changed: path={path} min={before['min']}->{after['min']}"
+            )
+        if (before["max"] > 1) != (after["max"] > 1):
+            differences.append(
+                f"multiplicity changed: path={path} max={before['max']}->{after['max']}"
+            )
+    return differences
+
+
+def load_profile(path: str) -> Dict[str, dict]:
+    with open(path) as f:
+        return json.load(f)["paths"]
 
 
 @click.command()
@@ -100,26 +179,202 @@ def get_xml_paths(element, path="") -> set:
     default="https://www.rfc-editor.org/rfc-index.xml",
     help="RFC一覧のXML形式が取得できるエンドポイント",
 )
-def main(url: str):
+@click.option(
+    "--xmlfile",
+    type=str,
+    default=None,
+    required=False,
+    help="XMLをURLから取得せずローカルのファイルを参照する場合に利用する",
+)
+@click.option(
+    "--cache-dir",
+    type=str,
+    default=None,
+    required=False,
+    help="URLから取得したファイルのキャッシュディレクトリ. 上流に変更がなければダウンロードを省略し、--fileが最新であれば解析も省略する",
+)
+@click.option(
+    "-f",
+    "--file",
+    type=str,
+    default=None,
+    required=False,
+    help="パスごとの統計(プロファイル)をJSONで出力するファイル. 指定しない場合はstdoutに1行1パスで出力する",
+)
+@click.option(
+    "--baseline",
+    type=str,
+    default=None,
+    required=False,
+    help="以前に--fileで出力したプロファイル. パスの追加・削除、必須・繰り返しの変化があれば、異常終了する",
+)
+@click.option(
+    "--samples",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="パスごとに保持する値のサンプルの数",
+)
+@click.option(
+    "--metrics-file",
+    type=str,
+    default=None,
+    required=False,
+    help="フェーズごとの処理時間・CPU時間・ピークメモリ・件数を、終了時にJSONで出力するファイル",
+)
+@click.option(
+    "--prometheus-file",
+    type=str,
+    default=None,
+    required=False,
+    help="--metrics-fileと同じ内容を、Prometheus(node_exporterのtextfile collector)の形式で出力するファイル",
+)
+def main(
+    url: str,
+    xmlfile: str,
+    cache_dir: str,
+    file: str,
+    baseline: str,
+    samples: int,
+    metrics_file: str,
+    prometheus_file: str,
+):
     appLogger.info(f"app start")
     appLogger.info(f"command line argument: --url = {url}")
+    appLogger.info(f"command line argument: --xmlfile = {xmlfile}")
+    appLogger.info(f"command line argument: --cache-dir = {cache_dir}")
+    appLogger.info(f"command line argument: --file = {file}")
+    appLogger.info(f"command line argument: --baseline = {baseline}")
+    appLogger.info(f"command line argument: --samples = {samples}")
+    appLogger.info(f"command line argument: --metrics-file = {metrics_file}")
+    appLogger.info(f"command line argument: --prometheus-file = {prometheus_file}")
+
+    metrics = RunMetrics("get_all_xmlpaths_from_rfc_index", appLogger)
+    metrics.write_at_exit(metrics_file, prometheus_file)
+
+    if file:
+        abspath = os.path.abspath(file)
+        dirpath = os.path.dirname(abspath)
+        if not os.path.exists(dirpath):
+            appLogger.error(f"directory not found: path={file} directory={dirpath}")
+            sys.exit(-1)
+
+    # プロファイルの内容に影響する入力・オプションとスクリプト
+    stamp = http_fetch.output_stamp(
+        {
+            "url": url,
+            "xmlfile": os.path.abspath(xmlfile) if xmlfile else None,
+            "samples": samples,
+        },
+        [__file__],
+    )
 
     # RFC Indexの取得
-    appLogger.info(f"rfc index importing from internet: url={url}")
+    # 全体を読み込まず、ファイルまたはHTTPレスポンスのボディから逐次読み込む
+    profile: Dict[str, dict] = None
+    source = None
+    try:
+        if xmlfile:
+            abspath = os.path.abspath(xmlfile)
+            appLogger.info(
+                f"rfc index importing from the xml file: file={xmlfile} filepath={abspath}"
+            )
+            source = open(abspath, mode="rb")
+        elif cache_dir:
+            appLogger.info(f"rfc index importing from internet: url={url}")
+
+            with metrics.phase("download") as phase:
+                xmlpath, modified = http_fetch.fetch(url, os.path.abspath(cache_dir))
+                phase.count("modified", int(modified))
+
+            # 上流のXMLに変更がなく、出力が最新であれば、前回のプロファイルをそのまま使う
+            if file and http_fetch.is_up_to_date(
+                os.path.abspath(file), xmlpath, modified, stamp
+            ):
+                appLogger.info(
+                    f"rfc index not modified and profile is up to date, skipped: url={url} file={file}"
+                )
+                profile = load_profile(os.path.abspath(file))
+            else:
+                source = open(xmlpath, mode="rb")
+        else:
+            appLogger.info(f"rfc index importing from internet: url={url}")
+
+            resp = http_fetch.get_session().get(url, stream=True)
+            resp.raise_for_status()
+
+            # Content-Encoding(gzipなど)を展開した状態で読み込む
+            resp.raw.decode_content = True
+            source = resp.raw
+    except Exception as e:
+        appLogger.error(e)
+        appLogger.error("rfc index can not be loaded")
+        sys.exit(-1)
+
+    # XMLの逐次解析とパスごとの集計
+    # 解析と集計は同じ走査で行うため、parseの時間には集計の時間も含まれる
+    # (HTTPから直接読み込む場合は、ダウンロードの時間もparseに含まれる)
+    if source is not None:
+        try:
+            with metrics.phase("parse") as phase:
+                stats, elements = profile_xml(source, samples)
+                phase.count("elements", elements)
+                phase.count("paths", len(stats))
+        except ET.ParseError as e:
+            appLogger.error(e)
+            appLogger.error("rfc index is not properly formatted")
+            sys.exit(-1)
+        finally:
+            source.close()
+
+        appLogger.info(f"rfc index profiled: elements={elements} paths={len(stats)}")
+
+        profile = build_profile(stats)
+
+        # プロファイルの出力
+        if file:
+            abspath = os.path.abspath(file)
+            appLogger.info(
+                f"profile exporting to the file: file={file} filepath={abspath}"
+            )
+            http_fetch.discard_output_stamp(abspath)
+            with metrics.phase("write-json"):
+                with open(abspath, mode="w") as f:
+                    json.dump(
+                        {"version": PROFILE_VERSION, "paths": profile}, f, indent=4
+                    )
+            http_fetch.save_output_stamp(abspath, stamp)
+            appLogger.info(
+                f"profile exported to the file: file={file} filepath={abspath} paths={len(profile)}"
+            )
+        else:
+            for path, path_profile in profile.items():
+                line = f"{path} count={path_profile['count']} min={path_profile['min']} max={path_profile['max']}"
+                if path_profile["samples"]:
+                    line += f" samples={json.dumps(path_profile['samples'])}"
+                print(line)
 
-    resp = requests.get(url)
-    resp.raise_for_status()
+    # 基準のプロファイルとの比較
+    if baseline:
+        try:
+            baseline_profile = load_profile(os.path.abspath(baseline))
+        except (OSError, ValueError, KeyError) as e:
+            appLogger.error(e)
+            appLogger.error(f"baseline can not be loaded: file={baseline}")
+            sys.exit(-1)
 
-    root = ET.fromstring(resp.text)
-    appLogger.info(f"rfc index imported from internet: url={url}")
+        with metrics.phase("compare-baseline") as phase:
+            differences = compare_profiles(baseline_profile, profile)
+            phase.count("differences", len(differences))
 
-    # XMLPathの再帰的な取得
-    root_set = get_xml_paths(root)
+        if differences:
+            for difference in differences:
+                appLogger.error(f"schema drift detected: {difference}")
+            sys.exit(-1)
 
-    # XMLPathの出力
-    for path in sorted(root_set):
-        print(path)
+        appLogger.info(f"schema drift not detected: baseline={baseline}")
 
+    metrics.finish()
     appLogger.info(f"app finished")
 
 
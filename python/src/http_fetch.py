@@ -0,0 +1,262 @@
+import sys
+import os
+import logging
+import json
+import re
+import hashlib
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+
+
+# Making Python loggers output all messages to stdout in addition to log file
+# https://stackoverflow.com/questions/14058453/making-python-loggers-output-all-messages-to-stdout-in-addition-to-log-file
+formatter = logging.Formatter(
+    "%(asctime)s - %(pathname)s:%(lineno)d - %(levelname)s - %(message)s"
+)
+
+handler = logging.StreamHandler(sys.stdout)
+handler.setLevel(logging.DEBUG)
+handler.setFormatter(formatter)
+
+appLogger = logging.getLogger(__name__)
+appLogger.setLevel(logging.INFO)
+appLogger.addHandler(handler)
+
+
+# 各スクリプトから共通で利用する、HTTPでの取得処理
+#
+# * 接続を使い回すため、requests.Sessionを共有する
+# * 取得したファイルはETag/Last-Modifiedとともにキャッシュし、次回以降は条件付きGET(If-None-Match/If-Modified-Since)で取得する
+#   上流のファイルに変更がなければ(304)、ダウンロードもその後の処理も省略できる
+
+session: requests.Session = None
+
+
+def get_session() -> requests.Session:
+    global session
+    if session is None:
+        session = requests.Session()
+    return session
+
+
+# 全体をメモリに載せないよう、チャンク単位でディスクに書き出す
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def download_meta_path(path: str) -> str:
+    return f"{path}.meta.json"
+
+
+def load_download_meta(path: str) -> dict:
+    metapath = download_meta_path(path)
+    if not os.path.exists(path) or not os.path.exists(metapath):
+        return {}
+
+    try:
+        with open(metapath) as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        appLogger.warning(e)
+        appLogger.warning(f"download meta can not be loaded, ignored: file={metapath}")
+        return {}
+
+
+def save_download_meta(path: str, meta: dict):
+    with open(download_meta_path(path), mode="w") as f:
+        json.dump(meta, f)
+
+
+# Content-Rangeの(開始位置, 全体のサイズ)
+# Example: "bytes 100-199/1000" -> (100, 1000), "bytes 100-199/*" -> (100, None)
+def parse_content_range(value: Optional[str]) -> tuple[Optional[int], Optional[int]]:
+    match = re.fullmatch(r"bytes (\d+)-\d+/(\d+|\*)", (value or "").strip())
+    if not match:
+        return None, None
+    total = match.group(2)
+    return int(match.group(1)), None if total == "*" else int(total)
+
+
+# 前回のダウンロードの記録を破棄し、次は最初から取得させる
+def discard_download_meta(path: str):
+    metapath = download_meta_path(path)
+    if os.path.exists(metapath):
+        os.remove(metapath)
+
+
+# URLのファイルをpathにダウンロードし、ダウンロードした(変更があった)かどうかを返す
+# * 前回のダウンロードが完了していて、ETag/Last-Modifiedが変わっていなければ再利用する
+# * 前回のダウンロードが途中で中断していれば、Rangeリクエストで続きから再開する
+#   再開できない場合(416、Content-Rangeが要求と異なる)は最初から取得し直す
+# * Rangeはエンコードされたバイト列に対して適用されるため、Content-Encodingは使わない(identity)
+# * 取得したサイズが全体のサイズ(Content-Length、Content-Range)と一致しなければエラーとし、次回に再開する
+def download(url: str, path: str) -> bool:
+    meta = load_download_meta(path)
+    if meta.get("url") != url:
+        meta = {}
+
+    validator = meta.get("etag") or meta.get("last_modified")
+
+    headers = {"Accept-Encoding": "identity"}
+    offset = 0
+    if meta.get("complete"):
+        # 条件付きGET: 変更がなければ304が返る
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    elif meta and validator:
+        # 再開: 途中までのファイルが同じものであれば206で続きが返る. 変わっていれば200で全体が返る
+        # 全体のサイズ以上(最後のチャンクの書き込み後に中断した場合など)は、最初から取得し直す
+        size = os.path.getsize(path)
+        if 0 < size and (meta.get("total") is None or size < meta["total"]):
+            offset = size
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+
+    with get_session().get(url, headers=headers, stream=True) as resp:
+        if resp.status_code == 304:
+            appLogger.info(f"download skipped, not modified: url={url} file={path}")
+            return False
+
+        if resp.status_code == 206:
+            start, total = parse_content_range(resp.headers.get("Content-Range"))
+            restart = start != offset
+        else:
+            restart = resp.status_code == 416
+
+        if not restart:
+            return write_response(url, path, resp, offset)
+
+    appLogger.warning(
+        f"download can not be resumed, restarting: url={url} file={path} offset={offset} status={resp.status_code}"
+    )
+    discard_download_meta(path)
+    with get_session().get(
+        url, headers={"Accept-Encoding": "identity"}, stream=True
+    ) as resp:
+        return write_response(url, path, resp, 0)
+
+
+# レスポンスのボディをpathに書き出す. 206の場合はoffsetから続きを書き出す
+def write_response(url: str, path: str, resp: requests.Response, offset: int) -> bool:
+    resp.raise_for_status()
+
+    content_length = resp.headers.get("Content-Length")
+    if resp.status_code == 206:
+        appLogger.info(f"download resuming: url={url} file={path} offset={offset}")
+        mode = "ab" if offset else "wb"
+        _, total = parse_content_range(resp.headers.get("Content-Range"))
+        if total is None and content_length:
+            total = offset + int(content_length)
+    else:
+        offset = 0
+        mode = "wb"
+        total = int(content_length) if content_length else None
+
+    meta = {
+        "url": url,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "total": total,
+        "complete": False,
+    }
+    save_download_meta(path, meta)
+
+    loaded = offset
+    next_report = 0
+    with open(path, mode=mode) as f:
+        for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            f.write(chunk)
+            loaded += len(chunk)
+
+            # 進捗は10%ごと(サイズが不明な場合は100MBごと)に出力する
+            if total:
+                progress = loaded * 100 // total
+                if progress >= next_report:
+                    appLogger.info(f"downloading: {progress}% ({loaded}/{total} bytes)")
+                    next_report = progress // 10 * 10 + 10
+            elif loaded >= next_report:
+                appLogger.info(f"downloading: {loaded} bytes")
+                next_report = loaded + 100 * 1024 * 1024
+
+    # 途中で切断された場合などは、完了とせずに次回に再開する
+    if total is not None and loaded != total:
+        raise IOError(
+            f"download incomplete: url={url} file={path} loaded={loaded} total={total}"
+        )
+
+    meta["complete"] = True
+    save_download_meta(path, meta)
+
+    return True
+
+
+# キャッシュディレクトリ内の、URLに対応するファイルのパス
+# 例: https://www.rfc-editor.org/rfc-index.xml -> <cache_dir>/rfc-index.xml.<URLのハッシュ>
+def cache_path(cache_dir: str, url: str) -> str:
+    basename = os.path.basename(urlparse(url).path) or "index"
+    digest = hashlib.sha256(url.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{basename}.{digest}")
+
+
+# URLのファイルをキャッシュディレクトリに取得し、(ファイルのパス, 変更があったかどうか)を返す
+def fetch(url: str, cache_dir: str) -> tuple[str, bool]:
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, url)
+    modified = download(url, path)
+    return path, modified
+
+
+# 出力を作成した時のオプションとスクリプトのバージョン(ソースのハッシュ)
+# 上流のファイルに変更がなくても、オプションやスクリプトが変わっていれば出力を作り直す
+# Example: {"options": {"format": "json"}, "sources": {"trasform_rfc_index_to_json.py": "<sha256>"}}
+def output_stamp(options: dict, sources: list[str]) -> dict:
+    digests = {}
+    for source in sources:
+        with open(source, mode="rb") as f:
+            digests[os.path.basename(source)] = hashlib.file_digest(
+                f, "sha256"
+            ).hexdigest()
+    return {"options": options, "sources": digests}
+
+
+def output_stamp_path(output: str) -> str:
+    return f"{output}.stamp.json"
+
+
+def load_output_stamp(output: str) -> Optional[dict]:
+    stamppath = output_stamp_path(output)
+    if not os.path.exists(stamppath):
+        return None
+
+    try:
+        with open(stamppath) as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        appLogger.warning(e)
+        appLogger.warning(f"output stamp can not be loaded, ignored: file={stamppath}")
+        return None
+
+
+# 出力を書き出し終えてから保存する
+def save_output_stamp(output: str, stamp: dict):
+    with open(output_stamp_path(output), mode="w") as f:
+        json.dump(stamp, f, sort_keys=True)
+
+
+# 出力を書き出し始める前に削除し、途中で失敗した出力を最新とみなさないようにする
+def discard_output_stamp(output: str):
+    stamppath = output_stamp_path(output)
+    if os.path.exists(stamppath):
+        os.remove(stamppath)
+
+
+# 上流のファイルに変更がなく、出力がそれより新しく、同じオプション・スクリプトで作成されていれば、処理をやり直す必要はない
+def is_up_to_date(output: str, artifact: str, modified: bool, stamp: dict) -> bool:
+    if modified or not output or not os.path.exists(output):
+        return False
+    if load_output_stamp(output) != stamp:
+        return False
+    return os.path.getmtime(output) >= os.path.getmtime(artifact)
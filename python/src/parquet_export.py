@@ -0,0 +1,127 @@
+import os
+import json
+import tempfile
+from typing import Dict, Iterable
+
+import duckdb
+
+
+# 各スクリプトから共通で利用する、中間成果物(RFC Index, 参照URL)のスキーマとParquetでの書き出し処理
+#
+# * zstdで圧縮し、rfc_number順に並べて書き出す
+#   行グループごとにカラムのmin/maxの統計情報が書き込まれるため、rfc_numberなどでの絞り込みでは該当しない行グループを読み飛ばせる
+# * pyarrowなどには依存せず、出力済みのJSON(または一時ファイルのNDJSON)からDuckDBのCOPYで書き出す
+#   スキーマを明示して読み込むため、JSONで出力した場合と同じ型になる
+
+
+# RFC Index(JSON配列またはNDJSON)のスキーマ
+# DuckDBのread_jsonで直接読み込む際に指定する. 型推論に任せず、カラム名と型を明示する
+# 未知のキーは無視され、存在しないキーはNULLになる
+RFC_INDEX_COLUMNS: Dict[str, str] = {
+    "doc_id": "TEXT",
+    "title": "TEXT",
+    "author": "STRUCT(name TEXT, title TEXT)[]",
+    "date": "STRUCT(day TEXT, month TEXT, year TEXT)",
+    "format": "TEXT[]",
+    "page_count": "TEXT",
+    "keywords": "TEXT[]",
+    "is_also": "TEXT[]",
+    "obsoletes": "TEXT[]",
+    "obsoleted_by": "TEXT[]",
+    "updates": "TEXT[]",
+    "updated_by": "TEXT[]",
+    "see_also": "TEXT[]",
+    "abstract": "TEXT",
+    "draft": "TEXT",
+    "current_status": "TEXT",
+    "publication_status": "TEXT",
+    "stream": "TEXT",
+    "errata_url": "TEXT",
+    "area": "TEXT",
+    "wg_acronym": "TEXT",
+    "doi": "TEXT",
+}
+
+# 参照URL(extract_rfc_referencing_urls_from_rfc_txts.pyの結果)のスキーマ
+# JSONでは{ "<doc_id>": [ "<url>", ... ], ... }の1オブジェクトだが、Parquetでは1行1RFCにする
+RFC_REFERENCING_URLS_COLUMNS: Dict[str, str] = {
+    "doc_id": "TEXT",
+    "urls": "TEXT[]",
+}
+
+# RFC Index中のrfc-entry以外のエントリ(trasform_rfc_index_to_json.pyの--subseries-file)のスキーマ
+# kindはbcp, std, fyi, rfc-not-issuedのいずれか
+SUBSERIES_COLUMNS: Dict[str, str] = {
+    "kind": "TEXT",
+    "doc_id": "TEXT",
+    "title": "TEXT",
+    "is_also": "TEXT[]",
+}
+
+# 行グループの行数
+# 1行グループあたり約2000RFCとし、rfc_numberの範囲ごとに統計情報が分かれるようにする
+PARQUET_ROW_GROUP_SIZE = 2048
+
+
+def is_parquet_file(path: str) -> bool:
+    return path.lower().endswith(".parquet")
+
+
+# JSON配列またはNDJSONのファイルをParquetに変換する
+# 先頭にrfc_numberのカラムを追加し、rfc_number順(RFC以外のdoc_idは末尾)に並べる
+# 戻り値は(行数, 行グループ数)
+def write_json_as_parquet(
+    json_path: str, path: str, columns: Dict[str, str]
+) -> tuple[int, int]:
+    json_columns = ", ".join(
+        f"{name}: '{column_type}'" for name, column_type in columns.items()
+    )
+    quoted_path = path.replace("'", "''")
+
+    with duckdb.connect() as conn:
+        conn.execute(
+            f"""
+            COPY (
+                SELECT
+                    TRY_CAST(regexp_replace(doc_id, '^RFC0*', '') AS INTEGER) AS rfc_number,
+                    *
+                FROM read_json(
+                    ?,
+                    format = 'auto',
+                    columns = {{{json_columns}}}
+                )
+                ORDER BY rfc_number NULLS LAST, doc_id
+            ) TO '{quoted_path}' (
+                FORMAT parquet,
+                COMPRESSION zstd,
+                ROW_GROUP_SIZE {PARQUET_ROW_GROUP_SIZE}
+            );
+            """,
+            [json_path],
+        )
+        count = conn.execute(
+            "SELECT count(*) FROM read_parquet(?);", [path]
+        ).fetchone()[0]
+        row_groups = conn.execute(
+            "SELECT count(DISTINCT row_group_id) FROM parquet_metadata(?);", [path]
+        ).fetchone()[0]
+
+    return count, row_groups
+
+
+# エントリ(dict)を1件ずつ書き出してParquetを作成する
+# 一時ファイルは出力先と同じディレクトリに作成し、終了時に削除する
+def write_parquet(
+    entries: Iterable[dict], path: str, columns: Dict[str, str]
+) -> tuple[int, int]:
+    fd, ndjson_path = tempfile.mkstemp(
+        suffix=".ndjson", dir=os.path.dirname(os.path.abspath(path))
+    )
+    try:
+        with os.fdopen(fd, mode="w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry))
+                f.write("\n")
+        return write_json_as_parquet(ndjson_path, path, columns)
+    finally:
+        os.remove(ndjson_path)
@@ -0,0 +1,350 @@
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from typing import Dict, Iterable, Iterator, Optional, TypeVar
+
+try:
+    import resource
+except ImportError:
+    # Windowsでは利用できないため、メモリ使用量は記録しない
+    resource = None
+
+
+# 各スクリプトの処理時間・メモリ使用量の計測
+#
+# * 処理を名前付きのフェーズに分け、フェーズごとに経過時間、CPU時間、ピークメモリ(RSS)、件数を記録する
+# * 終了時(異常終了を含む)にフェーズごとの結果をログに出力し、指定があればJSONとPrometheusのtextfileに書き出す
+#   textfileはnode_exporterのtextfile collectorで読み込む想定
+#
+# フェーズは入れ子にしてよい. 逐次処理で読み込みと書き出しが交互に行われる場合など、
+# 外側のフェーズの時間には内側のフェーズの時間も含まれる
+
+T = TypeVar("T")
+
+# JSONの形式を変更した場合は、この値を更新すること
+REPORT_VERSION = 1
+
+# Prometheusのメトリクス名の接頭辞
+PROMETHEUS_PREFIX = "rfc_search"
+
+
+# ピークRSS(プロセス開始からの最大値)のバイト数
+# ru_maxrssはLinuxではKiB、macOSではバイト単位
+def peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    if sys.platform == "darwin":
+        return usage.ru_maxrss
+    return usage.ru_maxrss * 1024
+
+
+# 終了した子プロセス(プロセスプールのワーカーなど)のCPU時間の合計
+def children_cpu_seconds() -> float:
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Phase:
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.children_cpu_seconds = 0.0
+        # フェーズ終了時点のピークRSSと、フェーズ中にピークRSSが増えた分
+        # timed()で計測するフェーズでは記録しない(None)
+        self.peak_rss_bytes: Optional[int] = None
+        self.peak_rss_growth_bytes: Optional[int] = None
+        self.counts: Dict[str, int] = {}
+
+    def count(self, key: str, value: int = 1):
+        self.counts[key] = self.counts.get(key, 0) + value
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "children_cpu_seconds": round(self.children_cpu_seconds, 6),
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "peak_rss_growth_bytes": self.peak_rss_growth_bytes,
+            "counts": dict(self.counts),
+        }
+
+
+class RunMetrics:
+    def __init__(self, app: str, logger: logging.Logger):
+        self.app = app
+        self.logger = logger
+        self.status = "failed"
+        self.started_at = datetime.now(UTC)
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_children_cpu = children_cpu_seconds()
+        # フェーズは最初に開始した順に出力する
+        self.phases: Dict[str, Phase] = {}
+        # 子プロセスで実行したスクリプトのレポート(build.pyの各ステージなど)
+        self.children: Dict[str, dict] = {}
+        # 並行して実行するステージ(build.py)から呼ばれるため、フェーズの更新は排他する
+        self.lock = threading.Lock()
+
+    def get_phase(self, name: str) -> Phase:
+        with self.lock:
+            if name not in self.phases:
+                self.phases[name] = Phase(name)
+            return self.phases[name]
+
+    # with metrics.phase("parse") as phase:
+    #     ...
+    #     phase.count("entries", count)
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Phase]:
+        phase = self.get_phase(name)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_children_cpu = children_cpu_seconds()
+        start_rss = peak_rss_bytes()
+        try:
+            yield phase
+        finally:
+            end_rss = peak_rss_bytes()
+            with self.lock:
+                phase.calls += 1
+                phase.wall_seconds += time.perf_counter() - start_wall
+                phase.cpu_seconds += time.process_time() - start_cpu
+                phase.children_cpu_seconds += (
+                    children_cpu_seconds() - start_children_cpu
+                )
+                phase.peak_rss_bytes = max(phase.peak_rss_bytes or 0, end_rss)
+                phase.peak_rss_growth_bytes = (phase.peak_rss_growth_bytes or 0) + (
+                    end_rss - start_rss
+                )
+
+    # イテレータから要素を取り出すのにかかった時間だけを、フェーズの時間として記録する
+    # 逐次処理で、読み込み(解析)と書き出しが交互に行われる場合に、読み込み側の時間を分けて計測する
+    # 要素ごとに呼ばれるため、RSSは記録しない
+    def timed(self, name: str, iterable: Iterable[T], counter: str) -> Iterator[T]:
+        phase = self.get_phase(name)
+        iterator = iter(iterable)
+        with self.lock:
+            phase.calls += 1
+        while True:
+            start_wall = time.perf_counter()
+            start_cpu = time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                wall_seconds = time.perf_counter() - start_wall
+                cpu_seconds = time.process_time() - start_cpu
+                with self.lock:
+                    phase.wall_seconds += wall_seconds
+                    phase.cpu_seconds += cpu_seconds
+            with self.lock:
+                phase.count(counter)
+            yield item
+
+    # 正常に終了した場合に呼ぶ. 呼ばずに終了した場合(sys.exitや例外)はstatus=failedとなる
+    def finish(self, status: str = "succeeded"):
+        self.status = status
+
+    def report(self) -> dict:
+        with self.lock:
+            phases = [phase.to_dict() for phase in self.phases.values()]
+        return {
+            "version": REPORT_VERSION,
+            "app": self.app,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.now(UTC).isoformat(),
+            "wall_seconds": round(time.perf_counter() - self.start_wall, 6),
+            "cpu_seconds": round(time.process_time() - self.start_cpu, 6),
+            "children_cpu_seconds": round(
+                children_cpu_seconds() - self.start_children_cpu, 6
+            ),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "phases": phases,
+            "children": dict(self.children),
+        }
+
+    def log_report(self, report: dict):
+        for phase in report["phases"]:
+            counts = " ".join(
+                f"{key}={value}" for key, value in phase["counts"].items()
+            )
+            self.logger.info(
+                f"phase: phase={phase['name']} wall={phase['wall_seconds']:.3f}s cpu={phase['cpu_seconds']:.3f}s children_cpu={phase['children_cpu_seconds']:.3f}s peak_rss={format_optional(phase['peak_rss_bytes'])} peak_rss_growth={format_optional(phase['peak_rss_growth_bytes'])} {counts}".rstrip()
+            )
+        self.logger.info(
+            f"run: status={report['status']} wall={report['wall_seconds']:.3f}s cpu={report['cpu_seconds']:.3f}s children_cpu={report['children_cpu_seconds']:.3f}s peak_rss={report['peak_rss_bytes']}"
+        )
+
+    # 終了時にレポートをログに出力し、指定されたファイルに書き出す
+    def write_at_exit(
+        self, metrics_file: Optional[str], prometheus_file: Optional[str]
+    ):
+        atexit.register(self.write, metrics_file, prometheus_file)
+
+    def write(self, metrics_file: Optional[str], prometheus_file: Optional[str]):
+        report = self.report()
+        self.log_report(report)
+
+        try:
+            if metrics_file:
+                abspath = os.path.abspath(metrics_file)
+                write_atomic(abspath, json.dumps(report, indent=4))
+                self.logger.info(
+                    f"metrics exported to the file: file={metrics_file} filepath={abspath}"
+                )
+
+            if prometheus_file:
+                abspath = os.path.abspath(prometheus_file)
+                write_atomic(abspath, format_prometheus(report))
+                self.logger.info(
+                    f"metrics exported to the prometheus textfile: file={prometheus_file} filepath={abspath}"
+                )
+        except OSError as e:
+            self.logger.error(e)
+            self.logger.error("metrics can not be exported")
+
+
+def format_optional(value) -> str:
+    return "-" if value is None else str(value)
+
+
+def load_report(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# 書き込み途中のファイルが読み込まれないよう、一時ファイルから置き換える
+# (textfile collectorは読み込み中のファイルを考慮しない)
+def write_atomic(path: str, content: str):
+    tmppath = f"{path}.tmp"
+    with open(tmppath, mode="w") as f:
+        f.write(content)
+    os.replace(tmppath, path)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    return ",".join(
+        f'{key}="{escape_label(str(value))}"' for key, value in labels.items()
+    )
+
+
+# レポートをPrometheusのテキスト形式に変換する
+# 子プロセスのレポートも、appのラベルを分けて出力する
+#
+# Example:
+#   rfc_search_phase_wall_seconds{app="create_duckdb_persistent_db",phase="stage-index"} 0.123
+def format_prometheus(report: dict) -> str:
+    reports = [report, *report.get("children", {}).values()]
+
+    # (メトリクス名, 説明, [(ラベル, 値), ...])
+    families: list[tuple[str, str, list[tuple[Dict[str, str], float]]]] = [
+        (
+            "run_success",
+            "Whether the last run finished successfully (1) or not (0).",
+            [({"app": r["app"]}, int(r["status"] != "failed")) for r in reports],
+        ),
+        (
+            "run_timestamp_seconds",
+            "Unix time when the last run finished.",
+            [
+                (
+                    {"app": r["app"]},
+                    datetime.fromisoformat(r["finished_at"]).timestamp(),
+                )
+                for r in reports
+            ],
+        ),
+        (
+            "run_wall_seconds",
+            "Wall time of the last run.",
+            [({"app": r["app"]}, r["wall_seconds"]) for r in reports],
+        ),
+        (
+            "run_cpu_seconds",
+            "CPU time of the last run.",
+            [({"app": r["app"]}, r["cpu_seconds"]) for r in reports],
+        ),
+        (
+            "run_children_cpu_seconds",
+            "CPU time of the child processes of the last run.",
+            [({"app": r["app"]}, r["children_cpu_seconds"]) for r in reports],
+        ),
+        (
+            "run_peak_rss_bytes",
+            "Peak resident set size of the last run.",
+            [({"app": r["app"]}, r["peak_rss_bytes"]) for r in reports],
+        ),
+    ]
+
+    phase_families = [
+        ("wall_seconds", "Wall time per phase."),
+        ("cpu_seconds", "CPU time per phase."),
+        ("children_cpu_seconds", "CPU time of child processes per phase."),
+        ("peak_rss_bytes", "Peak resident set size at the end of the phase."),
+        (
+            "peak_rss_growth_bytes",
+            "Increase of the peak resident set size during the phase.",
+        ),
+    ]
+    for key, help_text in phase_families:
+        families.append(
+            (
+                f"phase_{key}",
+                help_text,
+                [
+                    ({"app": r["app"], "phase": phase["name"]}, phase[key])
+                    for r in reports
+                    for phase in r["phases"]
+                    if phase[key] is not None
+                ],
+            )
+        )
+
+    families.append(
+        (
+            "phase_items",
+            "Number of items processed per phase.",
+            [
+                (
+                    {"app": r["app"], "phase": phase["name"], "counter": counter},
+                    value,
+                )
+                for r in reports
+                for phase in r["phases"]
+                for counter, value in phase["counts"].items()
+            ],
+        )
+    )
+
+    lines = []
+    for name, help_text, samples in families:
+        if not samples:
+            continue
+        metric = f"{PROMETHEUS_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for labels, value in samples:
+            lines.append(f"{metric}{{{format_labels(labels)}}} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -2,11 +2,25 @@ import os
 import sys
 import logging
 import json
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, Optional, TextIO
 
 import xml.etree.ElementTree as ET
 
 import click
 import requests
+import urllib3
+
+import http_fetch
+import parquet_export
+from parquet_export import (
+    RFC_INDEX_COLUMNS,
+    SUBSERIES_COLUMNS,
+    is_parquet_file,
+    write_json_as_parquet,
+    write_parquet,
+)
+from run_metrics import RunMetrics
 
 
 # Making Python loggers output all messages to stdout in addition to log file
@@ -24,6 +38,420 @@ appLogger.setLevel(logging.INFO)
 appLogger.addHandler(handler)
 
 
+NAMESPACES = {
+    "": "https://www.rfc-editor.org/rfc-index",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+}
+
+
+# 名前空間を付けたタグ名
+def qualified(tag: str) -> str:
+    return f"{{{NAMESPACES['']}}}{tag}"
+
+
+RFC_ENTRY_TAG = qualified("rfc-entry")
+
+
+# rfc-entryの子要素ごとの処理
+# 各処理は、子要素1つ分の値をentry(parse_rfc_entryの結果)に設定する
+
+
+# テキストをそのまま設定する
+def handle_text(key: str, entry: dict, element: ET.Element):
+    entry[key] = element.text
+
+
+# 子要素(format/file-format、obsoletes/doc-idなど)のテキストを配列として設定する
+# 子要素を持たない場合はNone
+def handle_texts(key: str, child_tag: str, entry: dict, element: ET.Element):
+    if len(element) == 0:
+        entry[key] = None
+        return
+    entry[key] = [child.text for child in element if child.tag == child_tag]
+
+
+AUTHOR_FIELDS = {
+    qualified("name"): "name",
+    qualified("title"): "title",
+}
+
+
+def handle_author(entry: dict, element: ET.Element):
+    author = {"name": None, "title": None}
+    for child in element:
+        key = AUTHOR_FIELDS.get(child.tag)
+        if key:
+            author[key] = child.text
+    entry["author"].append(author)
+
+
+DATE_FIELDS = {
+    qualified("day"): "day",
+    qualified("month"): "month",
+    qualified("year"): "year",
+}
+
+
+def handle_date(entry: dict, element: ET.Element):
+    date = {"day": None, "month": None, "year": None}
+    for child in element:
+        key = DATE_FIELDS.get(child.tag)
+        if key:
+            date[key] = child.text
+    entry["date"] = date
+
+
+ABSTRACT_P_TAG = qualified("p")
+
+
+# abstractのテキスト. テキストがなければ、最初のpのテキスト
+def handle_abstract(entry: dict, element: ET.Element):
+    abstract = element.text
+    if not abstract:
+        abstract = next(
+            (child.text for child in element if child.tag == ABSTRACT_P_TAG), None
+        )
+    entry["abstract"] = abstract
+
+
+DOC_ID_TAG = qualified("doc-id")
+
+# 子要素のタグ(名前空間付き)から、処理へのテーブル
+# テーブルにないタグは無視する
+RFC_ENTRY_HANDLERS: Dict[str, Callable[[dict, ET.Element], None]] = {
+    DOC_ID_TAG: partial(handle_text, "doc_id"),
+    qualified("title"): partial(handle_text, "title"),
+    qualified("author"): handle_author,
+    qualified("date"): handle_date,
+    qualified("format"): partial(handle_texts, "format", qualified("file-format")),
+    qualified("page-count"): partial(handle_text, "page_count"),
+    qualified("keywords"): partial(handle_texts, "keywords", qualified("kw")),
+    qualified("is-also"): partial(handle_texts, "is_also", DOC_ID_TAG),
+    qualified("obsoletes"): partial(handle_texts, "obsoletes", DOC_ID_TAG),
+    qualified("obsoleted-by"): partial(handle_texts, "obsoleted_by", DOC_ID_TAG),
+    qualified("updates"): partial(handle_texts, "updates", DOC_ID_TAG),
+    qualified("updated-by"): partial(handle_texts, "updated_by", DOC_ID_TAG),
+    qualified("see-also"): partial(handle_texts, "see_also", DOC_ID_TAG),
+    qualified("abstract"): handle_abstract,
+    qualified("draft"): partial(handle_text, "draft"),
+    qualified("current-status"): partial(handle_text, "current_status"),
+    qualified("publication-status"): partial(handle_text, "publication_status"),
+    qualified("stream"): partial(handle_text, "stream"),
+    qualified("errata-url"): partial(handle_text, "errata_url"),
+    qualified("area"): partial(handle_text, "area"),
+    qualified("wg_acronym"): partial(handle_text, "wg_acronym"),
+    qualified("doi"): partial(handle_text, "doi"),
+}
+
+
+# rfc-entry要素1つ分をdictに変換する
+# 子要素を1回だけ走査し、タグごとの処理をRFC_ENTRY_HANDLERSから引いて呼び出す
+# 存在しない要素の値はNone(authorは空の配列)になる
+def parse_rfc_entry(entry: ET.Element) -> dict:
+    # <rfc-entry>
+    #     <doc-id>RFC0001</doc-id>
+    #     <title>Host Software</title>
+    #     <author>
+    #         <name>S. Crocker</name>
+    #     </author>
+    #     <date>
+    #         <month>April</month>
+    #         <year>1969</year>
+    #     </date>
+    #     <format>
+    #         <file-format>ASCII</file-format>
+    #         <file-format>HTML</file-format>
+    #     </format>
+    #     <page-count>11</page-count>
+    #     <current-status>UNKNOWN</current-status>
+    #     <publication-status>UNKNOWN</publication-status>
+    #     <stream>Legacy</stream>
+    #     <doi>10.17487/RFC0001</doi>
+    # </rfc-entry>
+
+    # <rfc-entry>
+    #     <doc-id>RFC0010</doc-id>
+    #     <title>Documentation conventions</title>
+    #     <author>
+    #         <name>S.D. Crocker</name>
+    #     </author>
+    #     <date>
+    #         <month>July</month>
+    #         <year>1969</year>
+    #     </date>
+    #     <format>
+    #         <file-format>ASCII</file-format>
+    #         <file-format>HTML</file-format>
+    #     </format>
+    #     <page-count>3</page-count>
+    #     <obsoletes>
+    #         <doc-id>RFC0003</doc-id>
+    #     </obsoletes>
+    #     <obsoleted-by>
+    #         <doc-id>RFC0016</doc-id>
+    #     </obsoleted-by>
+    #     <updated-by>
+    #         <doc-id>RFC0024</doc-id>
+    #         <doc-id>RFC0027</doc-id>
+    #         <doc-id>RFC0030</doc-id>
+    #     </updated-by>
+    #     <current-status>UNKNOWN</current-status>
+    #     <publication-status>UNKNOWN</publication-status>
+    #     <stream>Legacy</stream>
+    #     <doi>10.17487/RFC0010</doi>
+    # </rfc-entry>
+
+    # <rfc-entry>
+    #     <doc-id>RFC9703</doc-id>
+    #     <title>Label Switched Path (LSP) Ping/Traceroute for Segment Routing (SR) Egress Peer Engineering (EPE) Segment Identifiers (SIDs) with MPLS Data Plane</title>
+    #     <author>
+    #         <name>S. Hegde</name>
+    #     </author>
+    #     <author>
+    #         <name>M. Srivastava</name>
+    #     </author>
+    #     <author>
+    #         <name>K. Arora</name>
+    #     </author>
+    #     <author>
+    #         <name>S. Ninan</name>
+    #     </author>
+    #     <author>
+    #         <name>X. Xu</name>
+    #     </author>
+    #     <date>
+    #         <month>December</month>
+    #         <year>2024</year>
+    #     </date>
+    #     <format>
+    #         <file-format>HTML</file-format>
+    #         <file-format>TEXT</file-format>
+    #         <file-format>PDF</file-format>
+    #         <file-format>XML</file-format>
+    #     </format>
+    #     <page-count>15</page-count>
+    #     <keywords>
+    #         <kw>OAM</kw>
+    #         <kw>EPE</kw>
+    #         <kw>BGP-LS</kw>
+    #         <kw>BGP</kw>
+    #         <kw>SPRING</kw>
+    #         <kw>SDN</kw>
+    #         <kw>SID</kw>
+    #     </keywords>
+    #     <abstract><p>Egress Peer Engineering (EPE) is an application of Segment Routing (SR) that solves the problem of egress peer selection.  The SR-based BGP-EPE solution allows a centralized controller, e.g., a Software-Defined Network (SDN) controller, to program any egress peer.  The EPE solution requires the node or the SDN controller to program 1) the PeerNode Segment Identifier (SID) describing a session between two nodes, 2) the PeerAdj SID describing the link or links that are used by the sessions between peer nodes, and 3) the PeerSet SID describing any connected interface to any peer in the related group.  This document provides new sub-TLVs for EPE-SIDs that are used in the Target FEC Stack TLV (Type 1) in MPLS Ping and Traceroute procedures.</p></abstract>
+    #     <draft>draft-ietf-mpls-sr-epe-oam-19</draft>
+    #     <current-status>PROPOSED STANDARD</current-status>
+    #     <publication-status>PROPOSED STANDARD</publication-status>
+    #     <stream>IETF</stream>
+    #     <area>rtg</area>
+    #     <wg_acronym>mpls</wg_acronym>
+    #     <doi>10.17487/RFC9703</doi>
+    # </rfc-entry>
+
+    # キーの順序が出力(JSON)の順序になる
+    result = {
+        "doc_id": None,
+        "title": None,
+        "author": [],
+        "date": None,
+        "format": None,
+        "page_count": None,
+        "keywords": None,
+        "is_also": None,
+        "obsoletes": None,
+        "obsoleted_by": None,
+        "updates": None,
+        "updated_by": None,
+        "see_also": None,
+        "abstract": None,
+        "draft": None,
+        "current_status": None,
+        "publication_status": None,
+        "stream": None,
+        "errata_url": None,
+        "area": None,
+        "wg_acronym": None,
+        "doi": None,
+    }
+
+    for element in entry:
+        handler = RFC_ENTRY_HANDLERS.get(element.tag)
+        if handler:
+            handler(result, element)
+
+    return result
+
+
+# rfc-entry以外のエントリのタグ(名前空間付き)から、出力するkindへのテーブル
+# bcp/std/fyiはサブシリーズで、is-alsoに構成するRFCを持つ
+SUBSERIES_ENTRY_KINDS: Dict[str, str] = {
+    qualified("bcp-entry"): "bcp",
+    qualified("std-entry"): "std",
+    qualified("fyi-entry"): "fyi",
+    qualified("rfc-not-issued-entry"): "rfc-not-issued",
+}
+
+SUBSERIES_ENTRY_HANDLERS: Dict[str, Callable[[dict, ET.Element], None]] = {
+    DOC_ID_TAG: partial(handle_text, "doc_id"),
+    qualified("title"): partial(handle_text, "title"),
+    qualified("is-also"): partial(handle_texts, "is_also", DOC_ID_TAG),
+}
+
+
+# bcp-entryなどrfc-entry以外のエントリ1つ分をdictに変換する
+def parse_subseries_entry(kind: str, entry: ET.Element) -> dict:
+    # <bcp-entry>
+    #     <doc-id>BCP0001</doc-id>
+    #     <is-also>
+    #         <doc-id>RFC2026</doc-id>
+    #     </is-also>
+    # </bcp-entry>
+
+    # <std-entry>
+    #     <doc-id>STD0001</doc-id>
+    #     <title>[STD number 1 is retired. It was "Internet Official Protocol Standards".]</title>
+    # </std-entry>
+
+    # <rfc-not-issued-entry>
+    #     <doc-id>RFC0011</doc-id>
+    # </rfc-not-issued-entry>
+
+    result = {
+        "kind": kind,
+        "doc_id": None,
+        "title": None,
+        "is_also": None,
+    }
+
+    for element in entry:
+        handler = SUBSERIES_ENTRY_HANDLERS.get(element.tag)
+        if handler:
+            handler(result, element)
+
+    return result
+
+
+# XMLを逐次解析し、rfc-entryを完成した順にdictとして返す
+# ルート直下の要素は処理後にclearするので、保持するのは常にエントリ1つ分のみ
+# subseries_entriesを指定した場合は、同じ走査でbcp-entryなどもdictに変換して追加する
+def iter_rfc_entries(
+    source, subseries_entries: Optional[list[dict]] = None
+) -> Iterator[dict]:
+    depth = 0
+    root: ET.Element = None
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth != 1:
+            continue
+
+        if element.tag == RFC_ENTRY_TAG:
+            yield parse_rfc_entry(element)
+        elif subseries_entries is not None:
+            kind = SUBSERIES_ENTRY_KINDS.get(element.tag)
+            if kind:
+                subseries_entries.append(parse_subseries_entry(kind, element))
+
+        # 処理済みのエントリ(bcp-entryなども含む)を破棄する
+        root.clear()
+
+
+# エントリを1件ずつJSON配列として書き出す
+# 出力はjson.dumps(list)と同一になる
+def write_json_array(entries: Iterable[dict], f: TextIO, pretty_print: bool) -> int:
+    count = 0
+    f.write("[")
+    for entry in entries:
+        if pretty_print:
+            f.write("\n    " if count == 0 else ",\n    ")
+            f.write(json.dumps(entry, indent=4).replace("\n", "\n    "))
+        else:
+            if count > 0:
+                f.write(", ")
+            f.write(json.dumps(entry))
+        count += 1
+    if pretty_print and count > 0:
+        f.write("\n")
+    f.write("]")
+    return count
+
+
+# エントリを1件ずつNDJSON(1行1エントリ)として書き出す
+def write_ndjson(entries: Iterable[dict], f: TextIO) -> int:
+    count = 0
+    for entry in entries:
+        f.write(json.dumps(entry))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def write_entries(
+    entries: Iterable[dict], f: TextIO, output_format: str, pretty_print: bool
+) -> int:
+    if output_format == "ndjson":
+        return write_ndjson(entries, f)
+    return write_json_array(entries, f, pretty_print)
+
+
+# Parquetで出力する
+# sourceが出力済みのJSONのファイルパスの場合はそれを変換し、そうでなければエントリを1件ずつ書き出す
+# pathに書き出す(--parquet-fileの一時ファイル)
+def export_parquet(
+    parquet_file: str, path: str, source: str | Iterable[dict], metrics: RunMetrics
+):
+    abspath = os.path.abspath(parquet_file)
+    appLogger.info(
+        f"data exporting to the parquet file: file={parquet_file} filepath={abspath}"
+    )
+
+    with metrics.phase("write-parquet") as phase:
+        if isinstance(source, str):
+            count, row_groups = write_json_as_parquet(source, path, RFC_INDEX_COLUMNS)
+        else:
+            count, row_groups = write_parquet(source, path, RFC_INDEX_COLUMNS)
+        phase.count("entries", count)
+
+    appLogger.info(
+        f"data exported to the parquet file: file={parquet_file} filepath={abspath} entries={count} row_groups={row_groups} bytes={os.path.getsize(path)}"
+    )
+
+
+# bcp-entryなどrfc-entry以外のエントリを出力する
+# 拡張子が.parquetの場合はParquet、それ以外は--formatの形式で出力する
+# pathに書き出す(--subseries-fileの一時ファイル)
+def export_subseries(
+    subseries_file: str,
+    path: str,
+    entries: list[dict],
+    output_format: str,
+    pretty_print: bool,
+    metrics: RunMetrics,
+):
+    abspath = os.path.abspath(subseries_file)
+    appLogger.info(
+        f"subseries exporting to the file: file={subseries_file} filepath={abspath}"
+    )
+
+    with metrics.phase("write-subseries") as phase:
+        if is_parquet_file(abspath):
+            count, _ = write_parquet(entries, path, SUBSERIES_COLUMNS)
+        else:
+            with open(path, mode="w") as f:
+                count = write_entries(entries, f, output_format, pretty_print)
+        phase.count("entries", count)
+
+    appLogger.info(
+        f"subseries exported to the file: file={subseries_file} filepath={abspath} entries={count}"
+    )
+
+
 @click.command()
 @click.option(
     "--url",
@@ -33,6 +461,20 @@ appLogger.addHandler(handler)
     show_default=True,
     help="XMLを取得するURLで、基本変更しない",
 )
+@click.option(
+    "--xmlfile",
+    type=str,
+    default=None,
+    required=False,
+    help="XMLをURLから取得せずローカルのファイルを参照する場合に利用する",
+)
+@click.option(
+    "--cache-dir",
+    type=str,
+    default=None,
+    required=False,
+    help="URLから取得したファイルのキャッシュディレクトリ. 上流に変更がなく出力が最新の場合は処理を省略する",
+)
 @click.option(
     "-f",
     "--file",
@@ -41,370 +483,225 @@ appLogger.addHandler(handler)
     default=None,
     help="取得結果がファイルの場合の出力先",
 )
+@click.option(
+    "--parquet-file",
+    type=str,
+    required=False,
+    default=None,
+    help="Parquet(zstd圧縮、rfc_number順)での出力先. --fileと同時に指定した場合は両方に出力する",
+)
+@click.option(
+    "--subseries-file",
+    type=str,
+    required=False,
+    default=None,
+    help="BCP/STD/FYIとRFC Not Issuedのエントリの出力先. RFC Indexと同じ走査で取り出す. 拡張子が.parquetの場合はParquetで出力する",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["json", "ndjson"]),
+    default="json",
+    show_default=True,
+    help="出力形式. ndjsonの場合は1行1エントリで出力する",
+)
 @click.option(
     "-pp",
     "--pretty-print",
     is_flag=True,
     show_default=True,
     default=False,
-    help="出力がstdoutかfileの場合、Pretty PrintなJSONで出力するかどうか",
+    help="出力がstdoutかfileの場合、Pretty PrintなJSONで出力するかどうか(--format jsonのみ)",
 )
-def main(url: str, file: str, pretty_print: bool):
+@click.option(
+    "--metrics-file",
+    type=str,
+    default=None,
+    required=False,
+    help="フェーズごとの処理時間・CPU時間・ピークメモリ・件数を、終了時にJSONで出力するファイル",
+)
+@click.option(
+    "--prometheus-file",
+    type=str,
+    default=None,
+    required=False,
+    help="--metrics-fileと同じ内容を、Prometheus(node_exporterのtextfile collector)の形式で出力するファイル",
+)
+def main(
+    url: str,
+    xmlfile: str,
+    cache_dir: str,
+    file: str,
+    parquet_file: str,
+    subseries_file: str,
+    output_format: str,
+    pretty_print: bool,
+    metrics_file: str,
+    prometheus_file: str,
+):
     appLogger.info(f"app start")
     appLogger.info(f"command line argument: --url = {url}")
+    appLogger.info(f"command line argument: --xmlfile = {xmlfile}")
+    appLogger.info(f"command line argument: --cache-dir = {cache_dir}")
     appLogger.info(f"command line argument: --file = {file}")
+    appLogger.info(f"command line argument: --parquet-file = {parquet_file}")
+    appLogger.info(f"command line argument: --subseries-file = {subseries_file}")
+    appLogger.info(f"command line argument: --format = {output_format}")
     appLogger.info(f"command line argument: --pretty-print = {pretty_print}")
+    appLogger.info(f"command line argument: --metrics-file = {metrics_file}")
+    appLogger.info(f"command line argument: --prometheus-file = {prometheus_file}")
 
-    if file:
-        abspath = os.path.abspath(file)
+    metrics = RunMetrics("trasform_rfc_index_to_json", appLogger)
+    metrics.write_at_exit(metrics_file, prometheus_file)
+
+    outputs = [output for output in [file, parquet_file, subseries_file] if output]
+    for output in outputs:
+        abspath = os.path.abspath(output)
         dirpath = os.path.dirname(abspath)
         if not os.path.exists(dirpath):
-            appLogger.error(f"directory not found: path={file} directory={dirpath}")
+            appLogger.error(f"directory not found: path={output} directory={dirpath}")
             sys.exit(-1)
 
-    # RFC Indexの取得
-    appLogger.info(f"rfc index importing from internet: url={url}")
-
-    resp = requests.get(url)
-    resp.raise_for_status()
-
-    # RFC IndexをElement Treeで読み込む
-    root = ET.fromstring(resp.text)
-    appLogger.info(f"rfc index imported from internet: url={url}")
-
-    namespaces = {
-        "": "https://www.rfc-editor.org/rfc-index",
-        "xsi": "http://www.w3.org/2001/XMLSchema-instance",
-    }
+    # 出力の内容に影響する入力・オプションとスクリプト
+    stamp = http_fetch.output_stamp(
+        {
+            "url": url,
+            "xmlfile": os.path.abspath(xmlfile) if xmlfile else None,
+            "format": output_format,
+            "pretty_print": pretty_print,
+        },
+        [__file__, parquet_export.__file__],
+    )
 
-    rfc_entries = []
-    for entry in root.findall("rfc-entry", namespaces):
-        # <rfc-entry>
-        #     <doc-id>RFC0001</doc-id>
-        #     <title>Host Software</title>
-        #     <author>
-        #         <name>S. Crocker</name>
-        #     </author>
-        #     <date>
-        #         <month>April</month>
-        #         <year>1969</year>
-        #     </date>
-        #     <format>
-        #         <file-format>ASCII</file-format>
-        #         <file-format>HTML</file-format>
-        #     </format>
-        #     <page-count>11</page-count>
-        #     <current-status>UNKNOWN</current-status>
-        #     <publication-status>UNKNOWN</publication-status>
-        #     <stream>Legacy</stream>
-        #     <doi>10.17487/RFC0001</doi>
-        # </rfc-entry>
-
-        # <rfc-entry>
-        #     <doc-id>RFC0010</doc-id>
-        #     <title>Documentation conventions</title>
-        #     <author>
-        #         <name>S.D. Crocker</name>
-        #     </author>
-        #     <date>
-        #         <month>July</month>
-        #         <year>1969</year>
-        #     </date>
-        #     <format>
-        #         <file-format>ASCII</file-format>
-        #         <file-format>HTML</file-format>
-        #     </format>
-        #     <page-count>3</page-count>
-        #     <obsoletes>
-        #         <doc-id>RFC0003</doc-id>
-        #     </obsoletes>
-        #     <obsoleted-by>
-        #         <doc-id>RFC0016</doc-id>
-        #     </obsoleted-by>
-        #     <updated-by>
-        #         <doc-id>RFC0024</doc-id>
-        #         <doc-id>RFC0027</doc-id>
-        #         <doc-id>RFC0030</doc-id>
-        #     </updated-by>
-        #     <current-status>UNKNOWN</current-status>
-        #     <publication-status>UNKNOWN</publication-status>
-        #     <stream>Legacy</stream>
-        #     <doi>10.17487/RFC0010</doi>
-        # </rfc-entry>
-
-        # <rfc-entry>
-        #     <doc-id>RFC9703</doc-id>
-        #     <title>Label Switched Path (LSP) Ping/Traceroute for Segment Routing (SR) Egress Peer Engineering (EPE) Segment Identifiers (SIDs) with MPLS Data Plane</title>
-        #     <author>
-        #         <name>S. Hegde</name>
-        #     </author>
-        #     <author>
-        #         <name>M. Srivastava</name>
-        #     </author>
-        #     <author>
-        #         <name>K. Arora</name>
-        #     </author>
-        #     <author>
-        #         <name>S. Ninan</name>
-        #     </author>
-        #     <author>
-        #         <name>X. Xu</name>
-        #     </author>
-        #     <date>
-        #         <month>December</month>
-        #         <year>2024</year>
-        #     </date>
-        #     <format>
-        #         <file-format>HTML</file-format>
-        #         <file-format>TEXT</file-format>
-        #         <file-format>PDF</file-format>
-        #         <file-format>XML</file-format>
-        #     </format>
-        #     <page-count>15</page-count>
-        #     <keywords>
-        #         <kw>OAM</kw>
-        #         <kw>EPE</kw>
-        #         <kw>BGP-LS</kw>
-        #         <kw>BGP</kw>
-        #         <kw>SPRING</kw>
-        #         <kw>SDN</kw>
-        #         <kw>SID</kw>
-        #     </keywords>
-        #     <abstract><p>Egress Peer Engineering (EPE) is an application of Segment Routing (SR) that solves the problem of egress peer selection.  The SR-based BGP-EPE solution allows a centralized controller, e.g., a Software-Defined Network (SDN) controller, to program any egress peer.  The EPE solution requires the node or the SDN controller to program 1) the PeerNode Segment Identifier (SID) describing a session between two nodes, 2) the PeerAdj SID describing the link or links that are used by the sessions between peer nodes, and 3) the PeerSet SID describing any connected interface to any peer in the related group.  This document provides new sub-TLVs for EPE-SIDs that are used in the Target FEC Stack TLV (Type 1) in MPLS Ping and Traceroute procedures.</p></abstract>
-        #     <draft>draft-ietf-mpls-sr-epe-oam-19</draft>
-        #     <current-status>PROPOSED STANDARD</current-status>
-        #     <publication-status>PROPOSED STANDARD</publication-status>
-        #     <stream>IETF</stream>
-        #     <area>rtg</area>
-        #     <wg_acronym>mpls</wg_acronym>
-        #     <doi>10.17487/RFC9703</doi>
-        # </rfc-entry>
-
-        # doc-id
-        doc_id_entry = entry.find("doc-id", namespaces)
-        doc_id = getattr(doc_id_entry, "text", None)
-
-        # title
-        title_entry = entry.find("title", namespaces)
-        title = getattr(title_entry, "text", None)
-
-        # author
-        author = []
-        for author_entry in entry.findall("author", namespaces):
-            item = {}
-
-            # author/name
-            author_name_entry = author_entry.find("name", namespaces)
-            author_name = getattr(author_name_entry, "text", None)
-            item["name"] = author_name
-
-            # author/title
-            author_title_entry = author_entry.find("title", namespaces)
-            author_title = getattr(author_title_entry, "text", None)
-            item["title"] = author_title
-
-            author.append(item)
-
-        # date
-        date_entry = entry.find("date", namespaces)
-        date = {}
-
-        # date/day
-        date_day_entry = date_entry.find("day", namespaces)
-        date_day = getattr(date_day_entry, "text", None)
-        date["day"] = date_day
-
-        # date/month
-        date_month_entry = date_entry.find("month", namespaces)
-        date_month = getattr(date_month_entry, "text", None)
-        date["month"] = date_month
-
-        # date/year
-        date_year_entry = date_entry.find("year", namespaces)
-        date_year = getattr(date_year_entry, "text", None)
-        date["year"] = date_year
-
-        # format
-        format_entry = entry.find("format", namespaces)
-        format = None
-
-        # format/file-format
-        if format_entry:
-            format = []
-            for file_format_entry in format_entry.findall("file-format", namespaces):
-                file_format = getattr(file_format_entry, "text", None)
-                format.append(file_format)
-
-        # page-count
-        page_count_entry = entry.find("page-count", namespaces)
-        page_count = getattr(page_count_entry, "text", None)
-
-        # keywords
-        keywords_entry = entry.find("keywords", namespaces)
-        keywords = None
-
-        # keywords/kw
-        if keywords_entry:
-            keywords = []
-            for keywords_kw_entry in keywords_entry.findall("kw", namespaces):
-                keywords_kw = getattr(keywords_kw_entry, "text", None)
-                keywords.append(keywords_kw)
-
-        # is-also
-        is_also_entry = entry.find("is-also", namespaces)
-        is_also = None
-
-        # is-also/doc-id
-        if is_also_entry:
-            is_also = []
-            for is_also_doc_id_entry in is_also_entry.findall("doc-id", namespaces):
-                is_also_doc_id = getattr(is_also_doc_id_entry, "text", None)
-                is_also.append(is_also_doc_id)
-
-        # obsoletes
-        obsoletes_entry = entry.find("obsoletes", namespaces)
-        obsoletes = None
-
-        # obsoletes/doc-id
-        if obsoletes_entry:
-            obsoletes = []
-            for obsoletes_doc_id_entry in obsoletes_entry.findall("doc-id", namespaces):
-                obsoletes_doc_id = getattr(obsoletes_doc_id_entry, "text", None)
-                obsoletes.append(obsoletes_doc_id)
-
-        # obsoleted-by
-        obsoleted_by_entry = entry.find("obsoleted-by", namespaces)
-        obsoleted_by = None
-
-        # obsoleted-by/doc-id
-        if obsoleted_by_entry:
-            obsoleted_by = []
-            for obsoleted_by_doc_id_entry in entry.findall("doc-id", namespaces):
-                obsoleted_by_doc_id = getattr(obsoleted_by_doc_id_entry, "text", None)
-                obsoleted_by.append(obsoleted_by_doc_id)
-
-        # updates
-        updates_entry = entry.find("updates", namespaces)
-        updates = None
-
-        # updates/doc-id
-        if updates_entry:
-            updates = []
-            for updates_doc_id_entry in updates_entry.findall("doc-id", namespaces):
-                updates_doc_id = getattr(updates_doc_id_entry, "text", None)
-                updates.append(updates_doc_id)
-
-        # updated-by
-        updated_by_entry = entry.find("updated-by", namespaces)
-        updated_by = None
-
-        # updated-by/doc-id
-        if updated_by_entry:
-            updated_by = []
-            for updated_by_doc_id_entry in updated_by_entry.findall(
-                "doc-id", namespaces
-            ):
-                updated_by_doc_id = getattr(updated_by_doc_id_entry, "text", None)
-                updated_by.append(updated_by_doc_id)
-
-        # abstract
-        abstract_entry = entry.find("abstract", namespaces)
-        abstract = getattr(abstract_entry, "text", None)
-        if abstract_entry and not abstract:
-            abstract_p_entry = abstract_entry.find("p", namespaces)
-            abstract = getattr(abstract_p_entry, "text", None)
-
-        # see_also
-        see_also_entry = entry.find("see-also", namespaces)
-        see_also = None
-
-        # see_also_doc_id
-        if see_also_entry:
-            see_also = []
-            for see_also_doc_id_entry in see_also_entry.find("doc-id", namespaces):
-                see_also_doc_id = getattr(see_also_doc_id_entry, "text", None)
-                see_also.append(see_also_doc_id)
-
-        # draft
-        draft_entry = entry.find("draft", namespaces)
-        draft = getattr(draft_entry, "text", None)
-
-        # current-status
-        current_status_entry = entry.find("current-status", namespaces)
-        current_status = getattr(current_status_entry, "text", None)
-
-        # publication-status
-        publication_status_entry = entry.find("publication-status", namespaces)
-        publication_status = getattr(publication_status_entry, "text", None)
-
-        # stream
-        stream_entry = entry.find("stream", namespaces)
-        stream = getattr(stream_entry, "text", None)
-
-        # errata_url
-        errata_url_entry = entry.find("errata-url", namespaces)
-        errata_url = getattr(errata_url_entry, "text", None)
-
-        # area
-        area_entry = entry.find("area", namespaces)
-        area = getattr(area_entry, "text", None)
-
-        # wg_acronym
-        wg_acronym_entry = entry.find("wg_acronym", namespaces)
-        wg_acronym = getattr(wg_acronym_entry, "text", None)
-
-        # doi
-        doi_entry = entry.find("doi", namespaces)
-        doi = getattr(doi_entry, "text", None)
-
-        rfc_entry = {
-            "doc_id": doc_id,
-            "title": title,
-            "author": author,
-            "date": date,
-            "format": format,
-            "page_count": page_count,
-            "keywords": keywords,
-            "is_also": is_also,
-            "obsoletes": obsoletes,
-            "obsoleted_by": obsoleted_by,
-            "updates": updates,
-            "updated_by": updated_by,
-            "see_also": see_also,
-            "abstract": abstract,
-            "draft": draft,
-            "current_status": current_status,
-            "publication_status": publication_status,
-            "stream": stream,
-            "errata_url": errata_url,
-            "area": area,
-            "wg_acronym": wg_acronym,
-            "doi": doi,
-        }
-
-        rfc_entries.append(rfc_entry)
-
-    if file:
-        # File
-        abspath = os.path.abspath(file)
-        with open(abspath, mode="w") as f:
+    # RFC Indexの取得
+    # 全体を読み込まず、ファイルまたはHTTPレスポンスのボディから逐次読み込む
+    source = None
+    try:
+        if xmlfile:
+            abspath = os.path.abspath(xmlfile)
             appLogger.info(
-                f"data exporting to the file: file={file} filepath={abspath}"
+                f"rfc index importing from the xml file: file={xmlfile} filepath={abspath}"
             )
-
-            if pretty_print:
-                f.write(json.dumps(rfc_entries, indent=4))
-            else:
-                f.write(json.dumps(rfc_entries))
-
-            appLogger.info(f"data exported to the file: file={file} filepath={abspath}")
-    else:
-        # Stdout
-        if pretty_print:
-            print(json.dumps(rfc_entries, indent=4))
+            source = open(abspath, mode="rb")
+        elif cache_dir:
+            appLogger.info(f"rfc index importing from internet: url={url}")
+
+            # キャッシュディレクトリに取得してから、ファイルを逐次解析する
+            with metrics.phase("download") as phase:
+                xmlpath, modified = http_fetch.fetch(url, os.path.abspath(cache_dir))
+                phase.count("modified", int(modified))
+
+            # 上流のXMLに変更がなく、出力がすべて最新であれば、以降の処理は不要
+            if outputs and all(
+                http_fetch.is_up_to_date(
+                    os.path.abspath(output), xmlpath, modified, stamp
+                )
+                for output in outputs
+            ):
+                appLogger.info(
+                    f"rfc index not modified and output is up to date, skipped: url={url} file={file} parquet_file={parquet_file} subseries_file={subseries_file}"
+                )
+                metrics.finish("skipped")
+                appLogger.info(f"app finished")
+                return
+
+            source = open(xmlpath, mode="rb")
         else:
-            print(rfc_entries)
+            appLogger.info(f"rfc index importing from internet: url={url}")
+
+            resp = http_fetch.get_session().get(url, stream=True)
+            resp.raise_for_status()
+
+            # Content-Encoding(gzipなど)を展開した状態で読み込む
+            resp.raw.decode_content = True
+            source = resp.raw
+    except Exception as e:
+        appLogger.error(e)
+        appLogger.error("rfc index can not be loaded")
+        sys.exit(-1)
+
+    # RFC IndexをElement Treeで逐次解析する
+    # 解析は書き出しと交互に行われるため、エントリを取り出すのにかかった時間をparseとして分けて計測する
+    # (HTTPから直接読み込む場合は、ダウンロードの時間もparseに含まれる)
+    # bcp-entryなどは件数が少ないため、同じ走査でリストに集めておき、RFC Indexの出力後に書き出す
+    subseries_entries = [] if subseries_file else None
+    rfc_entries = metrics.timed(
+        "parse", iter_rfc_entries(source, subseries_entries), "entries"
+    )
+
+    # 出力を書き出し終えるまでは、前回のスタンプを残さない
+    for output in outputs:
+        http_fetch.discard_output_stamp(os.path.abspath(output))
+
+    # 出力は一時ファイル(<path>.tmp)に書き出し、全て書き出し終えてから置き換える
+    # XMLが不正な場合や通信が途中で切れた場合は、前回の出力がそのまま残る
+    tmppaths = {output: f"{os.path.abspath(output)}.tmp" for output in outputs}
+
+    try:
+        if file:
+            # File
+            abspath = os.path.abspath(file)
+            with open(tmppaths[file], mode="w") as f:
+                appLogger.info(
+                    f"data exporting to the file: file={file} filepath={abspath}"
+                )
+
+                with metrics.phase(f"write-{output_format}") as phase:
+                    count = write_entries(rfc_entries, f, output_format, pretty_print)
+                    phase.count("entries", count)
+
+                appLogger.info(
+                    f"data exported to the file: file={file} filepath={abspath} entries={count}"
+                )
+
+            # Parquetは出力したJSONから変換する
+            if parquet_file:
+                export_parquet(
+                    parquet_file, tmppaths[parquet_file], tmppaths[file], metrics
+                )
+        elif parquet_file:
+            # Parquetのみ
+            export_parquet(parquet_file, tmppaths[parquet_file], rfc_entries, metrics)
+        else:
+            # Stdout
+            with metrics.phase(f"write-{output_format}") as phase:
+                count = write_entries(
+                    rfc_entries, sys.stdout, output_format, pretty_print
+                )
+                phase.count("entries", count)
+            if output_format == "json":
+                sys.stdout.write("\n")
+
+        if subseries_file:
+            export_subseries(
+                subseries_file,
+                tmppaths[subseries_file],
+                subseries_entries,
+                output_format,
+                pretty_print,
+                metrics,
+            )
 
+        for output, tmppath in tmppaths.items():
+            os.replace(tmppath, os.path.abspath(output))
+    except ET.ParseError as e:
+        appLogger.error(e)
+        appLogger.error("rfc index is not properly formatted")
+        sys.exit(-1)
+    except (requests.RequestException, urllib3.exceptions.HTTPError, OSError) as e:
+        appLogger.error(e)
+        appLogger.error("rfc index can not be loaded")
+        sys.exit(-1)
+    finally:
+        source.close()
+        for tmppath in tmppaths.values():
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+
+    for output in outputs:
+        http_fetch.save_output_stamp(os.path.abspath(output), stamp)
+
+    metrics.finish()
     appLogger.info(f"app finished")
 
 
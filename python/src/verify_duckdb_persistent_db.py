@@ -1,6 +1,10 @@
 import sys
 import os
 import logging
+import json
+import math
+import time
+from typing import Iterator, Optional
 
 import click
 import duckdb
@@ -22,7 +26,413 @@ appLogger.setLevel(logging.INFO)
 appLogger.addHandler(handler)
 
 
-@click.command()
+# 画面(node/src/Table.tsx)が取得するカラム
+# abstractは、abstractを別のParquetファイルに分けたデータベースでは"NULL AS abstract"になる
+ENTRY_COLUMNS = [
+    "doc_id",
+    "rfc_number",
+    "title",
+    "author",
+    "date",
+    "format",
+    "page_count",
+    "keywords",
+    "is_also",
+    "obsoletes",
+    "obsoleted_by",
+    "updates",
+    "updated_by",
+    "see_also",
+    '"references"',
+    "referenced_by",
+    "abstract",
+    "draft",
+    "current_status",
+    "publication_status",
+    "stream",
+    "errata_url",
+    "area",
+    "wg_acronym",
+    "doi",
+]
+
+# 検索語を指定しない場合に計測する検索語
+# ヒット件数の多いもの、少ないもの、ヒットしないものを含める
+DEFAULT_SEARCH_TEXTS = ["http", "congestion control", "no-such-search-text"]
+
+# 計測するクエリ: (名前, SQL, パラメータ)
+# 名前は"<テンプレート名>: <条件>"の形式で、テンプレート名は以下のいずれか
+BenchmarkQuery = tuple[str, str, list]
+
+QUERY_TEMPLATES = [
+    "count",
+    "page-first",
+    "page-last",
+    "search-count",
+    "search-page-first",
+    "search-page-last",
+    "page-abstracts",
+    "graph-references",
+    "graph-referenced-by",
+    "graph-successors",
+    "graph-reference-closure",
+    "fulltext-search",
+]
+
+
+def open_database(dbfile: str, read_only: bool = False) -> duckdb.DuckDBPyConnection:
+    appLogger.info(f"duckdb database connecting: dbfile={dbfile}")
+
+    conn: duckdb.DuckDBPyConnection = None
+    try:
+        abspath = os.path.abspath(dbfile)
+        if not os.path.exists(abspath):
+            appLogger.error(f"database file not found: dbfile={dbfile}")
+            sys.exit(-1)
+
+        conn = duckdb.connect(abspath, read_only=read_only)
+    except Exception as e:
+        appLogger.error(e)
+        appLogger.error(f"database connect error: dbfile={dbfile}")
+        sys.exit(-1)
+
+    appLogger.info(f"duckdb database connected: dbfile={dbfile}")
+    return conn
+
+
+def has_table(conn: duckdb.DuckDBPyConnection, table: str) -> bool:
+    return (
+        conn.execute(
+            "SELECT count(*) FROM duckdb_tables() WHERE table_name = ?;", [table]
+        ).fetchone()[0]
+        > 0
+    )
+
+
+# 画面と同じく、rfc_entriesにabstractのカラムがなければabstractを別のParquetファイルに分けたデータベースとみなす
+def has_split_abstracts(conn: duckdb.DuckDBPyConnection) -> bool:
+    return (
+        conn.execute(
+            """
+            SELECT count(*)
+            FROM duckdb_columns()
+            WHERE table_name = 'rfc_entries' AND column_name = 'abstract';
+            """
+        ).fetchone()[0]
+        == 0
+    )
+
+
+# abstractを別のParquetファイルに分けたデータベースの場合は、そのParquetファイルの指定が必要
+def resolve_abstracts(
+    dbfile: str, split_abstracts: bool, abstracts: Optional[str]
+) -> Optional[str]:
+    if not split_abstracts:
+        return None
+    if not abstracts:
+        appLogger.error(
+            f"rfc_entries has no abstract column, --abstracts is required: dbfile={dbfile}"
+        )
+        sys.exit(-1)
+    if not os.path.exists(abstracts):
+        appLogger.error(f"file not found: {abstracts}")
+        sys.exit(-1)
+    return os.path.abspath(abstracts)
+
+
+# 画面が発行するクエリと同じ形のクエリを組み立てる
+#
+# * 件数(count) + 1ページ分の取得(LIMIT/OFFSET)を、検索語なし・ありのそれぞれで、先頭と最後のページについて
+# * abstractを別のParquetファイルに分けている場合は、表示するページの分のabstractの取得も
+# * rfc_edgesなどのテーブルがある場合は、関係を辿るクエリ(rfc_edges, rfc_successors, rfc_reference_closure, rfc_search)も
+def build_benchmark_queries(
+    conn: duckdb.DuckDBPyConnection,
+    search_texts: list[str],
+    page_size: int,
+    abstracts: Optional[str],
+) -> list[BenchmarkQuery]:
+    split_abstracts = has_split_abstracts(conn)
+    if split_abstracts:
+        quoted_path = abstracts.replace("'", "''")
+        abstract_condition = f"""rfc_number IN (
+                SELECT rfc_number
+                FROM read_parquet('{quoted_path}')
+                WHERE lower(abstract) LIKE ?
+            )"""
+        columns = ", ".join(
+            "NULL AS abstract" if column == "abstract" else column
+            for column in ENTRY_COLUMNS
+        )
+    else:
+        abstract_condition = "lower(abstract) LIKE ?"
+        columns = ", ".join(ENTRY_COLUMNS)
+
+    # 最後のページのOFFSET
+    def last_offset(total: int) -> int:
+        return max(total - 1, 0) // page_size * page_size
+
+    queries: list[BenchmarkQuery] = []
+
+    # 検索語なし
+    total = conn.execute("SELECT count(*) AS total FROM rfc_entries;").fetchone()[0]
+    queries.append(("count", "SELECT count(*) AS total FROM rfc_entries;", []))
+    page = f"""
+        SELECT {columns}
+        FROM rfc_entries
+        ORDER BY rfc_number DESC
+        LIMIT ?
+        OFFSET ?;
+    """
+    queries.append(("page-first", page, [page_size, 0]))
+    queries.append(("page-last", page, [page_size, last_offset(total)]))
+
+    # 検索語あり
+    for search_text in search_texts:
+        pattern = f"%{search_text.lower()}%"
+        count = f"""
+            SELECT count(*) AS total
+            FROM rfc_entries
+            WHERE
+                search_blob LIKE ?
+                OR {abstract_condition};
+        """
+        total = conn.execute(count, [pattern, pattern]).fetchone()[0]
+        queries.append((f"search-count: text={search_text}", count, [pattern, pattern]))
+        page = f"""
+            SELECT {columns}
+            FROM rfc_entries
+            WHERE
+                search_blob LIKE ?
+                OR {abstract_condition}
+            ORDER BY doc_id DESC
+            LIMIT ?
+            OFFSET ?;
+        """
+        queries.append(
+            (
+                f"search-page-first: text={search_text}",
+                page,
+                [pattern, pattern, page_size, 0],
+            )
+        )
+        queries.append(
+            (
+                f"search-page-last: text={search_text}",
+                page,
+                [pattern, pattern, page_size, last_offset(total)],
+            )
+        )
+
+    # 表示するページの分のabstract
+    if split_abstracts:
+        rfc_numbers = [
+            row[0]
+            for row in conn.execute(
+                "SELECT rfc_number FROM rfc_entries ORDER BY rfc_number DESC LIMIT ?;",
+                [page_size],
+            ).fetchall()
+            if row[0] is not None
+        ]
+        if rfc_numbers:
+            queries.append(
+                (
+                    "page-abstracts",
+                    f"""
+                    SELECT rfc_number, abstract
+                    FROM read_parquet('{quoted_path}')
+                    WHERE
+                        rfc_number BETWEEN {min(rfc_numbers)} AND {max(rfc_numbers)}
+                        AND rfc_number IN ({", ".join(str(n) for n in rfc_numbers)});
+                    """,
+                    [],
+                )
+            )
+
+    # 関係を辿るクエリ
+    # 対象のRFCは、辺の最も多いRFCとする
+    if has_table(conn, "rfc_edges"):
+        sample = conn.execute(
+            """
+            SELECT src
+            FROM rfc_edges
+            WHERE kind = 'references'
+            GROUP BY src
+            ORDER BY count(*) DESC, src
+            LIMIT 1;
+            """
+        ).fetchone()
+        if sample:
+            queries.append(
+                (
+                    f"graph-references: rfc_number={sample[0]}",
+                    "SELECT dst FROM rfc_edges WHERE src = ? AND kind = 'references';",
+                    [sample[0]],
+                )
+            )
+            queries.append(
+                (
+                    f"graph-referenced-by: rfc_number={sample[0]}",
+                    "SELECT src FROM rfc_edges WHERE dst = ? AND kind = 'references';",
+                    [sample[0]],
+                )
+            )
+
+    if has_table(conn, "rfc_successors"):
+        sample = conn.execute(
+            """
+            SELECT src
+            FROM rfc_successors
+            GROUP BY src
+            ORDER BY count(*) DESC, src
+            LIMIT 1;
+            """
+        ).fetchone()
+        if sample:
+            queries.append(
+                (
+                    f"graph-successors: rfc_number={sample[0]}",
+                    "SELECT dst FROM rfc_successors WHERE src = ? AND kind = 'obsoleted_by' AND is_current;",
+                    [sample[0]],
+                )
+            )
+
+    if has_table(conn, "rfc_reference_closure"):
+        sample = conn.execute(
+            """
+            SELECT src
+            FROM rfc_reference_closure
+            GROUP BY src
+            ORDER BY count(*) DESC, src
+            LIMIT 1;
+            """
+        ).fetchone()
+        if sample:
+            queries.append(
+                (
+                    f"graph-reference-closure: rfc_number={sample[0]}",
+                    "SELECT dst, depth FROM rfc_reference_closure WHERE src = ? ORDER BY depth, dst;",
+                    [sample[0]],
+                )
+            )
+
+    if has_table(conn, "rfc_search_postings") and search_texts:
+        if conn.execute("SELECT count(*) FROM rfc_search_postings;").fetchone()[0] > 0:
+            queries.append(
+                (
+                    f"fulltext-search: text={search_texts[0]}",
+                    """
+                    SELECT doc_id, title, score
+                    FROM rfc_search(?) JOIN rfc_entries USING (rfc_number)
+                    ORDER BY score DESC
+                    LIMIT ?;
+                    """,
+                    [search_texts[0], page_size],
+                )
+            )
+
+    return queries
+
+
+# nearest-rank法によるパーセンタイル
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+# クエリを1回だけプロファイリングを有効にしてEXPLAIN ANALYZEで実行し、プロファイル(JSON)を返す
+def explain_analyze(conn: duckdb.DuckDBPyConnection, sql: str, params: list) -> dict:
+    conn.execute("PRAGMA enable_profiling = 'json';")
+    try:
+        _, profile = conn.execute(f"EXPLAIN ANALYZE {sql}", params).fetchone()
+    finally:
+        conn.execute("PRAGMA disable_profiling;")
+    return json.loads(profile)
+
+
+# プロファイルの各オペレータが読み込んだ行数の合計
+# DuckDBのバージョンによってはルートのcumulative_rows_scannedが0になるため、オペレータごとの値を合計する
+def sum_rows_scanned(node: dict) -> int:
+    return node.get("operator_rows_scanned", 0) + sum(
+        sum_rows_scanned(child) for child in node.get("children", [])
+    )
+
+
+def profile_rows_scanned(
+    conn: duckdb.DuckDBPyConnection, sql: str, params: list
+) -> int:
+    return sum_rows_scanned(explain_analyze(conn, sql, params))
+
+
+# プロファイルのオペレータの木を、オペレータごとの時間・出力行数・読み込んだ行数のみに絞り込む
+def operator_tree(node: dict) -> dict:
+    return {
+        "operator": node.get("operator_name", "").strip(),
+        "timing_ms": round(node.get("operator_timing", 0) * 1000, 3),
+        "cardinality": node.get("operator_cardinality", 0),
+        "rows_scanned": node.get("operator_rows_scanned", 0),
+        "extra_info": node.get("extra_info", {}),
+        "children": [operator_tree(child) for child in node.get("children", [])],
+    }
+
+
+# プロファイルのルート(クエリ全体)とEXPLAIN_ANALYZEのオペレータを除いた、クエリの実行計画のオペレータ
+def plan_operators(profile: dict) -> list[dict]:
+    operators = profile.get("children", [])
+    while (
+        len(operators) == 1 and operators[0].get("operator_type") == "EXPLAIN_ANALYZE"
+    ):
+        operators = operators[0].get("children", [])
+    return operators
+
+
+def flatten_operators(operators: list[dict]) -> Iterator[dict]:
+    for operator in operators:
+        yield operator
+        yield from flatten_operators(operator["children"])
+
+
+# オペレータの木を字下げして出力する
+def log_operator_tree(operators: list[dict], depth: int = 0):
+    for operator in operators:
+        appLogger.info(
+            f"{'    ' * depth}{operator['operator']}: time={operator['timing_ms']}ms rows={operator['cardinality']} rows_scanned={operator['rows_scanned']}"
+        )
+        log_operator_tree(operator["children"], depth + 1)
+
+
+# クエリをrepeat回実行し、結果の取得までの時間(ミリ秒)を計測する
+def measure_query(
+    conn: duckdb.DuckDBPyConnection,
+    name: str,
+    sql: str,
+    params: list,
+    repeat: int,
+    warmup: int,
+) -> dict:
+    for _ in range(warmup):
+        conn.execute(sql, params).fetchall()
+
+    latencies: list[float] = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(conn.execute(sql, params).fetchall())
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "name": name,
+        "rows": rows,
+        "rows_scanned": profile_rows_scanned(conn, sql, params),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "min_ms": round(min(latencies), 3),
+        "max_ms": round(max(latencies), 3),
+    }
+
+
+@click.group(invoke_without_command=True)
 @click.option(
     "--dbfile",
     type=str,
@@ -37,39 +447,356 @@ appLogger.addHandler(handler)
     default=None,
     help="特定のカラムのみ出力したい場合にカラム名を指定する",
 )
-def main(dbfile: str, column: str):
+@click.pass_context
+def main(ctx: click.Context, dbfile: str, column: str):
     appLogger.info(f"app start")
     appLogger.info(f"command line argument: --dbfile = {dbfile}")
     appLogger.info(f"command line argument: --column = {column}")
 
+    # サブコマンドが指定された場合は、そちらで処理する
+    ctx.obj = {"dbfile": dbfile}
+    if ctx.invoked_subcommand is not None:
+        return
+
     # Open DuckDB Persistent Database
-    appLogger.info(f"duckdb database connecting: dbfile={dbfile}")
+    conn = open_database(dbfile)
 
-    conn: duckdb.DuckDBPyConnection = None
-    try:
-        abspath = os.path.abspath(dbfile)
-        dirpath = os.path.dirname(abspath)
-        if not os.path.exists(abspath):
-            appLogger.error(f"database file not found: dbfile={dbfile}")
+    # Show table
+    # カラム名はSQLにそのまま埋め込まず、rfc_entriesに存在するカラムであることを確認してから識別子として引用する
+    if column:
+        columns = [
+            row[0]
+            for row in conn.execute(
+                """
+                SELECT column_name
+                FROM duckdb_columns()
+                WHERE table_name = 'rfc_entries'
+                ORDER BY column_index;
+                """
+            ).fetchall()
+        ]
+        if column not in columns:
+            appLogger.error(
+                f"column not found: column={column} columns={', '.join(columns)}"
+            )
             sys.exit(-1)
 
-        conn = duckdb.connect(abspath)
-    except Exception as e:
+        quoted_column = column.replace('"', '""')
+        conn.query(f'SELECT "{quoted_column}" FROM rfc_entries;').show()
+    else:
+        conn.table("rfc_entries").show()
+
+    # Close
+    conn.close()
+
+    appLogger.info(f"app finished")
+
+
+@main.command(
+    help="画面と同じ形のクエリを繰り返し実行し、レイテンシ(p50/p95/p99)と読み込んだ行数を計測する"
+)
+@click.option(
+    "--search-text",
+    "search_texts",
+    type=str,
+    multiple=True,
+    help=f"計測する検索語. 複数指定できる. 指定しない場合は{DEFAULT_SEARCH_TEXTS}",
+)
+@click.option(
+    "--abstracts",
+    type=str,
+    required=False,
+    default=None,
+    help="abstractを別のParquetファイルに分けたデータベース(--export-abstracts)の場合に、そのParquetファイルを指定する",
+)
+@click.option(
+    "--template",
+    "templates",
+    type=click.Choice(QUERY_TEMPLATES),
+    multiple=True,
+    help="計測するクエリ(benchmarkのクエリ名). 複数指定できる. 指定したクエリがこのデータベースで組み立てられない場合は異常終了する. 指定しない場合は組み立てられる全てのクエリ",
+)
+@click.option(
+    "--page-size",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="1ページの件数(画面と同じ)",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=50,
+    show_default=True,
+    help="クエリごとの計測回数",
+)
+@click.option(
+    "--warmup",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="計測前にクエリを実行する回数",
+)
+@click.option(
+    "--output",
+    type=str,
+    required=False,
+    default=None,
+    help="計測結果(JSON)の出力先. 指定しない場合はstdoutに出力する",
+)
+@click.option(
+    "--max-p95-ms",
+    type=click.FloatRange(min=0),
+    required=False,
+    default=None,
+    help="いずれかのクエリのp95がこの値(ミリ秒)を超えた場合、異常終了する",
+)
+@click.pass_context
+def benchmark(
+    ctx: click.Context,
+    search_texts: tuple[str, ...],
+    abstracts: str,
+    templates: tuple[str, ...],
+    page_size: int,
+    repeat: int,
+    warmup: int,
+    output: str,
+    max_p95_ms: float,
+):
+    dbfile = ctx.obj["dbfile"]
+    search_texts = list(search_texts) or DEFAULT_SEARCH_TEXTS
+
+    appLogger.info(f"command line argument: --search-text = {search_texts}")
+    appLogger.info(f"command line argument: --abstracts = {abstracts}")
+    appLogger.info(f"command line argument: --template = {list(templates)}")
+    appLogger.info(f"command line argument: --page-size = {page_size}")
+    appLogger.info(f"command line argument: --repeat = {repeat}")
+    appLogger.info(f"command line argument: --warmup = {warmup}")
+    appLogger.info(f"command line argument: --output = {output}")
+    appLogger.info(f"command line argument: --max-p95-ms = {max_p95_ms}")
+
+    conn = open_database(dbfile, read_only=True)
+
+    split_abstracts = has_split_abstracts(conn)
+    abstracts = resolve_abstracts(dbfile, split_abstracts, abstracts)
+
+    try:
+        queries = build_benchmark_queries(conn, search_texts, page_size, abstracts)
+    except duckdb.Error as e:
         appLogger.error(e)
-        appLogger.error(f"database connect error: dbfile={dbfile}")
+        appLogger.error(f"benchmark queries can not be prepared: dbfile={dbfile}")
         sys.exit(-1)
 
-    appLogger.info(f"duckdb database connected: dbfile={dbfile}")
+    # 組み立てられなかったクエリ(テーブルがない、または空のデータベースなど)
+    # 指定したクエリの場合は異常終了し、指定していない場合は計測から除いたことを警告する
+    built = {name.split(":")[0] for name, _, _ in queries}
+    if templates:
+        missing = [template for template in templates if template not in built]
+        for template in missing:
+            appLogger.error(
+                f"template is not available for this database: template={template} dbfile={dbfile}"
+            )
+        if missing:
+            sys.exit(-1)
+        queries = [query for query in queries if query[0].split(":")[0] in templates]
+    else:
+        for template in QUERY_TEMPLATES:
+            if template not in built:
+                appLogger.warning(
+                    f"template is not available for this database, skipped: template={template} dbfile={dbfile}"
+                )
 
-    # Show table
-    if column:
-        conn.query(f"SELECT {column} FROM rfc_entries;").show()
+    appLogger.info(f"benchmark running: queries={len(queries)} repeat={repeat}")
+
+    results = []
+    for name, sql, params in queries:
+        result = measure_query(conn, name, sql, params, repeat, warmup)
+        results.append(result)
+        appLogger.info(
+            f"benchmark: query={name} rows={result['rows']} rows_scanned={result['rows_scanned']} p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms"
+        )
+
+    conn.close()
+
+    report = {
+        "dbfile": dbfile,
+        "duckdb_version": duckdb.__version__,
+        "split_abstracts": split_abstracts,
+        "page_size": page_size,
+        "repeat": repeat,
+        "warmup": warmup,
+        "queries": results,
+    }
+    if output:
+        abspath = os.path.abspath(output)
+        appLogger.info(f"data exporting to the file: file={output} filepath={abspath}")
+
+        with open(abspath, mode="w") as f:
+            f.write(json.dumps(report, indent=4))
+
+        appLogger.info(f"data exported to the file: file={output} filepath={abspath}")
     else:
-        conn.table("rfc_entries").show()
+        sys.stdout.write(json.dumps(report, indent=4))
+        sys.stdout.write("\n")
+
+    # 性能の劣化の検出
+    if max_p95_ms is not None:
+        slow = [result for result in results if result["p95_ms"] > max_p95_ms]
+        for result in slow:
+            appLogger.error(
+                f"query too slow: query={result['name']} p95={result['p95_ms']}ms max={max_p95_ms}ms"
+            )
+        if slow:
+            sys.exit(-1)
+
+    appLogger.info(f"app finished")
+
+
+@main.command(
+    help="クエリを1回だけプロファイリングを有効にして実行し、オペレータごとの時間と行数を出力する"
+)
+@click.option(
+    "--query",
+    type=str,
+    required=False,
+    default=None,
+    help="プロファイリングするSQL. データベースは読み取り専用で開く",
+)
+@click.option(
+    "--template",
+    type=click.Choice(QUERY_TEMPLATES),
+    required=False,
+    default=None,
+    help="プロファイリングする画面と同じ形のクエリ(benchmarkのクエリ名)",
+)
+@click.option(
+    "--search-text",
+    type=str,
+    default=DEFAULT_SEARCH_TEXTS[0],
+    show_default=True,
+    help="--templateが検索のクエリの場合の検索語",
+)
+@click.option(
+    "--abstracts",
+    type=str,
+    required=False,
+    default=None,
+    help="abstractを別のParquetファイルに分けたデータベース(--export-abstracts)の場合に、そのParquetファイルを指定する",
+)
+@click.option(
+    "--page-size",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="1ページの件数(画面と同じ)",
+)
+@click.option(
+    "--output",
+    type=str,
+    required=False,
+    default=None,
+    help="オペレータの木(JSON)の出力先. 指定しない場合はstdoutに出力する",
+)
+@click.pass_context
+def profile(
+    ctx: click.Context,
+    query: str,
+    template: str,
+    search_text: str,
+    abstracts: str,
+    page_size: int,
+    output: str,
+):
+    dbfile = ctx.obj["dbfile"]
+
+    appLogger.info(f"command line argument: --query = {query}")
+    appLogger.info(f"command line argument: --template = {template}")
+    appLogger.info(f"command line argument: --search-text = {search_text}")
+    appLogger.info(f"command line argument: --abstracts = {abstracts}")
+    appLogger.info(f"command line argument: --page-size = {page_size}")
+    appLogger.info(f"command line argument: --output = {output}")
+
+    if (query is None) == (template is None):
+        appLogger.error("either --query or --template is required")
+        sys.exit(-1)
+
+    # 任意のSQLを実行するため、読み取り専用で開く
+    conn = open_database(dbfile, read_only=True)
+
+    if query is not None:
+        name, sql, params = "query", query, []
+    else:
+        abstracts = resolve_abstracts(dbfile, has_split_abstracts(conn), abstracts)
+        try:
+            queries = [
+                benchmark_query
+                for benchmark_query in build_benchmark_queries(
+                    conn, [search_text], page_size, abstracts
+                )
+                if benchmark_query[0].split(":")[0] == template
+            ]
+        except duckdb.Error as e:
+            appLogger.error(e)
+            appLogger.error(f"benchmark queries can not be prepared: dbfile={dbfile}")
+            sys.exit(-1)
+
+        if not queries:
+            appLogger.error(
+                f"template is not available for this database: template={template} dbfile={dbfile}"
+            )
+            sys.exit(-1)
+        name, sql, params = queries[0]
+
+    appLogger.info(f"query profiling: query={name}")
+
+    try:
+        profile = explain_analyze(conn, sql, params)
+    except duckdb.Error as e:
+        appLogger.error(e)
+        appLogger.error(f"query can not be profiled: query={name}")
+        sys.exit(-1)
 
-    # Close
     conn.close()
 
+    operators = [operator_tree(operator) for operator in plan_operators(profile)]
+    flattened = list(flatten_operators(operators))
+    total_ms = round(sum(operator["timing_ms"] for operator in flattened), 3)
+    rows_scanned = sum(operator["rows_scanned"] for operator in flattened)
+
+    # 読みやすい形式での出力
+    # オペレータの木と、時間のかかったオペレータの上位
+    appLogger.info(
+        f"query profiled: query={name} time={total_ms}ms rows={operators[0]['cardinality'] if operators else 0} rows_scanned={rows_scanned}"
+    )
+    log_operator_tree(operators)
+    for operator in sorted(flattened, key=lambda x: x["timing_ms"], reverse=True)[:5]:
+        share = operator["timing_ms"] / total_ms * 100 if total_ms > 0 else 0
+        appLogger.info(
+            f"hotspot: operator={operator['operator']} time={operator['timing_ms']}ms share={share:.1f}% rows={operator['cardinality']} rows_scanned={operator['rows_scanned']}"
+        )
+
+    report = {
+        "dbfile": dbfile,
+        "duckdb_version": duckdb.__version__,
+        "name": name,
+        "sql": sql,
+        "params": params,
+        "total_ms": total_ms,
+        "rows_scanned": rows_scanned,
+        "operators": operators,
+    }
+    if output:
+        abspath = os.path.abspath(output)
+        appLogger.info(f"data exporting to the file: file={output} filepath={abspath}")
+
+        with open(abspath, mode="w") as f:
+            f.write(json.dumps(report, indent=4))
+
+        appLogger.info(f"data exported to the file: file={output} filepath={abspath}")
+    else:
+        sys.stdout.write(json.dumps(report, indent=4))
+        sys.stdout.write("\n")
+
     appLogger.info(f"app finished")
 
 